@@ -0,0 +1,204 @@
+"""
+Answer cache warmup from the question history.
+
+Picks the most frequently asked normalized questions of the last TTL window
+that were answered under the current agent configuration, and loads their
+latest completed answer into the cache with pipelined SET NX writes (entries
+already cached are left alone). Each entry expires when the answer it came
+from would have. Runs at startup and, optionally, every CACHE_WARMUP_INTERVAL
+seconds; a Redis lock keeps concurrent workers from warming at the same time.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from typing import Any, Callable, Dict, List, Optional
+from .service import cache_key, cache_stats, get_redis_client
+from ..core.config import settings
+from ..db.answers import resolve_answer, with_answer_blobs
+from ..db.database import SessionLocal
+from ..db.models import ConversationTurn
+
+logger = logging.getLogger(__name__)
+
+_LOCK_KEY = "cache-warmup:lock"
+
+def frequent_answers(db, config_fingerprint: str, since: datetime, budget: int, min_count: int) -> List[Dict[str, Any]]:
+    """Latest completed answer of the `budget` most asked questions since `since`, most asked first."""
+    frequency = (
+        select(
+            ConversationTurn.question_digest,
+            func.count().label("asked"),
+            func.max(ConversationTurn.id).label("latest_id"),
+        )
+        .where(
+            ConversationTurn.config_fingerprint == config_fingerprint,
+            ConversationTurn.created_at >= since,
+            ConversationTurn.status == "completed",
+            ConversationTurn.question_digest.isnot(None),
+        )
+        .group_by(ConversationTurn.question_digest)
+        .having(func.count() >= min_count)
+        .order_by(func.count().desc())
+        .limit(budget)
+        .subquery()
+    )
+    query = with_answer_blobs(
+        select(
+            frequency.c.question_digest,
+            frequency.c.asked,
+            ConversationTurn.answer,
+            ConversationTurn.agent_used,
+            ConversationTurn.created_at,
+        ).join(ConversationTurn, ConversationTurn.id == frequency.c.latest_id)
+    ).order_by(frequency.c.asked.desc())
+    return [resolve_answer(dict(row)) for row in db.execute(query).mappings()]
+
+class CacheWarmer:
+    def __init__(self, config_fingerprint: Callable[[], str], budget: int, rate: float, batch_size: int,
+                 min_count: int, interval: float):
+        # Read on every pass, so a configuration reload warms the new configuration's keys
+        self._config_fingerprint = config_fingerprint
+        self.budget = budget
+        self.rate = rate
+        self.batch_size = batch_size
+        self.min_count = min_count
+        self.interval = interval
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def config_fingerprint(self) -> str:
+        return self._config_fingerprint()
+
+    def warm(self) -> Dict[str, Any]:
+        """One warmup pass; returns its report."""
+        start_time = time.time()
+        config_fingerprint = self.config_fingerprint
+        ttl = settings.CACHE_EXPIRATION
+        now = datetime.now(timezone.utc)
+        redis_client = get_redis_client()
+        if not redis_client:
+            return {"skipped": "Redis is unavailable"}
+        if not redis_client.set(_LOCK_KEY, "1", nx=True, ex=max(60, int(self.budget / self.rate) * 2)):
+            return {"skipped": "another worker is warming the cache"}
+        try:
+            with SessionLocal() as db:
+                candidates = frequent_answers(db, config_fingerprint, now - timedelta(seconds=ttl),
+                                              self.budget, self.min_count)
+
+            entries = []
+            expired = 0
+            for row in candidates:
+                created_at = row["created_at"]
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                remaining = int(ttl - (now - created_at).total_seconds())
+                if remaining <= 0:
+                    expired += 1
+                    continue
+                value = json.dumps({
+                    "answer": row["answer"],
+                    "agent_used": row["agent_used"],
+                    "status": "completed",
+                    "metadata": {"warmed": True, "asked": row["asked"]},
+                })
+                entries.append((cache_key(row["question_digest"], config_fingerprint), value, remaining))
+
+            warmed = 0
+            for offset in range(0, len(entries), self.batch_size):
+                batch_start = time.time()
+                pipeline = redis_client.pipeline(transaction=False)
+                for key, value, remaining in entries[offset:offset + self.batch_size]:
+                    pipeline.set(key, value, ex=remaining, nx=True)
+                warmed += sum(1 for written in pipeline.execute() if written)
+                # Stay under `rate` entries per second
+                pause = len(entries[offset:offset + self.batch_size]) / self.rate - (time.time() - batch_start)
+                if pause > 0:
+                    time.sleep(pause)
+        finally:
+            redis_client.delete(_LOCK_KEY)
+
+        report = {
+            "candidates": len(candidates),
+            "warmed": warmed,
+            "already_cached": len(entries) - warmed,
+            "expired": expired,
+            "duration": time.time() - start_time,
+            "config_fingerprint": config_fingerprint,
+            "finished_at": time.time(),
+            "cache_before": cache_stats.to_dict(),
+        }
+        logger.info(f"Cache warmup loaded {warmed} of {len(candidates)} frequent answers in {report['duration']:.2f}s")
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                report = await asyncio.to_thread(self.warm)
+                if "skipped" in report:
+                    logger.info(f"Cache warmup skipped: {report['skipped']}")
+                else:
+                    self.last_report = report
+            except Exception as e:
+                logger.error(f"Cache warmup failed: {e}")
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="cache-warmup")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> Dict[str, Any]:
+        """Last warmup report and the hit rate since it ran."""
+        stats = cache_stats.to_dict()
+        report = {"last_warmup": self.last_report, "cache": stats}
+        before = (self.last_report or {}).get("cache_before")
+        if before:
+            hits = stats["hits"] - before["hits"]
+            lookups = hits + stats["misses"] - before["misses"]
+            report["since_warmup"] = {
+                "hits": hits,
+                "misses": lookups - hits,
+                "warmed_hits": stats["warmed_hits"] - before["warmed_hits"],
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+        return report
+
+cache_warmer: Optional[CacheWarmer] = None
+
+def get_cache_warmer() -> Optional[CacheWarmer]:
+    return cache_warmer
+
+def start_cache_warmer(config_fingerprint: Callable[[], str]) -> Optional[CacheWarmer]:
+    """Start warming unless the cache is disabled or Redis is unavailable."""
+    global cache_warmer
+    if not (settings.CACHE_ENABLED and get_redis_client()):
+        return None
+    cache_warmer = CacheWarmer(
+        config_fingerprint,
+        budget=settings.CACHE_WARMUP_BUDGET,
+        rate=settings.CACHE_WARMUP_RATE,
+        batch_size=settings.CACHE_WARMUP_BATCH_SIZE,
+        min_count=settings.CACHE_WARMUP_MIN_COUNT,
+        interval=settings.CACHE_WARMUP_INTERVAL,
+    )
+    cache_warmer.start()
+    return cache_warmer
+
+async def stop_cache_warmer() -> None:
+    global cache_warmer
+    if cache_warmer:
+        await cache_warmer.stop()
+    cache_warmer = None
@@ -0,0 +1,225 @@
+"""
+Persistent chat sessions over WebSocket.
+
+A client opens /chat/ws (optionally with ?conversation_id=) and keeps the
+socket for the whole conversation. The session owns one DB session and the
+Conversation row for the life of the connection, so turns skip the per-request
+dependency setup and conversation lookup of /ask; each turn is persisted in a
+single commit when it completes. The session's database work runs in the
+threadpool.
+
+Client frames:
+    {"type": "ask", "id": "q1", "question": "...", "context": {}, "fan_out": false}
+    {"type": "pong"}
+Server frames:
+    {"type": "session", "conversation_id": "..."}
+    {"type": "delta", "id": "q1", "text": "..."}        answer text, in order
+    {"type": "reset", "id": "q1"}                       discard the deltas received so far
+    {"type": "answer", "id": "q1", "agent_used": "...", "status": "...", "metadata": {...}}
+    {"type": "error", "id": "q1", "status_code": 429, "detail": "..."}
+    {"type": "ping"}
+
+Deltas carry the text as the model generates it when the answer comes from a
+single run of the triage agent. Answers from the cache, fan-out or
+speculative runs are only available whole and are sent as WS_STREAM_CHUNK_SIZE
+slices once complete. When the final answer is not the streamed text (an
+escalation to a stronger tier replaced it, or a router wrote text before
+handing off), a reset frame precedes its deltas. An error frame after deltas
+also means they are void. Deltas produced while the entry agent's guardrails
+are still running are held back until they pass, so a rejected question gets
+only its error frame.
+
+Questions are answered one at a time in arrival order (they are turns of the
+same conversation); at most WS_MAX_PENDING may wait, further ones get a 429
+error frame. Outgoing frames go through a bounded queue: a client that stops
+reading stalls its own session and is disconnected after WS_SEND_TIMEOUT
+seconds. The server pings every WS_HEARTBEAT_INTERVAL seconds and closes
+sockets it has not heard from for WS_HEARTBEAT_TIMEOUT seconds. A question
+still running when the socket closes is abandoned.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Any, Dict, List, Optional, Tuple
+from .models import QuestionRequest
+from .service import answer_question
+from ..core.config import settings
+from ..core.tracing import tracer
+from ..db.database import SessionLocal
+from ..db.models import Conversation
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+class SlowConsumerError(Exception):
+    """Raised when the client does not read its frames within WS_SEND_TIMEOUT."""
+
+class ChatSession:
+    def __init__(self, websocket: WebSocket, conversation_id: str, user_ip: Optional[str]):
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.user_ip = user_ip
+        # Committed rows stay loaded, so the conversation is read once per connection
+        self.db = SessionLocal(expire_on_commit=False)
+        # Cancelling a turn does not stop its threadpool work: the session is only closed once that work is done
+        self.db_lock = threading.Lock()
+        self.conversation: Optional[Conversation] = None
+        self.questions: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_MAX_PENDING)
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE)
+        self.last_seen = time.monotonic()
+        self.turns = 0
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        try:
+            await asyncio.wait_for(self.outbox.put(frame), settings.WS_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SlowConsumerError(f"Client did not read for {settings.WS_SEND_TIMEOUT}s")
+
+    async def send_error(self, frame_id: Any, status_code: int, detail: Any) -> None:
+        await self.send({"type": "error", "id": frame_id, "status_code": status_code, "detail": detail})
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                frame = json.loads(await self.websocket.receive_text())
+            except WebSocketDisconnect:
+                return
+            except ValueError:
+                await self.send_error(None, 400, "Frames must be JSON objects")
+                continue
+            self.last_seen = time.monotonic()
+            if not isinstance(frame, dict):
+                await self.send_error(None, 400, "Frames must be JSON objects")
+            elif frame.get("type") == "ask":
+                await self._enqueue(frame)
+            elif frame.get("type") != "pong":
+                await self.send_error(frame.get("id"), 400, f"Unknown frame type: {frame.get('type')}")
+
+    async def _enqueue(self, frame: Dict[str, Any]) -> None:
+        try:
+            request = QuestionRequest(
+                question=frame.get("question"),
+                context=frame.get("context") or {},
+                fan_out=frame.get("fan_out", False),
+                conversation_id=self.conversation_id,
+            )
+        except ValidationError as e:
+            await self.send_error(frame.get("id"), 422, e.errors(include_url=False))
+            return
+        try:
+            self.questions.put_nowait((frame.get("id"), request))
+        except asyncio.QueueFull:
+            await self.send_error(frame.get("id"), 429, f"More than {settings.WS_MAX_PENDING} questions pending")
+
+    async def _answer(self) -> None:
+        while True:
+            frame_id, request = await self.questions.get()
+            streamed: List[str] = []
+
+            async def on_delta(text: str) -> None:
+                streamed.append(text)
+                await self.send({"type": "delta", "id": frame_id, "text": text})
+
+            try:
+                with tracer.start_trace("websocket.turn", conversation_id=self.conversation_id):
+                    response = await answer_question(
+                        request, self.db, user_ip=self.user_ip, on_delta=on_delta, db_lock=self.db_lock,
+                    )
+            except HTTPException as e:
+                await self.send_error(frame_id, e.status_code, e.detail)
+                continue
+            finally:
+                await run_in_threadpool(self._forget_turn)
+            self.turns += 1
+
+            if "".join(streamed) != response.answer:
+                if streamed:
+                    await self.send({"type": "reset", "id": frame_id})
+                chunk_size = settings.WS_STREAM_CHUNK_SIZE
+                for offset in range(0, len(response.answer), chunk_size):
+                    await self.send({"type": "delta", "id": frame_id, "text": response.answer[offset:offset + chunk_size]})
+            done = response.model_dump(mode="json", exclude={"answer", "conversation_id"})
+            await self.send({"type": "answer", "id": frame_id, **done})
+
+    def _forget_turn(self) -> None:
+        """Drop everything but the conversation from the session, so metrics are read fresh each turn."""
+        with self.db_lock:
+            self._expunge_turn()
+
+    def _expunge_turn(self) -> None:
+        if self.conversation is None:
+            # The identity map only holds weak references: keep the conversation alive for the next turns
+            self.conversation = self.db.get(Conversation, self.conversation_id)
+            # End the read transaction rather than pin a pooled connection until the next turn
+            self.db.commit()
+        for instance in list(self.db.identity_map.values()):
+            if instance is not self.conversation:
+                self.db.expunge(instance)
+
+    def _close_db(self) -> None:
+        with self.db_lock:
+            self.db.close()
+
+    async def _write(self) -> None:
+        while True:
+            frame = await self.outbox.get()
+            try:
+                await self.websocket.send_text(json.dumps(frame, default=str))
+            except (WebSocketDisconnect, RuntimeError):
+                return
+
+    async def _heartbeat(self) -> Tuple[int, str]:
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            if time.monotonic() - self.last_seen > settings.WS_HEARTBEAT_TIMEOUT:
+                return status.WS_1008_POLICY_VIOLATION, "Heartbeat timeout"
+            await self.send({"type": "ping"})
+
+    async def run(self) -> None:
+        tasks = [
+            asyncio.create_task(self._read(), name="ws-read"),
+            asyncio.create_task(self._write(), name="ws-write"),
+            asyncio.create_task(self._answer(), name="ws-answer"),
+            asyncio.create_task(self._heartbeat(), name="ws-heartbeat"),
+        ]
+        close: Optional[Tuple[int, str]] = None
+        try:
+            await self.send({"type": "session", "conversation_id": self.conversation_id})
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finished = done.pop()
+            error = finished.exception()
+            if isinstance(error, SlowConsumerError):
+                close = (status.WS_1008_POLICY_VIOLATION, str(error))
+            elif error:
+                logger.error(f"Chat session {self.conversation_id} failed: {error}")
+                close = (status.WS_1011_INTERNAL_ERROR, "Internal error")
+            else:
+                close = finished.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.wait(tasks)
+            await run_in_threadpool(self._close_db)
+        logger.info(f"Chat session {self.conversation_id} ended after {self.turns} turns")
+        if close:
+            try:
+                await self.websocket.close(*close)
+            except RuntimeError:
+                pass
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, conversation_id: Optional[str] = None):
+    """Multi-turn chat over one socket; see the module docstring for the protocol."""
+    await websocket.accept()
+    session = ChatSession(
+        websocket,
+        conversation_id or str(uuid.uuid4()),
+        websocket.client.host if websocket.client else None,
+    )
+    await session.run()
@@ -0,0 +1,127 @@
+"""
+Debug endpoints: trace waterfalls of past requests, event-loop health and
+on-demand profiling.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List, Optional
+import hmac
+from ..core.config import settings
+from ..core.tracing import tracer
+from ..core.loop_monitor import get_loop_monitor
+from ..core.profiler import ProfilerBusyError, get_profiler_service
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+WATERFALL_WIDTH = 60
+
+def _waterfall(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Order the spans of a trace depth-first, with offsets relative to the root."""
+    children: Dict[Any, List[Dict[str, Any]]] = {}
+    for span in spans:
+        children.setdefault(span["parentSpanId"], []).append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: s["startTimeUnixNano"])
+
+    root = children[None][0]
+    rows = []
+
+    def visit(span: Dict[str, Any], depth: int):
+        rows.append({
+            "name": span["name"],
+            "depth": depth,
+            "offset_ms": (span["startTimeUnixNano"] - root["startTimeUnixNano"]) / 1e6,
+            "duration_ms": (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6,
+            "status": span["status"],
+            "attributes": span["attributes"],
+        })
+        for child in children.get(span["spanId"], []):
+            visit(child, depth + 1)
+
+    visit(root, 0)
+    return {
+        "trace_id": root["traceId"],
+        "started_at_ns": root["startTimeUnixNano"],
+        "duration_ms": rows[0]["duration_ms"],
+        "spans": rows,
+    }
+
+def _render_text(traces: List[Dict[str, Any]]) -> str:
+    lines = []
+    for trace in traces:
+        total = trace["duration_ms"] or 1.0
+        lines.append(f"trace {trace['trace_id']} ({trace['duration_ms']:.1f} ms)")
+        for row in trace["spans"]:
+            start = int(row["offset_ms"] / total * WATERFALL_WIDTH)
+            width = max(1, int(row["duration_ms"] / total * WATERFALL_WIDTH))
+            label = "  " * row["depth"] + row["name"]
+            detail = row["attributes"].get("agent") or row["attributes"].get("tool") or ""
+            bar = " " * start + "#" * width
+            lines.append(f"{label:<28} {detail:<20} |{bar:<{WATERFALL_WIDTH}}| {row['duration_ms']:8.1f} ms")
+        lines.append("")
+    return "\n".join(lines)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the configured admin token."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/traces/{conversation_id}", dependencies=[Depends(require_admin)])
+def get_conversation_traces(conversation_id: str, format: str = "json", limit: int = Query(50, ge=1, le=500)):
+    """
+    Waterfall of the latest `limit` sampled request traces of a conversation
+    (`format=text` renders it as text bars).
+    """
+    if not tracer.exporter:
+        raise HTTPException(status_code=404, detail="Tracing is disabled")
+    traces = [
+        _waterfall(spans) for spans in tracer.exporter.read_traces("conversation_id", conversation_id, limit=limit)
+    ]
+    if not traces:
+        raise HTTPException(status_code=404, detail="No sampled traces for this conversation")
+    traces.sort(key=lambda t: t["started_at_ns"])
+
+    if format == "text":
+        return PlainTextResponse(_render_text(traces))
+    return {"conversation_id": conversation_id, "traces": traces}
+
+@router.get("/loop", dependencies=[Depends(require_admin)])
+def get_loop_report(limit: int = 10, reset: bool = False):
+    """
+    Event-loop lag histogram and the code that blocked the loop the longest,
+    with its stack. `reset=true` clears the counters after reading them.
+    """
+    monitor = get_loop_monitor()
+    if not monitor:
+        raise HTTPException(status_code=404, detail="Event-loop monitor is disabled")
+    report = {
+        **monitor.summary(),
+        "lag_histogram": monitor.histogram(),
+        "top_offenders": monitor.top_offenders(limit),
+    }
+    if reset:
+        monitor.reset()
+    return report
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = Query(5, gt=0, le=settings.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=100),
+    top: int = Query(20, ge=1, le=200),
+    format: str = "json",
+):
+    """
+    Sample every thread and asyncio task of this worker for `seconds` and return
+    collapsed stacks plus the hottest functions. One profile runs at a time.
+    `format=collapsed` returns the thread stacks as flamegraph input.
+    """
+    try:
+        result = await get_profiler_service(settings.PROFILE_MAX_SECONDS).profile(seconds, interval_ms / 1000, top)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed_threads"])
+    return result
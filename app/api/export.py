@@ -0,0 +1,179 @@
+"""
+Streaming export of conversation turns joined with their feedback.
+
+Rows are read through a server-side cursor (`stream_results` + `yield_per`)
+one partition at a time and each partition is encoded and yielded before
+the next one is fetched, so memory stays constant whatever the row count.
+Output is NDJSON, or Parquet / Arrow IPC when pyarrow is installed. Used by
+GET /conversations/export and by export_conversations.py.
+"""
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterator, List, Optional
+from .serialization import dumps
+from ..db.answers import resolve_answer, with_answer_blobs
+from ..db.database import SessionLocal
+from ..db.models import ConversationTurn, UserFeedback
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional: NDJSON only
+    pyarrow = None
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def export_query(since: Optional[datetime] = None, until: Optional[datetime] = None, agent: Optional[str] = None):
+    """Turns in [since, until) (optionally of one agent) with their conversation's feedback."""
+    feedback = (
+        select(
+            UserFeedback.conversation_id,
+            func.count(UserFeedback.id).label("feedback_count"),
+            func.avg(UserFeedback.rating).label("feedback_rating"),
+        )
+        .group_by(UserFeedback.conversation_id)
+        .subquery()
+    )
+    query = (
+        select(
+            ConversationTurn.conversation_id,
+            ConversationTurn.turn_index,
+            ConversationTurn.question,
+            ConversationTurn.answer,
+            ConversationTurn.agent_used,
+            ConversationTurn.processing_time,
+            ConversationTurn.tokens_used,
+            ConversationTurn.input_tokens,
+            ConversationTurn.cached_tokens,
+            ConversationTurn.output_tokens,
+            ConversationTurn.cost,
+            ConversationTurn.cached,
+            ConversationTurn.created_at,
+            func.coalesce(feedback.c.feedback_count, 0).label("feedback_count"),
+            feedback.c.feedback_rating,
+        )
+        .outerjoin(feedback, feedback.c.conversation_id == ConversationTurn.conversation_id)
+        .order_by(ConversationTurn.created_at, ConversationTurn.id)
+    )
+    query = with_answer_blobs(query)
+    if since:
+        query = query.where(ConversationTurn.created_at >= since)
+    if until:
+        query = query.where(ConversationTurn.created_at < until)
+    if agent:
+        query = query.where(ConversationTurn.agent_used == agent)
+    return query
+
+def iter_partitions(db: Session, query, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Fetch the query in partitions of `chunk_size` rows through a server-side cursor."""
+    result = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+    for partition in result.mappings().partitions():
+        rows = [resolve_answer(dict(row)) for row in partition]
+        for row in rows:
+            # avg() is a Decimal on PostgreSQL
+            if row["feedback_rating"] is not None:
+                row["feedback_rating"] = float(row["feedback_rating"])
+        yield rows
+
+def ndjson_chunks(partitions: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for rows in partitions:
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+class _ChunkSink:
+    """Write-only file object whose content is drained after every batch."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _arrow_schema():
+    return pyarrow.schema([
+        ("conversation_id", pyarrow.string()),
+        ("turn_index", pyarrow.int32()),
+        ("question", pyarrow.string()),
+        ("answer", pyarrow.string()),
+        ("agent_used", pyarrow.string()),
+        ("processing_time", pyarrow.float64()),
+        ("tokens_used", pyarrow.int64()),
+        ("input_tokens", pyarrow.int64()),
+        ("cached_tokens", pyarrow.int64()),
+        ("output_tokens", pyarrow.int64()),
+        ("cost", pyarrow.float64()),
+        ("cached", pyarrow.bool_()),
+        ("created_at", pyarrow.timestamp("us", tz="UTC")),
+        ("feedback_count", pyarrow.int64()),
+        ("feedback_rating", pyarrow.float64()),
+    ])
+
+def columnar_chunks(partitions: Iterator[List[Dict[str, Any]]], export_format: str) -> Iterator[bytes]:
+    """Parquet (one row group per partition) or Arrow IPC stream (one record batch per partition)."""
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    try:
+        for rows in partitions:
+            batch = pyarrow.RecordBatch.from_pylist(rows, schema=schema)
+            if export_format == "parquet":
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def check_format(export_format: str) -> None:
+    """Raise ValueError for unknown formats or columnar formats without pyarrow."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'; available: {list(EXPORT_FORMATS)}")
+    if export_format != "ndjson" and pyarrow is None:
+        raise ValueError(f"{export_format} export requires the pyarrow package")
+
+def export_chunks(db: Session, export_format: str, chunk_size: int = 1000, **filters) -> Iterator[bytes]:
+    """Encoded export of the turns matching `filters`, one chunk per partition."""
+    check_format(export_format)
+    partitions = iter_partitions(db, export_query(**filters), chunk_size)
+    if export_format == "ndjson":
+        return ndjson_chunks(partitions)
+    return columnar_chunks(partitions, export_format)
+
+def stream_export(export_format: str, chunk_size: int = 1000, **filters) -> Iterator[bytes]:
+    """
+    export_chunks() on a session of its own, held for as long as the stream
+    is consumed (the request-scoped session may be closed before the body is sent).
+    """
+    db = SessionLocal()
+    try:
+        yield from export_chunks(db, export_format, chunk_size, **filters)
+    finally:
+        db.close()
@@ -0,0 +1,149 @@
+"""
+Idempotency-key handling for /ask.
+
+A request carrying an `Idempotency-Key` header is executed at most once:
+repeats get the stored response (from Redis or the idempotency_keys table)
+or wait for the run already in flight, without invoking the model again.
+"""
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from .models import QuestionRequest, AgentResponse
+from ..db.models import IdempotencyRecord
+from ..core.normalize import question_digest
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = 86400  # 24 ore
+# Namespace of the conversation ids derived from idempotency keys
+_CONVERSATION_NAMESPACE = uuid.UUID("6f1c1d1e-3c0a-4a55-9a8e-1b7f0c2d9e41")
+
+def new_conversation_id(idempotency_key: Optional[str] = None) -> str:
+    """
+    Id for a request that starts a new conversation. With an idempotency key it
+    is derived from the key, so a retry gets the same id (and fingerprint)
+    instead of a fresh random one.
+    """
+    if idempotency_key:
+        return str(uuid.uuid5(_CONVERSATION_NAMESPACE, idempotency_key))
+    return str(uuid.uuid4())
+
+def request_fingerprint(request: QuestionRequest) -> str:
+    """Fingerprint of the parts of a request that must match on a retry."""
+    return hashlib.sha256(f"{request.conversation_id or ''}:{question_digest(request.question)}".encode()).hexdigest()
+
+class IdempotencyManager:
+    """Deduplicates requests by idempotency key, within and across processes."""
+
+    def __init__(self, redis_client: Optional[Callable[[], Any]] = None, lock_timeout: float = 120,
+                 poll_interval: float = 0.25):
+        # Called on every use, so the client can be created lazily (see service.get_redis_client)
+        self._redis_client = redis_client or (lambda: None)
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def redis_client(self):
+        return self._redis_client()
+
+    def _redis_key(self, key: str) -> str:
+        return f"idempotency:{key}"
+
+    def lookup(self, key: str, fingerprint: str, db: Session) -> Optional[AgentResponse]:
+        """Return the stored response for a key, checking it was issued for the same request."""
+        stored = None
+        if self.redis_client:
+            try:
+                stored = self.redis_client.get(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"Idempotency cache read error: {e}")
+        if stored:
+            record_fingerprint, _, response_json = stored.decode().partition("\n")
+        else:
+            record = db.get(IdempotencyRecord, key)
+            if not record:
+                return None
+            record_fingerprint, response_json = record.request_fingerprint, record.response
+
+        if record_fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        return AgentResponse.model_validate_json(response_json)
+
+    def remember(self, key: str, fingerprint: str, response: AgentResponse) -> None:
+        """Cache a stored response in Redis (the DB record is written with the turn)."""
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.setex(
+                self._redis_key(key),
+                IDEMPOTENCY_TTL,
+                f"{fingerprint}\n{response.model_dump_json()}",
+            )
+        except Exception as e:
+            logger.warning(f"Idempotency cache write error: {e}")
+
+    def _acquire_lock(self, key: str) -> bool:
+        if not self.redis_client:
+            return True
+        try:
+            return bool(self.redis_client.set(f"{self._redis_key(key)}:lock", "1", nx=True, ex=int(self.lock_timeout)))
+        except Exception as e:
+            logger.warning(f"Idempotency lock error, continuing without lock: {e}")
+            return True
+
+    def _release_lock(self, key: str) -> None:
+        if self.redis_client:
+            try:
+                self.redis_client.delete(f"{self._redis_key(key)}:lock")
+            except Exception as e:
+                logger.warning(f"Idempotency unlock error: {e}")
+
+    async def _wait_for_other_process(self, key: str, fingerprint: str, db: Session) -> AgentResponse:
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            db.expire_all()
+            response = self.lookup(key, fingerprint, db)
+            if response:
+                return response
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    async def run(self, key: str, request: QuestionRequest, db: Session,
+                  producer: Callable[[], Awaitable[AgentResponse]]) -> AgentResponse:
+        """Return the response for `key`, running `producer` only if no run exists yet."""
+        fingerprint = request_fingerprint(request)
+
+        response = self.lookup(key, fingerprint, db)
+        if response:
+            logger.info(f"Replaying stored response for idempotency key {key}")
+            return response
+
+        in_flight = self._in_flight.get(key)
+        if in_flight:
+            logger.info(f"Waiting on in-flight run for idempotency key {key}")
+            return await asyncio.shield(in_flight)
+
+        if not self._acquire_lock(key):
+            return await self._wait_for_other_process(key, fingerprint, db)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await producer()
+            self.remember(key, fingerprint, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else HTTPException(status_code=499, detail="Request cancelled"))
+            # Waiters re-raise it; avoid "exception was never retrieved" when there are none
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+            self._release_lock(key)
@@ -0,0 +1,66 @@
+"""
+Wiring between the job queue/worker pool and the question pipeline.
+"""
+from typing import Any, Dict, Optional
+import logging
+from .models import QuestionRequest
+from .service import answer_question
+from ..core.config import settings
+from ..core.jobs import CallbackPolicy, JobQueue, JobWorkerPool, create_job_queue
+from ..core.tracing import tracer
+from ..db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+job_queue: Optional[JobQueue] = None
+job_pool: Optional[JobWorkerPool] = None
+
+async def process_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued question through the normal /ask pipeline."""
+    # The payload is the stored job's own dict: a rerun after a crash must see it unchanged
+    payload = dict(payload)
+    user_ip = payload.pop("user_ip", None)
+    idempotency_key = payload.pop("idempotency_key", None)
+    request = QuestionRequest(**payload)
+    db = SessionLocal()
+    try:
+        with tracer.start_trace("job"):
+            response = await answer_question(request, db, user_ip=user_ip, idempotency_key=idempotency_key)
+        return response.model_dump()
+    finally:
+        db.close()
+
+def get_job_queue() -> Optional[JobQueue]:
+    return job_queue
+
+def get_callback_policy() -> CallbackPolicy:
+    return CallbackPolicy(
+        allowed_hosts=[host.strip().lower() for host in settings.JOB_CALLBACK_ALLOWED_HOSTS.split(",") if host.strip()],
+        allow_http=settings.JOB_CALLBACK_ALLOW_HTTP,
+        allow_private=settings.JOB_CALLBACK_ALLOW_PRIVATE,
+    )
+
+async def start_job_workers() -> None:
+    """Create the configured job queue and start the worker pool."""
+    global job_queue, job_pool
+    job_queue = create_job_queue(
+        settings.JOB_QUEUE_BACKEND,
+        redis_url=settings.REDIS_URL,
+        result_ttl=settings.JOB_RESULT_TTL,
+    )
+    job_pool = JobWorkerPool(
+        job_queue,
+        process_job,
+        concurrency=settings.JOB_WORKERS,
+        webhook_timeout=settings.JOB_WEBHOOK_TIMEOUT,
+        callback_policy=get_callback_policy(),
+    )
+    job_pool.start()
+    logger.info(f"Job queue initialized ({settings.JOB_QUEUE_BACKEND} backend)")
+
+async def stop_job_workers() -> None:
+    global job_queue, job_pool
+    if job_pool:
+        await job_pool.stop()
+    job_queue = None
+    job_pool = None
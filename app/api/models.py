@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
@@ -6,31 +6,76 @@ class QuestionRequest(BaseModel):
     question: str
     context: Optional[Dict[str, Any]] = Field(default_factory=dict)
     conversation_id: Optional[str] = None
+    fan_out: bool = Field(False, description="Split cross-domain questions across specialists running in parallel")
 
 class AgentResponse(BaseModel):
     answer: str
     agent_used: str
     conversation_id: Optional[str] = None
+    status: str = Field("completed", description="completed, or partial when the turn budget ran out")
     metadata: Optional[Dict[str, Any]] = None
 
 class ConversationResponse(BaseModel):
     id: str
+    turn_index: int
     question: str
     answer: str
     agent_used: str
     processing_time: Optional[float]
     tokens_used: Optional[int]
     created_at: datetime
+
+class TurnResponse(BaseModel):
+    turn_index: int
+    question: str
+    answer: str = Field(validation_alias=AliasChoices("answer_text", "answer"))
+    agent_used: str
+    processing_time: Optional[float]
+    tokens_used: Optional[int]
+    input_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cost: Optional[float] = None
+    cached: Optional[bool] = False
+    created_at: datetime
     
     class Config:
         from_attributes = True
 
+class ConversationDetailResponse(BaseModel):
+    id: str
+    turn_count: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+    turns: List[TurnResponse]
+
+class SearchHit(BaseModel):
+    turn_id: int
+    conversation_id: str
+    turn_index: int
+    question: str
+    answer: str
+    agent_used: str
+    created_at: datetime
+    rank: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
+
 class AgentMetricsResponse(BaseModel):
     agent_name: str
     questions_handled: int
     avg_processing_time: float
     total_tokens_used: int
-    success_rate: float
+    total_input_tokens: Optional[int] = 0
+    total_cached_tokens: Optional[int] = 0
+    total_output_tokens: Optional[int] = 0
+    total_cost: Optional[float] = 0.0
+    model_requests: Optional[int] = 0
+    feedback_count: Optional[int] = 0
+    avg_rating: Optional[float] = None
+    success_rate: float = Field(..., description="Percentage of feedback ratings counted as a success")
     last_updated: datetime
     
     class Config:
@@ -40,3 +85,32 @@ class FeedbackRequest(BaseModel):
     conversation_id: str
     rating: int = Field(..., ge=1, le=5, description="Rating from 1 to 5")
     feedback_text: Optional[str] = None
+
+class BulkFeedbackRequest(BaseModel):
+    items: List[FeedbackRequest] = Field(..., min_length=1)
+
+class BulkFeedbackResponse(BaseModel):
+    accepted: int
+    unknown_conversations: List[str] = Field(default_factory=list, description="Items for these were not stored")
+
+class FeedbackBucketResponse(BaseModel):
+    agent_name: str
+    bucket_start: datetime
+    count: int
+    avg_rating: Optional[float] = None
+    success_rate: Optional[float] = None
+    histogram: Dict[str, int]
+    
+    class Config:
+        from_attributes = True
+
+class JobRequest(QuestionRequest):
+    callback_url: Optional[str] = Field(None, description="URL notified with the job result when it finishes")
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    result: Optional[AgentResponse] = None
+    error: Optional[str] = None
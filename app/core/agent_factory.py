@@ -1,7 +1,19 @@
+import hashlib
+import json
 import yaml
-from typing import Dict, List, Any, Optional
-from agents import Agent
+from typing import Dict, List, Any, Optional, Tuple
+from agents import Agent, ModelSettings
 from .tool_loader import ToolLoader
+from .fan_out import FanOutRunner
+from .speculation import SpecialistPredictor, SpeculativeRunner
+from .tiering import EscalationPolicy
+from .stub_model import StubModelProvider
+from .model_client import HedgedModel, ModelClientPool
+from .guardrails import GuardrailChecker
+from .usage import PriceTable
+from .hooks import agent_hooks
+from .config import settings
+from .executor import AgentExecutor
 from pathlib import Path
 import logging
 
@@ -16,6 +28,22 @@ class AgentFactory:
         self.tool_loader = ToolLoader()
         self.agents: Dict[str, Agent] = {}
         self.system_config = self.config.get('system', {})
+        self._load_globals()
+        self.config_fingerprint = self._fingerprint()
+        self.model_provider = StubModelProvider(settings.STUB_MODEL_LATENCY) if settings.MODEL_PROVIDER == "stub" else None
+        self.model_clients = ModelClientPool(
+            self.config.get('globals', {}).get('http', {}),
+            request_timeout=self.timeout,
+            api_key=settings.OPENAI_API_KEY,
+        )
+        self._models: Dict[Tuple[str, Optional[str]], Any] = {}
+        self.escalation_policies: Dict[str, EscalationPolicy] = {}
+        self.tier_variants: Dict[str, Dict[str, Agent]] = {}
+        self._agent_tiers: Dict[int, str] = {}
+        self.guardrails: Dict[str, GuardrailChecker] = {}
+        self.fan_out_runner: Optional[FanOutRunner] = None
+        self.speculative_runner: Optional[SpeculativeRunner] = None
+        self.executor = AgentExecutor(self)
         
     def _load_config(self) -> Dict[str, Any]:
         """Load YAML configuration file."""
@@ -32,6 +60,33 @@ class AgentFactory:
             logger.error(f"Failed to load config from {self.config_path}: {e}")
             raise
     
+    def _fingerprint(self) -> str:
+        """
+        Hash of the configuration that shapes answers (agents, tools, guardrails,
+        models, and the model provider); transport and system settings are left out.
+        Cached answers are keyed by it, so a config change starts a fresh cache.
+        """
+        globals_config = {
+            key: value for key, value in self.config.get('globals', {}).items()
+            if key not in ('http', 'hedging')
+        }
+        relevant = {
+            'globals': globals_config,
+            'tools': self.config.get('tools'),
+            'guardrails': self.config.get('guardrails'),
+            'agents': self.config.get('agents'),
+            'provider': settings.MODEL_PROVIDER,
+        }
+        return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    
+    def _load_globals(self):
+        """Read run limits and model tiers from the globals section."""
+        globals_config = self.config.get('globals', {})
+        self.max_turns: int = globals_config.get('max_turns', 10)
+        self.prices = PriceTable.from_config(self.config.get('pricing', {}))
+        self.timeout: Optional[float] = globals_config.get('timeout')
+        self.model_tiers: Dict[str, str] = globals_config.get('model_tiers', {})
+    
     def _discover_tools(self):
         """Discover all available tools using auto-discovery."""
         if self.config.get('tools', {}).get('auto_discover', True):
@@ -43,6 +98,7 @@ class AgentFactory:
         
         agents_config = self.config.get('agents', {})
         globals_config = self.config.get('globals', {})
+        self._create_guardrails(globals_config)
         
         # First pass: create all agents without handoffs
         for agent_id, agent_config in agents_config.items():
@@ -60,14 +116,16 @@ class AgentFactory:
         
         # Second pass: configure handoffs after all agents are created
         self._configure_handoffs(agents_config)
+        self._validate_turn_budget(agents_config)
+        self._create_tier_variants(agents_config)
+        
+        self.fan_out_runner = self._create_fan_out_runner(agents_config, globals_config)
+        self.speculative_runner = self._create_speculative_runner(agents_config)
         
         return self.agents
     
     def _create_single_agent(self, agent_id: str, config: Dict[str, Any], globals_config: Dict[str, Any]) -> Agent:
         """Create a single agent instance."""
-        # Merge global config with agent-specific config
-        merged_config = {**globals_config, **config}
-        
         # Get tools for this agent
         tool_names = config.get('tools', [])
         tools = self.tool_loader.get_tools_by_names(tool_names)
@@ -77,16 +135,122 @@ class AgentFactory:
         elif tools:
             logger.info(f"Agent {agent_id} configured with {len(tools)} tools: {tool_names}")
         
+        batched = self._create_batched_tools(agent_id, config)
+        tools = tools + batched
+        
+        # The entry agent's guardrails run in AgentExecutor, concurrently with the whole request;
+        # other agents get them as SDK input guardrails (run when they are the starting agent)
+        input_guardrails = []
+        if not config.get('is_default', False):
+            input_guardrails = [checker.as_input_guardrail() for checker in self._guardrails_for(agent_id, config)]
+        
         # Create the agent
         agent = Agent(
             name=config['name'],
+            handoff_description=config.get('description'),
             instructions=config['instructions'],
             tools=tools,
-            model=merged_config.get('model', 'gpt-4'),
+            model=self._resolve_model(self._model_name(config, globals_config), config.get('base_url')),
+            model_settings=self._create_model_settings(config, globals_config),
+            input_guardrails=input_guardrails,
+            hooks=agent_hooks,
         )
         
+        self._agent_tiers[id(agent)] = config.get('model_tier')
         return agent
     
+    def _batch_tool_names(self, config: Dict[str, Any]) -> List[str]:
+        """Tools of the agent that get a `<tool>_many` variant: `batch_tools: true` (all eligible) or a list."""
+        batch_tools = config.get('batch_tools', False)
+        tool_names = config.get('tools', [])
+        if batch_tools is True:
+            return [name for name in tool_names if self.tool_loader.is_batchable(name)]
+        return [name for name in (batch_tools or []) if name in tool_names]
+    
+    def _create_batched_tools(self, agent_id: str, config: Dict[str, Any]) -> List[Any]:
+        names = self._batch_tool_names(config)
+        if not names:
+            return []
+        batching = self.config.get('tools', {}).get('batching', {})
+        tools = self.tool_loader.get_batched_tools(
+            names,
+            max_items=batching.get('max_items', 20),
+            concurrency=batching.get('concurrency', 8),
+        )
+        logger.info(f"Agent {agent_id} configured with batched tools: {[tool.name for tool in tools]}")
+        return tools
+    
+    def _create_guardrails(self, globals_config: Dict[str, Any]):
+        """Create one cached checker per guardrail defined in the guardrails section."""
+        self.guardrails = {}
+        for name, config in self.config.get('guardrails', {}).items():
+            if not config.get('enabled', True):
+                continue
+            model = self._resolve_model(self._model_name(config, globals_config))
+            self.guardrails[name] = GuardrailChecker(name, config, model)
+            logger.info(f"Created guardrail: {name}")
+    
+    def _guardrails_for(self, agent_id: str, config: Dict[str, Any]) -> List[GuardrailChecker]:
+        checkers = []
+        for name in config.get('guardrails', []):
+            if name in self.guardrails:
+                checkers.append(self.guardrails[name])
+            else:
+                logger.warning(f"Guardrail {name} not found (or disabled) for agent {agent_id}")
+        return checkers
+    
+    def get_agent_guardrails(self, agent_id: Optional[str]) -> List[GuardrailChecker]:
+        """Get the guardrail checkers configured for an agent."""
+        config = self.config.get('agents', {}).get(agent_id, {}) if agent_id else {}
+        return [self.guardrails[name] for name in config.get('guardrails', []) if name in self.guardrails]
+    
+    def _model_name(self, config: Dict[str, Any], globals_config: Dict[str, Any]) -> str:
+        """Model name for an agent: its tier's model, its own model, or the global default."""
+        tier = config.get('model_tier')
+        if tier:
+            if tier not in self.model_tiers:
+                raise ValueError(f"Unknown model tier '{tier}' (known: {list(self.model_tiers)})")
+            return self.model_tiers[tier]
+        return config.get('model', globals_config.get('default_model', 'gpt-4'))
+    
+    def _resolve_model(self, model_name: str, base_url: Optional[str] = None):
+        """
+        Map a model name to the Model instance agents run on: the stub model, or
+        a model on the shared pooled client for its base URL, hedged if enabled.
+        Instances are shared so hedging sees the latency of every agent using them.
+        """
+        if self.model_provider:
+            return self.model_provider.get_model(model_name)
+        
+        key = (model_name, base_url)
+        if key not in self._models:
+            model = self.model_clients.create_model(model_name, base_url=base_url)
+            hedging_config = self.config.get('globals', {}).get('hedging', {})
+            if hedging_config.get('enabled', False):
+                model = HedgedModel(model, hedging_config)
+            self._models[key] = model
+        return self._models[key]
+    
+    def get_hedging_stats(self) -> Dict[str, Any]:
+        """Get hedging counters per model."""
+        return {
+            f"{model_name}@{base_url or 'default'}": model.stats()
+            for (model_name, base_url), model in self._models.items()
+            if isinstance(model, HedgedModel)
+        }
+    
+    async def aclose(self):
+        """Close the pooled model clients."""
+        await self.model_clients.close()
+        self._models.clear()
+    
+    def _create_model_settings(self, config: Dict[str, Any], globals_config: Dict[str, Any]) -> ModelSettings:
+        """Build model settings from agent config, falling back to globals."""
+        return ModelSettings(
+            temperature=config.get('temperature', globals_config.get('default_temperature')),
+            max_tokens=config.get('max_tokens', globals_config.get('max_tokens')),
+        )
+    
     def _configure_handoffs(self, agents_config: Dict[str, Any]):
         """Configure handoffs between agents."""
         for agent_id, config in agents_config.items():
@@ -104,13 +268,142 @@ class AgentFactory:
                     self.agents[agent_id].handoffs = handoff_agents
                     logger.info(f"Agent {agent_id} configured with {len(handoff_agents)} handoffs")
     
-    def get_default_agent(self) -> Optional[Agent]:
-        """Get the default agent (usually triage)."""
+    def _create_tier_variants(self, agents_config: Dict[str, Any]):
+        """Create one clone per escalation tier for agents with an escalation policy."""
+        for agent_id, config in agents_config.items():
+            escalation_config = config.get('escalation', {})
+            if agent_id not in self.agents or not escalation_config.get('enabled', False):
+                continue
+            
+            policy = EscalationPolicy.from_config(escalation_config)
+            unknown = [tier for tier in policy.tiers if tier not in self.model_tiers]
+            if unknown:
+                raise ValueError(f"Agent {agent_id} escalates to unknown tiers {unknown}")
+            
+            base_agent = self.agents[agent_id]
+            variants = {}
+            for tier in policy.tiers:
+                if tier == config.get('model_tier'):
+                    variants[tier] = base_agent
+                else:
+                    # clone() keeps instructions, tools, handoffs and model settings
+                    variants[tier] = base_agent.clone(
+                        model=self._resolve_model(self.model_tiers[tier], config.get('base_url'))
+                    )
+                    self._agent_tiers[id(variants[tier])] = tier
+            
+            self.escalation_policies[agent_id] = policy
+            self.tier_variants[agent_id] = variants
+            logger.info(f"Agent {agent_id} escalates through tiers {policy.tiers}")
+    
+    def get_agent_tier(self, agent: Agent) -> Optional[str]:
+        """Get the model tier an agent instance runs on, if it was built from a tier."""
+        return self._agent_tiers.get(id(agent))
+    
+    def get_tier_variant(self, agent_id: str, tier: str) -> Optional[Agent]:
+        """Get the clone of an agent that runs on the given tier."""
+        return self.tier_variants.get(agent_id, {}).get(tier)
+    
+    def get_agent_id(self, agent_name: str) -> Optional[str]:
+        """Get the configuration ID of an agent from its display name."""
+        for agent_id, agent in self.agents.items():
+            if agent.name == agent_name:
+                return agent_id
+        return None
+    
+    def _validate_turn_budget(self, agents_config: Dict[str, Any]):
+        """
+        Check the handoff graph against the turn budget: every reachable chain
+        of handoffs must fit in max_turns, and handoff cycles are rejected.
+        """
+        def min_turns(agent_id: str, path: List[str]) -> int:
+            if agent_id in path:
+                raise ValueError(f"Handoff cycle detected: {' -> '.join(path + [agent_id])}")
+            config = agents_config[agent_id]
+            # One model call for the agent itself, one more to answer after tool calls
+            own_turns = 2 if config.get('tools') else 1
+            targets = [h for h in config.get('handoffs', []) if h in self.agents]
+            if not targets:
+                return own_turns
+            # A handoff costs one turn of the handing-off agent
+            return max(own_turns, max(1 + min_turns(target, path + [agent_id]) for target in targets))
+        
+        for agent_id in self.agents:
+            required = min_turns(agent_id, [])
+            if required > self.max_turns:
+                raise ValueError(
+                    f"Agent {agent_id} needs at least {required} turns through its handoffs, "
+                    f"but globals.max_turns is {self.max_turns}"
+                )
+        logger.info(f"Handoff graph fits within max_turns={self.max_turns}")
+    
+    def _create_fan_out_runner(self, agents_config: Dict[str, Any], globals_config: Dict[str, Any]) -> Optional[FanOutRunner]:
+        """Create the fan-out runner for the default agent, if enabled in its config."""
+        default_id = self.get_default_agent_id()
+        if not default_id:
+            return None
+        
+        default_config = agents_config[default_id]
+        fan_out_config = default_config.get('fan_out', {})
+        if not fan_out_config.get('enabled', False):
+            return None
+        
+        specialist_ids = [agent_id for agent_id in default_config.get('handoffs', []) if agent_id in self.agents]
+        specialists = {agent_id: self.agents[agent_id] for agent_id in specialist_ids}
+        descriptions = {agent_id: agents_config[agent_id].get('description', '') for agent_id in specialist_ids}
+        
+        # Planner and merger use the fan_out model/model_tier, or the default agent's model
+        model_source = fan_out_config if ('model' in fan_out_config or 'model_tier' in fan_out_config) else default_config
+        runner_config = {**fan_out_config, 'model': self._resolve_model(self._model_name(model_source, globals_config))}
+        logger.info(f"Fan-out enabled for {default_id} across {specialist_ids}")
+        return FanOutRunner(specialists, descriptions, runner_config, max_turns=self.max_turns)
+    
+    def _create_speculative_runner(self, agents_config: Dict[str, Any]) -> Optional[SpeculativeRunner]:
+        """Create the speculative runner for the default agent, if enabled in its config."""
+        default_id = self.get_default_agent_id()
+        if not default_id:
+            return None
+        
+        speculation_config = agents_config[default_id].get('speculation', {})
+        if not speculation_config.get('enabled', False):
+            return None
+        
+        specialist_ids = [agent_id for agent_id in agents_config[default_id].get('handoffs', []) if agent_id in self.agents]
+        specialist_configs = {agent_id: agents_config[agent_id].get('speculation', {}) for agent_id in specialist_ids}
+        keywords = {agent_id: config.get('keywords', []) for agent_id, config in specialist_configs.items()}
+        
+        predictor = SpecialistPredictor(keywords, history_weight=speculation_config.get('history_weight', 0.2))
+        logger.info(f"Speculative execution enabled for {default_id} across {specialist_ids}")
+        return SpeculativeRunner(
+            {agent_id: self.agents[agent_id] for agent_id in specialist_ids},
+            specialist_configs,
+            predictor,
+            max_turns=self.max_turns,
+            max_wasted_work_ratio=speculation_config.get('max_wasted_work_ratio', 0.3),
+            min_samples=speculation_config.get('min_samples', 20),
+            probe_rate=speculation_config.get('probe_rate', 0.05),
+        )
+    
+    def get_speculative_runner(self) -> Optional[SpeculativeRunner]:
+        """Get the speculative runner, or None if speculation is disabled."""
+        return self.speculative_runner
+    
+    def get_fan_out_runner(self) -> Optional[FanOutRunner]:
+        """Get the fan-out runner, or None if fan-out is disabled."""
+        return self.fan_out_runner
+    
+    def get_default_agent_id(self) -> Optional[str]:
+        """Get the ID of the default agent."""
         for agent_id, config in self.config.get('agents', {}).items():
             if config.get('is_default', False) and agent_id in self.agents:
-                return self.agents.get(agent_id)
+                return agent_id
         return None
     
+    def get_default_agent(self) -> Optional[Agent]:
+        """Get the default agent (usually triage)."""
+        default_id = self.get_default_agent_id()
+        return self.agents.get(default_id) if default_id else None
+    
     def get_agent(self, agent_id: str) -> Optional[Agent]:
         """Get a specific agent by ID."""
         return self.agents.get(agent_id)
@@ -133,6 +426,7 @@ class AgentFactory:
             "type": agent_config.get('type', 'unknown'),
             "description": agent_config.get('description', ''),
             "tools": agent_config.get('tools', []),
+            "batch_tools": self._batch_tool_names(agent_config),
             "handoffs": agent_config.get('handoffs', []),
             "enabled": agent_config.get('enabled', True),
             "is_default": agent_config.get('is_default', False)
@@ -146,6 +440,13 @@ class AgentFactory:
         """Reload configuration (for future hot-reload implementations)."""
         logger.info("Reloading configuration...")
         self.config = self._load_config()
+        self.system_config = self.config.get('system', {})
+        self._load_globals()
+        # Cached answers of the previous configuration are no longer served
+        self.config_fingerprint = self._fingerprint()
         self.agents.clear()
+        self.escalation_policies.clear()
+        self.tier_variants.clear()
+        self._agent_tiers.clear()
         self.create_agents()
         logger.info("Configuration reloaded successfully")
@@ -0,0 +1,251 @@
+"""
+Execution of a question against the agent graph built by AgentFactory.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from agents import ItemHelpers, MaxTurnsExceeded, Runner
+from openai.types.responses import ResponseTextDeltaEvent
+from .tiering import TierStats
+from .guardrails import run_with_guardrails
+from .usage import UsageTracker, current_tracker, run_id, start_tracking
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RunOutcome:
+    """Final answer of a question plus the runs that produced it."""
+    final_output: str
+    agent_used: str
+    results: List[Any] = field(default_factory=list)
+    branches: List[Any] = field(default_factory=list)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    status: str = "completed"
+    usage: Optional[UsageTracker] = None
+
+class RunTimeoutError(Exception):
+    """Raised when a question does not complete within its end-to-end deadline."""
+
+# Receives the answer text as the model generates it
+DeltaCallback = Callable[[str], Awaitable[None]]
+
+class _HeldDeltas:
+    """Delta callback that holds the text back until `release()`, then forwards it as it comes."""
+
+    def __init__(self, on_delta: DeltaCallback):
+        self.on_delta = on_delta
+        self.held: List[str] = []
+        self.released = False
+
+    async def __call__(self, text: str) -> None:
+        if self.released:
+            await self.on_delta(text)
+        else:
+            self.held.append(text)
+
+    async def release(self) -> None:
+        # Deltas arriving while the held text is being sent join the next batch
+        while self.held:
+            text = "".join(self.held)
+            self.held.clear()
+            await self.on_delta(text)
+        self.released = True
+
+class AgentExecutor:
+    """Runs questions through the default agent, with optional fan-out and speculative execution."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.tier_stats = TierStats()
+
+    async def run(self, question: str, context: Optional[Dict[str, Any]] = None, fan_out: bool = False,
+                  on_delta: Optional[DeltaCallback] = None) -> RunOutcome:
+        """
+        Answer a question within the configured deadline (globals.timeout).
+
+        The entry agent's guardrails run concurrently with the agents; a tripped
+        guardrail cancels the run and raises GuardrailTripwireTriggered.
+
+        Raises RunTimeoutError when the deadline expires; all agent runs still in
+        flight are cancelled. When the turn budget is exhausted the text produced
+        so far is returned with status "partial", if there is any.
+
+        The token usage of every model call made for the question (including
+        guardrails, speculative and fan-out runs) is returned in `usage`.
+
+        With `on_delta`, the run of the default agent is streamed and every text
+        delta of its model responses is passed to the callback. Fan-out,
+        speculative and escalated runs are not streamed, so the final answer can
+        differ from the streamed text. While the entry agent's guardrails are
+        still checking the question, deltas are held back and sent together once
+        they pass, so a rejected question never reaches the client.
+        """
+        timeout = self.factory.timeout
+        checkers = self.factory.get_agent_guardrails(self.factory.get_default_agent_id())
+        on_pass = None
+        if on_delta and checkers:
+            on_delta = _HeldDeltas(on_delta)
+            on_pass = on_delta.release
+        tracker = start_tracking(self.factory.prices)
+        try:
+            outcome = await asyncio.wait_for(
+                run_with_guardrails(self._run(question, context, fan_out, on_delta), checkers, question, context,
+                                    on_pass=on_pass),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Question exceeded the {timeout}s deadline, run cancelled")
+            raise RunTimeoutError(f"Question did not complete within {timeout}s")
+        except MaxTurnsExceeded as e:
+            outcome = self._partial_outcome(e)
+        outcome.usage = tracker
+        return outcome
+
+    def _partial_outcome(self, error: MaxTurnsExceeded) -> RunOutcome:
+        run_data = getattr(error, 'run_data', None)
+        partial = ItemHelpers.text_message_outputs(run_data.new_items) if run_data else ""
+        if not partial:
+            raise error
+        logger.warning(f"Turn budget exhausted, returning partial answer: {error}")
+        return RunOutcome(
+            final_output=partial,
+            agent_used=run_data.last_agent.name,
+            status="partial",
+            metadata={"status_reason": str(error)},
+        )
+
+    async def _run(self, question: str, context: Optional[Dict[str, Any]], fan_out: bool,
+                   on_delta: Optional[DeltaCallback]) -> RunOutcome:
+        default_agent = self.factory.get_default_agent()
+        if not default_agent:
+            raise RuntimeError("Default agent not available")
+
+        fan_out_runner = self.factory.get_fan_out_runner() if fan_out else None
+        if fan_out_runner:
+            outcome = await self._run_fan_out(fan_out_runner, question, context)
+            if outcome:
+                return outcome
+
+        speculative_runner = self.factory.get_speculative_runner()
+        speculative = await speculative_runner.run(default_agent, question, context) if speculative_runner else None
+        if speculative:
+            result = speculative.result
+            metadata = {
+                "speculation": {
+                    "predicted": speculative.predicted,
+                    "confidence": speculative.confidence,
+                    "hit": speculative.hit,
+                    "decision_time": speculative.decision_time,
+                }
+            }
+        else:
+            if on_delta:
+                result = await self._run_streamed(default_agent, question, context, on_delta)
+            else:
+                result = await Runner.run(default_agent, question, context=context, max_turns=self.factory.max_turns)
+            metadata = {}
+            if speculative_runner:
+                speculative_runner.record_decision(result.last_agent.name)
+
+        results, escalations = await self._escalate(question, context, result)
+        if escalations:
+            metadata["escalations"] = escalations
+        return RunOutcome(
+            final_output=results[-1].final_output,
+            agent_used=results[-1].last_agent.name,
+            results=results,
+            metadata=metadata,
+        )
+
+    async def _run_streamed(self, agent: Any, question: str, context: Optional[Dict[str, Any]],
+                            on_delta: DeltaCallback) -> Any:
+        result = Runner.run_streamed(agent, question, context=context, max_turns=self.factory.max_turns)
+        try:
+            async for event in result.stream_events():
+                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                    await on_delta(event.data.delta)
+        finally:
+            # Deadline, guardrail or a failing callback: stop the run in the background too
+            if not result.is_complete:
+                result.cancel()
+        return result
+
+    def _record_tier_runs(self, result: Any) -> None:
+        """Record every hop of a run under the tier of the agent that made it."""
+        tracker = current_tracker()
+        if tracker is None:
+            return
+        agents = {item.agent.name: item.agent for item in result.new_items}
+        agents[result.last_agent.name] = result.last_agent
+        for hop in tracker.run_hops(run_id(result.context_wrapper)):
+            tier = self.factory.get_agent_tier(agents.get(hop.agent))
+            if tier:
+                self.tier_stats.record_run(tier, hop.llm_time, hop.total_tokens)
+
+    async def _escalate(self, question: str, context: Optional[Dict[str, Any]],
+                        result: Any) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Retry the question on stronger tiers while the answering agent's
+        escalation policy rejects the output. Returns every run plus a record
+        of the escalations performed.
+        """
+        results = [result]
+        escalations: List[Dict[str, Any]] = []
+        self._record_tier_runs(result)
+
+        agent = result.last_agent
+        tier = self.factory.get_agent_tier(agent)
+
+        # A router that did not hand off is judged by its own policy
+        agent_id = self.factory.get_agent_id(agent.name)
+        policy = self.factory.escalation_policies.get(agent_id)
+        while policy:
+            reason = policy.check(results[-1], agent.name)
+            next_tier = policy.next_tier(tier) if reason else None
+            if not next_tier:
+                break
+
+            logger.info(f"Escalating {agent_id} from {tier} to {next_tier}: {reason}")
+            self.tier_stats.record_escalation(tier)
+            escalations.append({"agent": agent_id, "from": tier, "to": next_tier, "reason": reason})
+
+            escalated = await Runner.run(
+                self.factory.get_tier_variant(agent_id, next_tier),
+                question,
+                context=context,
+                max_turns=self.factory.max_turns,
+            )
+            self._record_tier_runs(escalated)
+            results.append(escalated)
+            tier = next_tier
+
+        return results, escalations
+
+    async def _run_fan_out(self, fan_out_runner, question: str, context: Optional[Dict[str, Any]]) -> Optional[RunOutcome]:
+        fan_out_result = await fan_out_runner.run(question, context)
+        if not fan_out_result:
+            return None
+
+        succeeded = [b for b in fan_out_result.branches if b.succeeded]
+        return RunOutcome(
+            final_output=fan_out_result.answer,
+            agent_used=" + ".join(b.agent_name for b in succeeded),
+            results=fan_out_result.results,
+            branches=fan_out_result.branches,
+            metadata={
+                "fan_out": {
+                    "planning_time": fan_out_result.planning_time,
+                    "merge_time": fan_out_result.merge_time,
+                    "branches": [
+                        {
+                            "agent": b.agent_name,
+                            "question": b.question,
+                            "processing_time": b.processing_time,
+                            "error": b.error,
+                        }
+                        for b in fan_out_result.branches
+                    ],
+                }
+            },
+        )
@@ -0,0 +1,148 @@
+"""
+Parallel multi-specialist fan-out for cross-domain questions.
+
+A planner agent splits the question into sub-questions, one per relevant
+specialist; the specialists run concurrently and a merger agent combines
+their answers into a single reply.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from agents import Agent, Runner
+from pydantic import BaseModel
+from .hooks import agent_hooks
+
+logger = logging.getLogger(__name__)
+
+class SubQuestion(BaseModel):
+    agent_id: str
+    question: str
+
+class FanOutPlan(BaseModel):
+    sub_questions: List[SubQuestion]
+
+@dataclass
+class BranchResult:
+    """Outcome of a single specialist branch."""
+    agent_id: str
+    agent_name: str
+    question: str
+    processing_time: float
+    answer: Optional[str] = None
+    error: Optional[str] = None
+    result: Any = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+@dataclass
+class FanOutResult:
+    answer: str
+    branches: List[BranchResult]
+    planning_time: float
+    merge_time: float
+    results: List[Any] = field(default_factory=list)
+
+class FanOutRunner:
+    """Decomposes a question and runs the relevant specialists with asyncio.gather."""
+
+    def __init__(self, specialists: Dict[str, Agent], descriptions: Dict[str, str], config: Dict[str, Any],
+                 max_turns: int = 10):
+        self.specialists = specialists
+        self.max_turns = max_turns
+        self.max_branches = config.get('max_branches', 3)
+        model = config.get('model', 'gpt-4')
+
+        catalog = "\n".join(f"- {agent_id}: {descriptions.get(agent_id, '')}" for agent_id in specialists)
+        self.planner = Agent(
+            name="Fan-out Planner",
+            instructions=(
+                "Split the user question into self-contained sub-questions, one per specialist "
+                "that is needed to answer it. Only use these specialists:\n"
+                f"{catalog}\n"
+                "If a single specialist can answer the whole question, return just one sub-question."
+            ),
+            output_type=FanOutPlan,
+            model=model,
+            hooks=agent_hooks,
+        )
+        self.merger = Agent(
+            name="Fan-out Merger",
+            instructions=(
+                "You receive a user question and the answers of several specialists, each covering "
+                "part of it. Combine them into one coherent answer that addresses every part of the "
+                "question. Do not drop information and do not add facts of your own."
+            ),
+            model=model,
+            hooks=agent_hooks,
+        )
+
+    def _valid_sub_questions(self, plan: FanOutPlan) -> List[SubQuestion]:
+        """Keep sub-questions for known specialists, up to max_branches."""
+        sub_questions = [sq for sq in plan.sub_questions if sq.agent_id in self.specialists]
+        return sub_questions[:self.max_branches]
+
+    async def run(self, question: str, context: Optional[Dict[str, Any]] = None) -> Optional[FanOutResult]:
+        """
+        Fan the question out to the relevant specialists and merge their answers.
+        Returns None if the question does not span more than one specialist.
+        """
+        start_time = time.time()
+        planned = await Runner.run(self.planner, question, context=context, max_turns=self.max_turns)
+        sub_questions = self._valid_sub_questions(planned.final_output_as(FanOutPlan))
+        planning_time = time.time() - start_time
+
+        if len(sub_questions) < 2:
+            logger.info("Fan-out plan has fewer than two branches, falling back to triage")
+            return None
+
+        logger.info(f"Fanning out to {[sq.agent_id for sq in sub_questions]}")
+        branches = await asyncio.gather(*(self._run_branch(sq, context) for sq in sub_questions))
+
+        succeeded = [b for b in branches if b.succeeded]
+        if not succeeded:
+            raise RuntimeError(f"All fan-out branches failed: {[b.error for b in branches]}")
+
+        merge_start = time.time()
+        answers = "\n\n".join(f"[{b.agent_name}] {b.question}\n{b.answer}" for b in succeeded)
+        merged = await Runner.run(
+            self.merger,
+            f"Question: {question}\n\nSpecialist answers:\n\n{answers}",
+            context=context,
+            max_turns=self.max_turns,
+        )
+        merge_time = time.time() - merge_start
+
+        return FanOutResult(
+            answer=merged.final_output,
+            branches=list(branches),
+            planning_time=planning_time,
+            merge_time=merge_time,
+            results=[planned] + [b.result for b in succeeded] + [merged],
+        )
+
+    async def _run_branch(self, sub_question: SubQuestion, context: Optional[Dict[str, Any]]) -> BranchResult:
+        agent = self.specialists[sub_question.agent_id]
+        start_time = time.time()
+        try:
+            result = await Runner.run(agent, sub_question.question, context=context, max_turns=self.max_turns)
+            return BranchResult(
+                agent_id=sub_question.agent_id,
+                agent_name=agent.name,
+                question=sub_question.question,
+                processing_time=time.time() - start_time,
+                answer=result.final_output,
+                result=result,
+            )
+        except Exception as e:
+            logger.error(f"Fan-out branch {sub_question.agent_id} failed: {e}")
+            return BranchResult(
+                agent_id=sub_question.agent_id,
+                agent_name=agent.name,
+                question=sub_question.question,
+                processing_time=time.time() - start_time,
+                error=str(e),
+            )
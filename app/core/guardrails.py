@@ -0,0 +1,187 @@
+"""
+Cached input guardrails that run concurrently with the agents.
+
+Each guardrail is defined in the `guardrails:` section of agents.yaml and
+attached to agents by name. A check first consults the verdict cache (keyed
+by the normalized-question digest), then a local regex pre-filter, and only
+then the LLM guardrail agent.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from agents import Agent, GuardrailFunctionOutput, InputGuardrail, Runner
+from pydantic import BaseModel
+from .normalize import question_digest
+from .hooks import agent_hooks
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+class GuardrailVerdict(BaseModel):
+    tripwire_triggered: bool
+    reasoning: str
+
+class GuardrailTripwireTriggered(Exception):
+    """Raised when a guardrail rejects the input."""
+
+    def __init__(self, guardrail: str, verdict: GuardrailVerdict):
+        super().__init__(f"Guardrail '{guardrail}' triggered: {verdict.reasoning}")
+        self.guardrail = guardrail
+        self.verdict = verdict
+
+@dataclass
+class GuardrailStats:
+    checks: int = 0
+    cache_hits: int = 0
+    prefilter_allowed: int = 0
+    prefilter_blocked: int = 0
+    llm_checks: int = 0
+    tripped: int = 0
+    llm_latency: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "checks": self.checks,
+            "cache_hits": self.cache_hits,
+            "prefilter_allowed": self.prefilter_allowed,
+            "prefilter_blocked": self.prefilter_blocked,
+            "llm_checks": self.llm_checks,
+            "tripped": self.tripped,
+            "llm_skip_rate": 1 - self.llm_checks / self.checks if self.checks else 0.0,
+            "avg_llm_latency": self.llm_latency / self.llm_checks if self.llm_checks else 0.0,
+        }
+
+class VerdictCache:
+    """Bounded LRU of verdicts with a time-to-live."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, GuardrailVerdict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[GuardrailVerdict]:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at, verdict = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return verdict
+
+    def set(self, key: str, verdict: GuardrailVerdict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, verdict)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+class GuardrailChecker:
+    """One configured guardrail: cache, pre-filter and LLM check."""
+
+    def __init__(self, name: str, config: Dict[str, Any], model: Any):
+        self.name = name
+        self.allow_patterns = [re.compile(p, re.IGNORECASE) for p in config.get('allow_patterns', [])]
+        self.block_patterns = [re.compile(p, re.IGNORECASE) for p in config.get('block_patterns', [])]
+        self.cache = VerdictCache(config.get('cache_size', 10000), config.get('cache_ttl', 3600))
+        self.stats = GuardrailStats()
+        self.agent = Agent(
+            name=f"Guardrail: {name}",
+            instructions=(
+                f"{config['instructions'].strip()}\n"
+                "Set tripwire_triggered to true if the input must be rejected."
+            ),
+            output_type=GuardrailVerdict,
+            model=model,
+            hooks=agent_hooks,
+        )
+
+    def _prefilter(self, question: str) -> Optional[GuardrailVerdict]:
+        for pattern in self.block_patterns:
+            if pattern.search(question):
+                self.stats.prefilter_blocked += 1
+                return GuardrailVerdict(tripwire_triggered=True, reasoning=f"matched block pattern '{pattern.pattern}'")
+        for pattern in self.allow_patterns:
+            if pattern.search(question):
+                self.stats.prefilter_allowed += 1
+                return GuardrailVerdict(tripwire_triggered=False, reasoning=f"matched allow pattern '{pattern.pattern}'")
+        return None
+
+    async def check(self, question: str, context: Optional[Dict[str, Any]] = None) -> GuardrailVerdict:
+        with tracer.start_span("guardrail.check", guardrail=self.name) as span:
+            verdict, source = await self._check(question, context)
+            span.set_attribute("source", source)
+            span.set_attribute("tripwire_triggered", verdict.tripwire_triggered)
+        return verdict
+
+    async def _check(self, question: str, context: Optional[Dict[str, Any]]) -> Tuple[GuardrailVerdict, str]:
+        self.stats.checks += 1
+        key = question_digest(question)
+
+        verdict = self.cache.get(key)
+        source = "cache"
+        if verdict:
+            self.stats.cache_hits += 1
+        else:
+            verdict = self._prefilter(question)
+            source = "prefilter"
+            if not verdict:
+                start_time = time.time()
+                result = await Runner.run(self.agent, question, context=context)
+                self.stats.llm_latency += time.time() - start_time
+                self.stats.llm_checks += 1
+                verdict = result.final_output_as(GuardrailVerdict)
+                source = "llm"
+            self.cache.set(key, verdict)
+
+        if verdict.tripwire_triggered:
+            self.stats.tripped += 1
+            logger.info(f"Guardrail {self.name} triggered: {verdict.reasoning}")
+        return verdict, source
+
+    def as_input_guardrail(self) -> InputGuardrail:
+        """Expose the checker as an SDK input guardrail (used when an agent is the starting agent)."""
+        async def guardrail_function(ctx, agent, input_data):
+            question = input_data if isinstance(input_data, str) else str(input_data)
+            verdict = await self.check(question, ctx.context)
+            return GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=verdict.tripwire_triggered)
+        return InputGuardrail(guardrail_function=guardrail_function, name=self.name)
+
+async def run_with_guardrails(main: Awaitable, checkers: List[GuardrailChecker], question: str,
+                              context: Optional[Dict[str, Any]] = None,
+                              on_pass: Optional[Callable[[], Awaitable[None]]] = None) -> Any:
+    """
+    Run `main` concurrently with the guardrail checks. The first tripped
+    guardrail cancels the main run and raises GuardrailTripwireTriggered; the
+    main result is only returned once every guardrail has passed. `on_pass` is
+    awaited as soon as they have, while `main` may still be running.
+    """
+    main_task = asyncio.ensure_future(main)
+    if not checkers:
+        if on_pass:
+            await on_pass()
+        return await main_task
+
+    async def guarded_check(checker: GuardrailChecker) -> Tuple[GuardrailChecker, GuardrailVerdict]:
+        return checker, await checker.check(question, context)
+
+    guard_tasks = [asyncio.create_task(guarded_check(checker)) for checker in checkers]
+    try:
+        for next_done in asyncio.as_completed(guard_tasks):
+            checker, verdict = await next_done
+            if verdict.tripwire_triggered:
+                raise GuardrailTripwireTriggered(checker.name, verdict)
+        if on_pass:
+            await on_pass()
+        return await main_task
+    finally:
+        for task in [main_task, *guard_tasks]:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Mark errors of abandoned tasks as retrieved
+                task.exception()
@@ -0,0 +1,42 @@
+"""
+Agent hooks attached to every agent: usage accounting and tracing.
+"""
+from agents import AgentHooks
+from .tracing import tracing_hooks
+from .usage import usage_hooks
+
+class CompositeAgentHooks(AgentHooks):
+    """Forwards every agent lifecycle callback to several hooks, in order."""
+
+    def __init__(self, *hooks: AgentHooks):
+        self.hooks = hooks
+
+    async def on_start(self, context, agent) -> None:
+        for hooks in self.hooks:
+            await hooks.on_start(context, agent)
+
+    async def on_end(self, context, agent, output) -> None:
+        for hooks in self.hooks:
+            await hooks.on_end(context, agent, output)
+
+    async def on_handoff(self, context, agent, source) -> None:
+        for hooks in self.hooks:
+            await hooks.on_handoff(context, agent, source)
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        for hooks in self.hooks:
+            await hooks.on_llm_start(context, agent, system_prompt, input_items)
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        for hooks in self.hooks:
+            await hooks.on_llm_end(context, agent, response)
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        for hooks in self.hooks:
+            await hooks.on_tool_start(context, agent, tool)
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        for hooks in self.hooks:
+            await hooks.on_tool_end(context, agent, tool, result)
+
+agent_hooks = CompositeAgentHooks(usage_hooks, tracing_hooks)
@@ -0,0 +1,362 @@
+"""
+Asynchronous job queue and worker pool.
+
+Jobs are plain JSON-serializable dicts stored by id. The queue only carries
+job ids; the job record (status, payload, result) lives in the job store so
+that any worker or API process can read it back.
+
+The Redis queue does not lose jobs whose worker dies: dequeue() atomically
+moves the id (BLMOVE) into the processing list of the consuming process,
+and it is only removed (ack) once the job's final status is saved. Each
+process keeps a heartbeat key alive; recover() puts the processing entries
+of processes whose heartbeat expired back on the queue. It runs when the
+workers start and with every heartbeat.
+
+Callback URLs are supplied by clients, so the server would otherwise send
+requests wherever they point: CallbackPolicy only lets results go to https
+URLs whose host resolves to public addresses (and, optionally, is on an
+allowlist). URLs are checked when the job is submitted and again, with a
+fresh DNS lookup, before each notification; redirects are not followed.
+"""
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class CallbackURLError(ValueError):
+    """Raised for a callback URL the server must not send requests to."""
+
+@dataclass
+class CallbackPolicy:
+    """Where job results may be POSTed."""
+    allowed_hosts: List[str] = field(default_factory=list)  # empty: any host with public addresses
+    allow_http: bool = False
+    allow_private: bool = False  # loopback/private/link-local targets, for local development only
+
+    async def check(self, url: str) -> None:
+        """Raise CallbackURLError unless `url` is an allowed target."""
+        parts = urlsplit(url)
+        schemes = ("https", "http") if self.allow_http else ("https",)
+        if parts.scheme not in schemes:
+            raise CallbackURLError(f"Callback URL scheme must be {' or '.join(schemes)}")
+        if not parts.hostname:
+            raise CallbackURLError("Callback URL has no host")
+        if parts.username or parts.password:
+            raise CallbackURLError("Callback URL must not carry credentials")
+        host = parts.hostname.lower()
+        if self.allowed_hosts and host not in self.allowed_hosts:
+            raise CallbackURLError(f"Callback host {host} is not allowed")
+        if self.allow_private:
+            return
+        try:
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            addresses = await asyncio.get_running_loop().getaddrinfo(host, port)
+        except (OSError, ValueError) as e:
+            raise CallbackURLError(f"Callback host {host} cannot be resolved: {e}")
+        for *_, sockaddr in addresses:
+            address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+            if not address.is_global or address.is_multicast:
+                raise CallbackURLError(f"Callback host {host} resolves to a non-public address")
+
+class JobQueue(ABC):
+    """Base class for job queues: a FIFO of job ids plus a job store."""
+
+    @abstractmethod
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        """Pop the next job id, or None if nothing arrived within `timeout`."""
+
+    @abstractmethod
+    async def save(self, job: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    async def ack(self, job_id: str) -> None:
+        """Mark a dequeued job as finished; unacknowledged jobs may be recovered."""
+
+    async def heartbeat(self) -> None:
+        """Signal that this process is alive and still owns its dequeued jobs."""
+
+    async def recover(self) -> int:
+        """Requeue jobs dequeued by processes that died; returns how many."""
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+    def new_job(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Build a new job record in the queued state."""
+        now = _now()
+        return {
+            "job_id": str(uuid.uuid4()),
+            "status": JOB_QUEUED,
+            "payload": payload,
+            "callback_url": callback_url,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+class InMemoryJobQueue(JobQueue):
+    """In-process queue. Also used as the local fake for the Redis queue."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        await self.save(job)
+        await self._queue.put(job["job_id"])
+
+    async def dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        # Store a JSON round-trip copy so callers see the same semantics as Redis
+        self._jobs[job["job_id"]] = json.loads(json.dumps(job))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return json.loads(json.dumps(job)) if job else None
+
+class RedisJobQueue(JobQueue):
+    """
+    Redis-backed queue: a list of job ids plus one key per job record, and a
+    processing list per consuming process holding the ids it is running.
+    """
+
+    def __init__(self, client, prefix: str = "jobs", result_ttl: int = 86400, heartbeat_ttl: int = 30):
+        self.client = client
+        self.prefix = prefix
+        self.result_ttl = result_ttl
+        self.heartbeat_ttl = heartbeat_ttl
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisJobQueue":
+        import redis.asyncio as aioredis
+        return cls(aioredis.from_url(url), **kwargs)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    @property
+    def _queue_key(self) -> str:
+        return f"{self.prefix}:queue"
+
+    @property
+    def _consumers_key(self) -> str:
+        return f"{self.prefix}:consumers"
+
+    def _processing_key(self, consumer: str) -> str:
+        return f"{self.prefix}:processing:{consumer}"
+
+    def _heartbeat_key(self, consumer: str) -> str:
+        return f"{self.prefix}:heartbeat:{consumer}"
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        await self.save(job)
+        await self.client.lpush(self._queue_key, job["job_id"])
+
+    async def dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        job_id = await self.client.blmove(
+            self._queue_key, self._processing_key(self.consumer), max(1, int(timeout)), src="RIGHT", dest="LEFT",
+        )
+        if not job_id:
+            return None
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    async def ack(self, job_id: str) -> None:
+        await self.client.lrem(self._processing_key(self.consumer), 1, job_id)
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        await self.client.set(self._job_key(job["job_id"]), json.dumps(job), ex=self.result_ttl)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.client.get(self._job_key(job_id))
+        return json.loads(data) if data else None
+
+    async def heartbeat(self) -> None:
+        await self.client.sadd(self._consumers_key, self.consumer)
+        await self.client.set(self._heartbeat_key(self.consumer), "1", ex=self.heartbeat_ttl)
+
+    async def _requeue(self, consumer: str) -> int:
+        moved = 0
+        # Oldest dequeued first, back to the consuming end of the queue
+        while await self.client.lmove(self._processing_key(consumer), self._queue_key, src="RIGHT", dest="RIGHT"):
+            moved += 1
+        return moved
+
+    async def recover(self) -> int:
+        recovered = 0
+        for consumer in await self.client.smembers(self._consumers_key):
+            consumer = consumer.decode() if isinstance(consumer, bytes) else consumer
+            if consumer == self.consumer or await self.client.exists(self._heartbeat_key(consumer)):
+                continue
+            moved = await self._requeue(consumer)
+            await self.client.srem(self._consumers_key, consumer)
+            if moved:
+                logger.warning(f"Requeued {moved} jobs of stopped job consumer {consumer}")
+            recovered += moved
+        return recovered
+
+    async def close(self) -> None:
+        # Jobs interrupted by the shutdown go back to the queue for the other processes
+        await self._requeue(self.consumer)
+        await self.client.srem(self._consumers_key, self.consumer)
+        await self.client.delete(self._heartbeat_key(self.consumer))
+        await self.client.aclose()
+
+def create_job_queue(backend: str, redis_url: Optional[str] = None, result_ttl: int = 86400) -> JobQueue:
+    """Create a job queue for the configured backend ("memory" or "redis")."""
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("Redis job queue requires a redis_url")
+        return RedisJobQueue.from_url(redis_url, result_ttl=result_ttl)
+    if backend == "memory":
+        return InMemoryJobQueue()
+    raise ValueError(f"Unknown job queue backend: {backend}")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+class JobWorkerPool:
+    """Pool of worker coroutines that execute queued jobs with a handler."""
+
+    def __init__(self, queue: JobQueue, handler: JobHandler, concurrency: int = 4,
+                 webhook_timeout: float = 10.0, webhook_retries: int = 3,
+                 callback_policy: Optional[CallbackPolicy] = None, heartbeat_interval: float = 10.0):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.webhook_timeout = webhook_timeout
+        self.webhook_retries = webhook_retries
+        self.callback_policy = callback_policy or CallbackPolicy()
+        self.heartbeat_interval = heartbeat_interval
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+
+    def start(self) -> None:
+        """Spawn the worker coroutines on the running event loop."""
+        if self._running:
+            return
+        self._running = True
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._heartbeat(), name="job-heartbeat"))
+        logger.info(f"Started {self.concurrency} job workers")
+
+    async def stop(self) -> None:
+        """Cancel the workers and wait for them to exit."""
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.queue.close()
+        logger.info("Job workers stopped")
+
+    async def _heartbeat(self) -> None:
+        """Keep this process's jobs owned and requeue those of stopped processes (at start, then periodically)."""
+        while self._running:
+            try:
+                await self.queue.heartbeat()
+                await self.queue.recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job queue heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _worker(self, index: int) -> None:
+        while self._running:
+            try:
+                job_id = await self.queue.dequeue()
+                if job_id:
+                    await self.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} error: {e}")
+                await asyncio.sleep(1)
+
+    async def run_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Execute a single job and store its outcome."""
+        job = await self.queue.get(job_id)
+        if not job:
+            logger.warning(f"Job {job_id} not found (expired?)")
+            await self.queue.ack(job_id)
+            return None
+
+        job["status"] = JOB_RUNNING
+        job["updated_at"] = _now()
+        await self.queue.save(job)
+
+        try:
+            job["result"] = await self.handler(job["payload"])
+            job["status"] = JOB_COMPLETED
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            job["error"] = getattr(e, "detail", None) or str(e)
+            job["status"] = JOB_FAILED
+
+        job["updated_at"] = _now()
+        await self.queue.save(job)
+        # Only now may the job leave the processing list: a crash before this point reruns it
+        await self.queue.ack(job_id)
+
+        if job.get("callback_url"):
+            await self._notify(job)
+        return job
+
+    async def _notify(self, job: Dict[str, Any]) -> None:
+        """POST the finished job to its callback URL, retrying with backoff."""
+        import httpx
+
+        body = {key: value for key, value in job.items() if key != "payload"}
+        async with httpx.AsyncClient(timeout=self.webhook_timeout, follow_redirects=False) as client:
+            for attempt in range(1, self.webhook_retries + 1):
+                try:
+                    # Checked on every attempt: the host may resolve elsewhere than at submission
+                    await self.callback_policy.check(job["callback_url"])
+                except CallbackURLError as e:
+                    logger.error(f"Not notifying job {job['job_id']}: {e}")
+                    return
+                try:
+                    response = await client.post(job["callback_url"], json=body)
+                    if response.status_code < 500:
+                        return
+                    logger.warning(f"Webhook for job {job['job_id']} returned {response.status_code}")
+                except Exception as e:
+                    logger.warning(f"Webhook for job {job['job_id']} failed (attempt {attempt}): {e}")
+                await asyncio.sleep(2 ** (attempt - 1))
+        logger.error(f"Giving up on webhook for job {job['job_id']}")
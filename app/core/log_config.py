@@ -0,0 +1,176 @@
+"""
+Non-blocking logging pipeline configured by the `system.logging` section of agents.yaml.
+
+Application threads (the event loop included) only filter records and put
+them on a bounded queue; a QueueListener thread formats them (as JSON by
+default) and writes them out. Hot-path messages can be sampled per logger
+and rate limited per call site, so chatty INFO lines cost almost nothing.
+When the queue is full records are dropped instead of blocking the caller.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import yaml
+
+# Attributes of every LogRecord; anything else was passed with `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+def _rule_for(rules: Dict[str, Any], logger_name: str) -> Any:
+    """Most specific rule for a logger (exact name, then parents, then '*')."""
+    name = logger_name
+    while name:
+        if name in rules:
+            return rules[name]
+        name = name.rpartition(".")[0]
+    return rules.get("*")
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of records below WARNING, per logger."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = _rule_for(self.rates, record.name)
+        return rate is None or random.random() < rate
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `max` records per `period` seconds through for each call
+    site (logger + line) below WARNING. The next record let through after a
+    suppression reports how many were dropped.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]]):
+        super().__init__()
+        self.limits = limits
+        self._windows: Dict[Tuple[str, str, int], list] = {}  # call site -> [window start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        limit = _rule_for(self.limits, record.name)
+        if not limit:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(key, [now, 0, 0])
+            if now - window[0] >= limit.get('period', 1.0):
+                if window[2]:
+                    record.suppressed = window[2]
+                window[:] = [now, 0, 0]
+            window[1] += 1
+            if window[1] > limit['max']:
+                window[2] += 1
+                return False
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without formatting them; drops them when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the listener thread; only resolve the message arguments here
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def load_logging_config(config_path: str = "config/agents.yaml") -> Dict[str, Any]:
+    """Read system.logging from the agents configuration (empty if unavailable)."""
+    try:
+        with open(Path(config_path), 'r', encoding='utf-8') as file:
+            return (yaml.safe_load(file) or {}).get('system', {}).get('logging', {}) or {}
+    except (OSError, yaml.YAMLError):
+        return {}
+
+def setup_logging(config: Dict[str, Any], level: Optional[str] = None) -> NonBlockingQueueHandler:
+    """Route the root logger through the queue; `level` overrides config['level']."""
+    global _listener
+    stop_logging()
+
+    if config.get('json', True):
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(config.get('format', "%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(config.get('queue_size', 10000)))
+    if config.get('sampling'):
+        queue_handler.addFilter(SamplingFilter(config['sampling']))
+    if config.get('rate_limits'):
+        queue_handler.addFilter(RateLimitFilter(config['rate_limits']))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel((level or config.get('level', 'INFO')).upper())
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    return queue_handler
+
+def stop_logging() -> None:
+    """Flush the queued records and stop the listener thread."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+def _pause_listener() -> None:
+    if _listener:
+        _listener.stop()
+
+def _resume_listener() -> None:
+    if _listener:
+        _listener.start()
+
+# Flush what is still queued when the process exits
+atexit.register(stop_logging)
+# Threads do not survive fork(): stop the listener around it (so it holds no lock) and restart it on both sides
+os.register_at_fork(before=_pause_listener, after_in_parent=_resume_listener, after_in_child=_resume_listener)
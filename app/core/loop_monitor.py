@@ -0,0 +1,207 @@
+"""
+Event-loop lag and blocking-call monitor.
+
+A heartbeat coroutine wakes up every `interval` seconds and records how late
+it was scheduled (the loop lag). A watchdog thread checks the heartbeat: when
+the loop has not run it for longer than `block_threshold`, it captures the
+stack of the loop thread, i.e. the synchronous code blocking it (sync Redis,
+SQLAlchemy, blocking tools...). Offenders are aggregated by the innermost
+application frame.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the lag histogram buckets; the last bucket is open-ended
+LAG_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class BlockingOffender:
+    location: str
+    count: int = 0
+    total_blocked: float = 0.0
+    max_blocked: float = 0.0
+    stack: List[str] = field(default_factory=list)
+
+    def to_dict(self, with_stack: bool = True) -> Dict[str, Any]:
+        data = {
+            "location": self.location,
+            "count": self.count,
+            "total_blocked_ms": self.total_blocked * 1000,
+            "max_blocked_ms": self.max_blocked * 1000,
+        }
+        if with_stack:
+            data["stack"] = self.stack
+        return data
+
+def _offender_location(frames: List[traceback.FrameSummary]) -> str:
+    """Innermost frame of application code (falls back to the innermost frame)."""
+    for frame in reversed(frames):
+        if frame.filename.startswith(_APP_ROOT) and not frame.filename.endswith("loop_monitor.py"):
+            return f"{os.path.relpath(frame.filename, os.path.dirname(_APP_ROOT))}:{frame.lineno} in {frame.name}"
+    last = frames[-1] if frames else None
+    return f"{last.filename}:{last.lineno} in {last.name}" if last else "unknown"
+
+class LoopMonitor:
+    """Samples event-loop lag and reports the code blocking the loop."""
+
+    def __init__(self, interval: float = 0.1, block_threshold: float = 0.1, window: int = 1000, max_offenders: int = 50):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.max_offenders = max_offenders
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.offenders: Dict[str, BlockingOffender] = {}
+        self._lock = threading.Lock()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start sampling the running loop (call from inside it)."""
+        if self._task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample_lag())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event-loop monitor started (interval {self.interval}s, block threshold {self.block_threshold}s)")
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _sample_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self.record_lag(max(0.0, loop.time() - expected))
+
+    def record_lag(self, lag: float) -> None:
+        with self._lock:
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            self._recent.append(lag)
+            self._buckets[bisect.bisect_left(LAG_BUCKETS_MS, lag * 1000)] += 1
+
+    def _watch(self) -> None:
+        # Check several times per threshold so blocks are caught while still in progress
+        check_every = min(self.interval, self.block_threshold) / 2
+        current_block = None  # (heartbeat, offender, blocked time already recorded)
+        while not self._stopped.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.block_threshold:
+                continue
+            if current_block and current_block[0] == heartbeat:
+                # Same block seen again: extend the duration of the offender it was charged to
+                _, offender, recorded = current_block
+                with self._lock:
+                    offender.total_blocked += blocked - recorded
+                    offender.max_blocked = max(offender.max_blocked, blocked)
+                current_block = (heartbeat, offender, blocked)
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            offender = self._record_block(traceback.extract_stack(frame), blocked)
+            current_block = (heartbeat, offender, blocked) if offender else None
+
+    def _record_block(self, stack: List[traceback.FrameSummary], blocked: float) -> Optional[BlockingOffender]:
+        location = _offender_location(stack)
+        logger.warning(f"Event loop blocked for over {blocked * 1000:.0f}ms at {location}")
+        with self._lock:
+            self.blocks += 1
+            offender = self.offenders.get(location)
+            if offender is None:
+                if len(self.offenders) >= self.max_offenders:
+                    return None
+                offender = self.offenders[location] = BlockingOffender(location)
+                offender.stack = traceback.format_list(stack[-15:])
+            offender.count += 1
+            offender.total_blocked += blocked
+            offender.max_blocked = max(offender.max_blocked, blocked)
+            return offender
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            ordered = sorted(self._recent)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def histogram(self) -> Dict[str, int]:
+        labels = [f"<={bound}ms" for bound in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            return dict(zip(labels, self._buckets))
+
+    def top_offenders(self, limit: int = 10, with_stack: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            ordered = sorted(self.offenders.values(), key=lambda o: o.total_blocked, reverse=True)
+            return [offender.to_dict(with_stack) for offender in ordered[:limit]]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "lag_p50_ms": self.percentile(0.5) * 1000,
+            "lag_p99_ms": self.percentile(0.99) * 1000,
+            "lag_max_ms": self.max_lag * 1000,
+            "blocks": self.blocks,
+            "block_threshold_ms": self.block_threshold * 1000,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+            self.samples = 0
+            self.max_lag = 0.0
+            self.blocks = 0
+            self.offenders.clear()
+
+loop_monitor: Optional[LoopMonitor] = None
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    return loop_monitor
+
+def start_loop_monitor(interval: float, block_threshold: float) -> LoopMonitor:
+    global loop_monitor
+    loop_monitor = LoopMonitor(interval, block_threshold)
+    loop_monitor.start()
+    return loop_monitor
+
+async def stop_loop_monitor() -> None:
+    global loop_monitor
+    if loop_monitor:
+        await loop_monitor.stop()
+    loop_monitor = None
@@ -0,0 +1,142 @@
+"""
+Shared, pooled model clients and hedged model requests.
+
+AgentFactory injects one AsyncOpenAI client per provider/base URL into every
+agent model, so all runs reuse the same keep-alive connection pool instead
+of each going through the SDK's default client setup. HedgedModel optionally
+fires a second identical request when the first one is slower than the
+observed p95 latency and returns whichever answers first.
+"""
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
+from agents import Model, OpenAIChatCompletionsModel, OpenAIResponsesModel
+
+logger = logging.getLogger(__name__)
+
+class ModelClientPool:
+    """One pooled AsyncOpenAI client per (provider, base_url), configured from globals.http."""
+
+    def __init__(self, http_config: Dict[str, Any], request_timeout: Optional[float] = None, api_key: Optional[str] = None):
+        self.http_config = http_config
+        self.request_timeout = request_timeout
+        self.api_key = api_key
+        self._clients: Dict[Tuple[str, Optional[str]], AsyncOpenAI] = {}
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.http_config.get('max_connections', 100),
+            max_keepalive_connections=self.http_config.get('max_keepalive_connections', 20),
+            keepalive_expiry=self.http_config.get('keepalive_expiry', 30),
+        )
+        timeout = Timeout(
+            self.request_timeout,
+            connect=self.http_config.get('connect_timeout', 5),
+        )
+        return DefaultAsyncHttpxClient(limits=limits, timeout=timeout)
+
+    def get_client(self, provider: str = "openai", base_url: Optional[str] = None) -> AsyncOpenAI:
+        """Get (creating on first use) the shared client for a provider/base URL."""
+        key = (provider, base_url)
+        client = self._clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=self.api_key or None,
+                base_url=base_url,
+                http_client=self._create_http_client(),
+                max_retries=self.http_config.get('max_retries', 2),
+            )
+            self._clients[key] = client
+            logger.info(f"Created pooled model client for {provider} ({base_url or 'default base URL'})")
+        return client
+
+    def create_model(self, model_name: str, provider: str = "openai", base_url: Optional[str] = None) -> Model:
+        client = self.get_client(provider, base_url)
+        if self.http_config.get('api', 'responses') == 'chat_completions':
+            return OpenAIChatCompletionsModel(model=model_name, openai_client=client)
+        return OpenAIResponsesModel(model=model_name, openai_client=client)
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+class HedgedModel(Model):
+    """
+    Wraps a model and hedges slow requests: after a delay equal to the observed
+    latency percentile, an identical second request is sent and the first
+    response to arrive wins; the other request is cancelled.
+    """
+
+    def __init__(self, model: Model, hedging_config: Dict[str, Any]):
+        self.model = model
+        self.percentile = hedging_config.get('percentile', 0.95)
+        self.min_samples = hedging_config.get('min_samples', 20)
+        self.min_delay = hedging_config.get('min_delay', 0.5)
+        self.max_delay = hedging_config.get('max_delay', 10.0)
+        self._latencies: Deque[float] = deque(maxlen=hedging_config.get('window', 200))
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before hedging, or None until enough latency samples exist."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+        return min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    async def _timed(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        response = await self.model.get_response(*args, **kwargs)
+        self._latencies.append(loop.time() - start_time)
+        return response
+
+    async def get_response(self, *args, **kwargs):
+        self.requests += 1
+        delay = self.hedge_delay()
+        tasks = [asyncio.create_task(self._timed(*args, **kwargs))]
+        try:
+            if delay is None:
+                return await tasks[0]
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return tasks[0].result()
+
+            self.hedges += 1
+            tasks.append(asyncio.create_task(self._timed(*args, **kwargs)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both requests failed: surface the primary's error
+            return tasks[0].result()
+        finally:
+            # Cancel the losing request (or both, if the caller was cancelled)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stream_response(self, *args, **kwargs):
+        # Streams are consumed incrementally and are not hedged
+        return self.model.stream_response(*args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "current_delay": self.hedge_delay(),
+        }
@@ -0,0 +1,15 @@
+"""
+Question normalization shared by the caches keyed on question text.
+"""
+import hashlib
+import re
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", question).strip().lower().rstrip("?!. ")
+
+def question_digest(question: str) -> str:
+    """Stable digest of the normalized question (unlike hash(), identical across processes)."""
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
@@ -0,0 +1,151 @@
+"""
+On-demand statistical profiler for a live worker.
+
+A sampler thread snapshots the stack of every thread (sys._current_frames)
+at a fixed interval, and a coroutine on the event loop snapshots the await
+stack of every asyncio task at a lower rate. Samples are aggregated as
+collapsed stacks ("frame;frame;frame count", the flamegraph.pl / speedscope
+input format) plus a top-N summary of the hottest functions.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    short = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+def _collapse(frame) -> Tuple[str, ...]:
+    """Root-first labels of a frame's stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+class SamplingProfiler:
+    """Samples all threads (and asyncio tasks) for a bounded duration."""
+
+    def __init__(self, interval: float = 0.01, task_interval: float = 0.05):
+        self.interval = interval
+        self.task_interval = task_interval
+        self.thread_stacks: Counter = Counter()
+        self.task_stacks: Counter = Counter()
+        self.thread_samples = 0
+        self.task_samples = 0
+        self._stopped = threading.Event()
+
+    def _sample_threads(self) -> None:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                name = names.get(thread_id) or f"thread-{thread_id}"
+                self.thread_stacks[(f"thread:{name}",) + _collapse(frame)] += 1
+            self.thread_samples += 1
+
+    async def _sample_tasks(self) -> None:
+        current = asyncio.current_task()
+        while not self._stopped.is_set():
+            for task in asyncio.all_tasks():
+                if task is current or task.done():
+                    continue
+                # get_stack() on a suspended task returns its outermost coroutine frame only;
+                # follow cr_await to the coroutine it is waiting on
+                labels = [f"task:{task.get_name()}"]
+                coro = task.get_coro()
+                while coro is not None and getattr(coro, 'cr_frame', None) is not None:
+                    labels.append(_frame_label(coro.cr_frame.f_code))
+                    coro = getattr(coro, 'cr_await', None)
+                self.task_stacks[tuple(labels)] += 1
+            self.task_samples += 1
+            await asyncio.sleep(self.task_interval)
+
+    async def run(self, seconds: float) -> None:
+        thread = threading.Thread(target=self._sample_threads, name="profiler", daemon=True)
+        thread.start()
+        task_sampler = asyncio.create_task(self._sample_tasks())
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._stopped.set()
+            await task_sampler
+            await asyncio.to_thread(thread.join)
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def top_functions(stacks: Counter, limit: int) -> List[Dict[str, Any]]:
+        """Functions by self samples (leaf frame) and total samples (anywhere on the stack)."""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        samples = sum(stacks.values()) or 1
+        for stack, count in stacks.items():
+            frames = stack[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        return [
+            {
+                "function": label,
+                "self_samples": own[label],
+                "total_samples": total[label],
+                "self_pct": own[label] * 100 / samples,
+                "total_pct": total[label] * 100 / samples,
+            }
+            for label, _ in own.most_common(limit)
+        ]
+
+class ProfilerService:
+    """Runs at most one profile at a time."""
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float, interval: float, top: int) -> Dict[str, Any]:
+        if self._lock.locked():
+            raise ProfilerBusyError("A profile is already running")
+        seconds = min(seconds, self.max_seconds)
+        async with self._lock:
+            profiler = SamplingProfiler(interval=interval)
+            started_at = time.time()
+            await profiler.run(seconds)
+        return {
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "started_at": started_at,
+            "thread_samples": profiler.thread_samples,
+            "task_samples": profiler.task_samples,
+            "top_functions": profiler.top_functions(profiler.thread_stacks, top),
+            "top_awaiting": profiler.top_functions(profiler.task_stacks, top),
+            "collapsed_threads": profiler.collapsed(profiler.thread_stacks),
+            "collapsed_tasks": profiler.collapsed(profiler.task_stacks),
+        }
+
+_service: Optional[ProfilerService] = None
+
+def get_profiler_service(max_seconds: float) -> ProfilerService:
+    global _service
+    if _service is None:
+        _service = ProfilerService(max_seconds)
+    return _service
@@ -0,0 +1,86 @@
+"""
+Background partition maintenance and retention.
+
+Every RETENTION_INTERVAL seconds the job creates the upcoming monthly
+partitions and, when RETENTION_MONTHS is set, archives and drops the expired
+ones (see app.db.partitions). The database work runs in a worker thread; on
+PostgreSQL an advisory lock makes sure only one worker process runs it at a time.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from ..db.partitions import archive_expired, ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+_ADVISORY_LOCK_KEY = 0x7265746E  # "retn"
+
+class RetentionJob:
+    def __init__(self, engine: Engine, retention_months: int, archive_dir: str, months_ahead: int, interval: float):
+        self.engine = engine
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.months_ahead = months_ahead
+        self.interval = interval
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> Optional[Dict[str, int]]:
+        """One maintenance pass; None when another process holds the lock."""
+        if self.engine.dialect.name != "postgresql":
+            return self._maintain()
+        with self.engine.connect() as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar():
+                return None
+            try:
+                return self._maintain()
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+    def _maintain(self) -> Dict[str, int]:
+        ensure_partitions(self.engine, self.months_ahead)
+        if self.retention_months <= 0:
+            return {}
+        archived = archive_expired(self.engine, self.retention_months, self.archive_dir)
+        if any(archived.values()):
+            logger.info(f"Retention archived {archived} rows to {self.archive_dir}")
+        return archived
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                archived = await asyncio.to_thread(self.run_once)
+                if archived is not None:
+                    self.last_result = archived
+            except Exception as e:
+                logger.error(f"Retention job failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="retention-job")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+retention_job: Optional[RetentionJob] = None
+
+def start_retention_job(engine: Engine, retention_months: int, archive_dir: str, months_ahead: int,
+                        interval: float) -> RetentionJob:
+    global retention_job
+    retention_job = RetentionJob(engine, retention_months, archive_dir, months_ahead, interval)
+    retention_job.start()
+    return retention_job
+
+async def stop_retention_job() -> None:
+    global retention_job
+    if retention_job:
+        await retention_job.stop()
+    retention_job = None
@@ -0,0 +1,231 @@
+"""
+Speculative specialist execution.
+
+While the triage agent decides where to hand off, the specialist predicted
+from a cheap local signal (keyword scores, falling back to routing history)
+already starts answering. If triage hands off to the same specialist the
+speculative result is used and the triage run is cancelled; otherwise the
+speculative run is cancelled and triage continues normally.
+
+Every miss pays for a specialist run that is thrown away, so speculation is
+off unless enabled per specialist, and a specialist whose wasted_work_ratio
+exceeds `max_wasted_work_ratio` (after `min_samples` attempts) only keeps
+speculating on a `probe_rate` fraction of its predictions, enough to notice
+when its accuracy improves.
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from agents import Agent, RunHooks, Runner
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+class SpecialistPredictor:
+    """Predicts the triage decision from keyword scores and routing history."""
+
+    def __init__(self, keywords: Dict[str, List[str]], history_weight: float = 0.2):
+        self.keywords = {
+            agent_id: {word.lower() for word in words}
+            for agent_id, words in keywords.items()
+        }
+        self.history_weight = history_weight
+        self.history: Counter = Counter()
+
+    def record(self, agent_id: str) -> None:
+        """Record an actual routing decision of the triage agent."""
+        self.history[agent_id] += 1
+
+    def predict(self, question: str) -> Optional[Tuple[str, float]]:
+        """
+        Return (agent_id, confidence) for the most likely specialist, if any.
+        Confidence blends the agent's share of keyword hits with its share of
+        past routing decisions, weighted by `history_weight`.
+        """
+        words = set(_WORD_RE.findall(question.lower()))
+        hits = {agent_id: len(words & agent_keywords) for agent_id, agent_keywords in self.keywords.items()}
+        total_hits = sum(hits.values())
+        total_history = sum(self.history.values())
+
+        scores: Dict[str, float] = {}
+        for agent_id in self.keywords:
+            score = 0.0
+            if total_hits:
+                score += (1 - self.history_weight) * hits[agent_id] / total_hits
+            if total_history:
+                score += self.history_weight * self.history[agent_id] / total_history
+            if score > 0:
+                scores[agent_id] = score
+
+        if not scores:
+            return None
+        agent_id = max(scores, key=scores.get)
+        return agent_id, scores[agent_id]
+
+@dataclass
+class AgentSpeculationStats:
+    attempts: int = 0
+    hits: int = 0
+    misses: int = 0
+    gated: int = 0  # predictions not run because of the wasted-work gate
+    speculative_time: float = 0.0
+    wasted_time: float = 0.0
+    latency_saved: float = 0.0
+
+    @property
+    def wasted_work_ratio(self) -> float:
+        return self.wasted_time / self.speculative_time if self.speculative_time else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "gated": self.gated,
+            "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+            "wasted_work_ratio": self.wasted_work_ratio,
+            "latency_saved_total": self.latency_saved,
+            "latency_saved_avg": self.latency_saved / self.hits if self.hits else 0.0,
+        }
+
+class SpeculationStats:
+    """Per-agent speculation counters, used to tune thresholds in agents.yaml."""
+
+    def __init__(self):
+        self.agents: Dict[str, AgentSpeculationStats] = {}
+
+    def for_agent(self, agent_id: str) -> AgentSpeculationStats:
+        return self.agents.setdefault(agent_id, AgentSpeculationStats())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {agent_id: stats.to_dict() for agent_id, stats in self.agents.items()}
+
+class _HandoffDecisionHooks(RunHooks):
+    """Resolves a future with the first handoff target chosen by triage."""
+
+    def __init__(self, decision: asyncio.Future):
+        self.decision = decision
+
+    async def on_handoff(self, context, from_agent: Agent, to_agent: Agent) -> None:
+        if not self.decision.done():
+            self.decision.set_result(to_agent)
+
+@dataclass
+class SpeculativeOutcome:
+    result: Any
+    predicted: str
+    confidence: float
+    hit: bool
+    decision_time: Optional[float]
+
+class SpeculativeRunner:
+    """Runs the predicted specialist alongside the triage agent."""
+
+    def __init__(self, specialists: Dict[str, Agent], specialist_configs: Dict[str, Dict[str, Any]],
+                 predictor: SpecialistPredictor, max_turns: int = 10, max_wasted_work_ratio: float = 0.3,
+                 min_samples: int = 20, probe_rate: float = 0.05):
+        self.specialists = specialists
+        self.max_turns = max_turns
+        self.specialist_configs = specialist_configs
+        self.max_wasted_work_ratio = max_wasted_work_ratio
+        self.min_samples = min_samples
+        self.probe_rate = probe_rate
+        self.predictor = predictor
+        self.stats = SpeculationStats()
+        self._ids_by_name = {agent.name: agent_id for agent_id, agent in specialists.items()}
+
+    def record_decision(self, agent_name: str) -> None:
+        """Feed a routing decision made outside speculation into the predictor history."""
+        agent_id = self._ids_by_name.get(agent_name)
+        if agent_id:
+            self.predictor.record(agent_id)
+
+    def _should_speculate(self, question: str) -> Optional[Tuple[str, float]]:
+        prediction = self.predictor.predict(question)
+        if not prediction:
+            return None
+        agent_id, confidence = prediction
+        config = self.specialist_configs.get(agent_id, {})
+        if not config.get('enabled', False) or confidence < config.get('min_confidence', 0.5):
+            return None
+        stats = self.stats.for_agent(agent_id)
+        max_ratio = config.get('max_wasted_work_ratio', self.max_wasted_work_ratio)
+        if (stats.attempts >= config.get('min_samples', self.min_samples)
+                and stats.wasted_work_ratio > max_ratio
+                and random.random() >= config.get('probe_rate', self.probe_rate)):
+            stats.gated += 1
+            return None
+        return prediction
+
+    async def run(self, triage: Agent, question: str, context: Optional[Dict[str, Any]] = None) -> Optional[SpeculativeOutcome]:
+        """
+        Race triage against the predicted specialist.
+        Returns None when no specialist is confident enough to speculate.
+        """
+        prediction = self._should_speculate(question)
+        if not prediction:
+            return None
+        agent_id, confidence = prediction
+        stats = self.stats.for_agent(agent_id)
+        stats.attempts += 1
+
+        loop = asyncio.get_running_loop()
+        decision: asyncio.Future = loop.create_future()
+        start_time = time.time()
+
+        speculative_task = asyncio.create_task(
+            Runner.run(self.specialists[agent_id], question, context=context, max_turns=self.max_turns)
+        )
+        triage_task = asyncio.create_task(
+            Runner.run(triage, question, context=context, max_turns=self.max_turns,
+                       hooks=_HandoffDecisionHooks(decision))
+        )
+
+        try:
+            await asyncio.wait({decision, triage_task}, return_when=asyncio.FIRST_COMPLETED)
+            chosen = decision.result() if decision.done() else None
+            decision_time = time.time() - start_time if chosen else None
+            chosen_id = self._ids_by_name.get(chosen.name) if chosen else None
+            if chosen_id:
+                self.predictor.record(chosen_id)
+
+            if chosen_id == agent_id:
+                triage_task.cancel()
+                try:
+                    result = await speculative_task
+                except Exception as e:
+                    # The prediction was right but its run is lost: count a miss and answer through triage
+                    wasted = time.time() - start_time
+                    stats.misses += 1
+                    stats.speculative_time += wasted
+                    stats.wasted_time += wasted
+                    logger.warning(f"Speculative run of {agent_id} failed, falling back to triage: {e}")
+                    result = await Runner.run(triage, question, context=context, max_turns=self.max_turns)
+                    return SpeculativeOutcome(result, agent_id, confidence, False, decision_time)
+                speculative_duration = time.time() - start_time
+                stats.hits += 1
+                stats.speculative_time += speculative_duration
+                # Without speculation the specialist would only start after the decision
+                stats.latency_saved += min(decision_time, speculative_duration)
+                logger.info(f"Speculation hit for {agent_id} (decision after {decision_time:.2f}s)")
+                return SpeculativeOutcome(result, agent_id, confidence, True, decision_time)
+
+            speculative_task.cancel()
+            wasted = time.time() - start_time
+            stats.misses += 1
+            stats.speculative_time += wasted
+            stats.wasted_time += wasted
+            logger.info(f"Speculation miss: predicted {agent_id}, triage chose {chosen_id or 'no handoff'}")
+            result = await triage_task
+            return SpeculativeOutcome(result, agent_id, confidence, False, decision_time)
+        finally:
+            for task in (speculative_task, triage_task):
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(speculative_task, triage_task, return_exceptions=True)
@@ -0,0 +1,169 @@
+"""
+Local stub model provider for development, load tests and benchmarks.
+
+Enabled with MODEL_PROVIDER=stub. The stub never calls the network: it
+hands off to the handoff whose description best matches the question,
+returns schema-shaped JSON for structured outputs and otherwise echoes the
+question back, after a configurable latency. Streamed responses emit the
+text one word per delta event.
+"""
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+from agents import Model, ModelProvider, ModelResponse, Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_DELTA_RE = re.compile(r"\S+\s*|\s+")
+
+def _last_user_text(input: Any) -> str:
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if isinstance(item, dict) and item.get('role') == 'user':
+            content = item.get('content')
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+def _has_tool_output(input: Any) -> bool:
+    return isinstance(input, list) and any(
+        isinstance(item, dict) and item.get('type') == 'function_call_output' for item in input
+    )
+
+def _sample_from_schema(schema: Dict[str, Any]) -> Any:
+    """Build the smallest value matching a JSON schema."""
+    schema_type = schema.get('type')
+    if 'properties' in schema or schema_type == 'object':
+        return {name: _sample_from_schema(prop) for name, prop in schema.get('properties', {}).items()}
+    if schema_type == 'array':
+        return []
+    if schema_type == 'boolean':
+        return False
+    if schema_type in ('integer', 'number'):
+        return 0
+    if 'anyOf' in schema:
+        return _sample_from_schema(schema['anyOf'][0])
+    return "stub"
+
+class StubModel(Model):
+    """Deterministic offline model."""
+
+    def __init__(self, model_name: str, latency: float = 0.05):
+        self.model_name = model_name
+        self.latency = latency
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema,
+                           handoffs, tracing, **kwargs) -> ModelResponse:
+        await asyncio.sleep(self.latency)
+        question = _last_user_text(input)
+
+        if handoffs and not _has_tool_output(input):
+            handoff = self._pick_handoff(question, handoffs)
+            if handoff:
+                output = [ResponseFunctionToolCall(
+                    id=f"fc_{uuid.uuid4().hex[:12]}",
+                    call_id=f"call_{uuid.uuid4().hex[:12]}",
+                    name=handoff.tool_name,
+                    arguments="{}",
+                    type="function_call",
+                )]
+                return self._response(output, question, 8)
+
+        if output_schema is not None and not output_schema.is_plain_text():
+            text = json.dumps(_sample_from_schema(output_schema.json_schema()))
+        else:
+            text = f"[{self.model_name}] Stub answer to: {question}"
+
+        output = [ResponseOutputMessage(
+            id=f"msg_{uuid.uuid4().hex[:12]}",
+            content=[ResponseOutputText(text=text, type="output_text", annotations=[])],
+            role="assistant",
+            status="completed",
+            type="message",
+        )]
+        return self._response(output, question, len(text) // 4 + 1)
+
+    def _pick_handoff(self, question: str, handoffs: List[Any]) -> Optional[Any]:
+        words = set(_WORD_RE.findall(question.lower()))
+        best, best_score = None, 0
+        for handoff in handoffs:
+            description = f"{handoff.agent_name} {handoff.tool_description}".lower()
+            score = len(words & set(_WORD_RE.findall(description)))
+            if score > best_score:
+                best, best_score = handoff, score
+        return best
+
+    def _response(self, output: List[Any], question: str, output_tokens: int) -> ModelResponse:
+        input_tokens = len(question) // 4 + 1
+        usage = Usage(
+            requests=1,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+        )
+        return ModelResponse(output=output, usage=usage, response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema,
+                              handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        response = await self.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+        )
+        sequence_number = 0
+        for output_index, item in enumerate(response.output):
+            if not isinstance(item, ResponseOutputMessage):
+                continue
+            for content_index, content in enumerate(item.content):
+                for delta in _DELTA_RE.findall(content.text):
+                    yield ResponseTextDeltaEvent(
+                        content_index=content_index,
+                        delta=delta,
+                        item_id=item.id,
+                        logprobs=[],
+                        output_index=output_index,
+                        sequence_number=sequence_number,
+                        type="response.output_text.delta",
+                    )
+                    sequence_number += 1
+                    await asyncio.sleep(0)
+        usage = response.usage
+        yield ResponseCompletedEvent(
+            response=Response(
+                id=f"resp_{uuid.uuid4().hex[:12]}",
+                created_at=time.time(),
+                model=self.model_name,
+                object="response",
+                output=response.output,
+                parallel_tool_calls=False,
+                tool_choice="auto",
+                tools=[],
+                # Constructed unvalidated: the required token detail fields vary across openai versions
+                usage=ResponseUsage.model_construct(
+                    input_tokens=usage.input_tokens,
+                    input_tokens_details=InputTokensDetails.model_construct(cached_tokens=0),
+                    output_tokens=usage.output_tokens,
+                    output_tokens_details=OutputTokensDetails.model_construct(reasoning_tokens=0),
+                    total_tokens=usage.total_tokens,
+                ),
+            ),
+            sequence_number=sequence_number,
+            type="response.completed",
+        )
+
+class StubModelProvider(ModelProvider):
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return StubModel(model_name or "stub", latency=self.latency)
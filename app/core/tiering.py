@@ -0,0 +1,86 @@
+"""
+Per-agent model tiers with automatic escalation.
+
+Agents start on the first tier of their escalation chain (usually a fast,
+cheap model). When the output fails the agent's validation checks the
+question is retried on the next, stronger tier.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class EscalationPolicy:
+    """Validation checks and tier chain for one agent (escalation: in agents.yaml)."""
+    tiers: List[str]
+    min_answer_chars: int = 0
+    reject_patterns: List[str] = field(default_factory=list)
+    require_handoff: bool = False
+
+    def __post_init__(self):
+        self._reject = [re.compile(pattern, re.IGNORECASE) for pattern in self.reject_patterns]
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "EscalationPolicy":
+        return cls(
+            tiers=config.get('tiers', []),
+            min_answer_chars=config.get('min_answer_chars', 0),
+            reject_patterns=config.get('reject_patterns', []),
+            require_handoff=config.get('require_handoff', False),
+        )
+
+    def next_tier(self, tier: Optional[str]) -> Optional[str]:
+        if tier not in self.tiers:
+            return None
+        index = self.tiers.index(tier)
+        return self.tiers[index + 1] if index + 1 < len(self.tiers) else None
+
+    def check(self, result: Any, agent_name: str) -> Optional[str]:
+        """Return why the run failed validation, or None if it passed."""
+        if self.require_handoff and result.last_agent.name == agent_name:
+            return "no handoff"
+        output = str(result.final_output or "")
+        if len(output.strip()) < self.min_answer_chars:
+            return "answer too short"
+        for pattern in self._reject:
+            if pattern.search(output):
+                return f"matched '{pattern.pattern}'"
+        return None
+
+@dataclass
+class _TierCounters:
+    runs: int = 0
+    escalations: int = 0
+    total_latency: float = 0.0
+    total_tokens: int = 0
+
+class TierStats:
+    """Per-tier model latency, escalation rate and token usage; a run counts once per hop on a tier."""
+
+    def __init__(self):
+        self.tiers: Dict[str, _TierCounters] = {}
+
+    def record_run(self, tier: str, latency: float, tokens: int) -> None:
+        counters = self.tiers.setdefault(tier, _TierCounters())
+        counters.runs += 1
+        counters.total_latency += latency
+        counters.total_tokens += tokens
+
+    def record_escalation(self, from_tier: str) -> None:
+        self.tiers.setdefault(from_tier, _TierCounters()).escalations += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            tier: {
+                "runs": c.runs,
+                "escalations": c.escalations,
+                "escalation_rate": c.escalations / c.runs if c.runs else 0.0,
+                "avg_latency": c.total_latency / c.runs if c.runs else 0.0,
+                "total_tokens": c.total_tokens,
+                "avg_tokens": c.total_tokens / c.runs if c.runs else 0.0,
+            }
+            for tier, c in self.tiers.items()
+        }
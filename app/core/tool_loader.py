@@ -1,18 +1,52 @@
 import os
+import asyncio
 import importlib
 import inspect
-from typing import Dict, List, Any
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional
 from pathlib import Path
 import logging
+from agents import FunctionTool
+from agents.strict_schema import ensure_strict_json_schema
+from .usage import current_tracker
 
 logger = logging.getLogger(__name__)
 
+BATCH_SUFFIX = "_many"
+
+@dataclass
+class ToolBatchStats:
+    """Batched tool calls per tool, and the model round trips they saved."""
+    calls: Dict[str, int] = field(default_factory=dict)
+    items: Dict[str, int] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, tool_name: str, items: int, errors: int) -> None:
+        self.calls[tool_name] = self.calls.get(tool_name, 0) + 1
+        self.items[tool_name] = self.items.get(tool_name, 0) + items
+        self.errors[tool_name] = self.errors.get(tool_name, 0) + errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "calls": calls,
+                "items": self.items[name],
+                "errors": self.errors[name],
+                "avg_items": self.items[name] / calls,
+                "round_trips_saved": self.items[name] - calls,
+            }
+            for name, calls in self.calls.items()
+        }
+
 class ToolLoader:
     """Auto-discovery system for tools with @function_tool decorator."""
     
     def __init__(self, tools_directory: str = "app.tools"):
         self.tools_directory = tools_directory
         self.tools: Dict[str, Any] = {}
+        self.batched_tools: Dict[str, FunctionTool] = {}
+        self.batch_stats = ToolBatchStats()
         self.discover_tools()
     
     def discover_tools(self) -> Dict[str, Any]:
@@ -99,3 +133,85 @@ class ToolLoader:
     def list_available_tools(self) -> List[str]:
         """List all available tool names."""
         return list(self.tools.keys())
+    
+    def is_batchable(self, name: str) -> bool:
+        """Function tools that take JSON arguments and run without approval can be batched."""
+        tool = self.tools.get(name)
+        return (
+            isinstance(tool, FunctionTool)
+            and not name.endswith(BATCH_SUFFIX)
+            and tool.needs_approval is False
+        )
+    
+    def get_batched_tools(self, names: List[str], max_items: int = 20, concurrency: int = 8) -> List[FunctionTool]:
+        """
+        The `<name>_many` variant of each eligible tool: one call takes a list of
+        argument objects, so the model does not need a round trip per item. A
+        `<name>_many` tool defined in the tools directory (e.g. a vectorized
+        implementation) is used as is; otherwise one is generated that runs the
+        items concurrently through the original tool.
+        """
+        tools = []
+        for name in names:
+            native = self.tools.get(f"{name}{BATCH_SUFFIX}")
+            if native is not None:
+                tools.append(native)
+            elif self.is_batchable(name):
+                key = f"{name}{BATCH_SUFFIX}:{max_items}:{concurrency}"
+                if key not in self.batched_tools:
+                    self.batched_tools[key] = self._make_batched_tool(self.tools[name], max_items, concurrency)
+                tools.append(self.batched_tools[key])
+            else:
+                logger.warning(f"Tool '{name}' cannot be batched")
+        return tools
+    
+    def _make_batched_tool(self, tool: FunctionTool, max_items: int, concurrency: int) -> FunctionTool:
+        schema = {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "description": f"Arguments of each {tool.name} call (at most {max_items})",
+                    "items": tool.params_json_schema,
+                },
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+        }
+        if tool.strict_json_schema:
+            schema = ensure_strict_json_schema(schema)
+        
+        async def invoke(ctx, input: str) -> str:
+            items = json.loads(input or "{}").get("items") or []
+            if len(items) > max_items:
+                return json.dumps({"error": f"At most {max_items} items per call, got {len(items)}"})
+            limit = asyncio.Semaphore(concurrency)
+            
+            async def run_item(index: int, arguments: Any) -> Dict[str, Any]:
+                async with limit:
+                    # Tool failures come back as the tool's own error output, as for a single call
+                    try:
+                        output = await tool.on_invoke_tool(ctx, json.dumps(arguments))
+                        return {"index": index, "input": arguments, "output": output}
+                    except Exception as e:
+                        logger.warning(f"Batched {tool.name} item {index} failed: {e}")
+                        return {"index": index, "input": arguments, "error": str(e)}
+            
+            results = await asyncio.gather(*(run_item(i, arguments) for i, arguments in enumerate(items)))
+            errors = sum(1 for result in results if "error" in result)
+            self.batch_stats.record(tool.name, len(items), errors)
+            tracker = current_tracker()
+            if tracker is not None:
+                tracker.record_batch(len(items))
+            return json.dumps({"results": results}, default=str)
+        
+        return FunctionTool(
+            name=f"{tool.name}{BATCH_SUFFIX}",
+            description=(
+                f"Run {tool.name} for several inputs in one call and get one result per input, "
+                f"in order. Use it instead of calling {tool.name} repeatedly.\n\n{tool.description}"
+            ),
+            params_json_schema=schema,
+            on_invoke_tool=invoke,
+            strict_json_schema=tool.strict_json_schema,
+        )
@@ -0,0 +1,340 @@
+"""
+Lightweight per-request tracing.
+
+A root span is opened for every HTTP request (or background job) and child
+spans are opened around the cache lookup, the agent run, each agent turn,
+model call and tool call, and persistence. The sampling decision is taken at
+the root: unsampled requests get no-op spans. Finished sampled traces are
+appended to a JSONL file, one span per line with OTLP-style field names, and
+read back by the /debug/traces view.
+
+Exporting only puts the finished trace on a bounded queue (traces are dropped
+when it is full); a writer thread serializes and appends them, so the event
+loop never does file I/O. The file is rotated by size like a
+RotatingFileHandler (<path>.1 ... <path>.N), which also bounds the lookups.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from agents import AgentHooks
+from .config import settings
+from .usage import model_name, run_id
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """A timed operation inside a trace."""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def end(self, status: Optional[str] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if status:
+                self.status = status
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+class _NoopSpan:
+    """Returned when there is no sampled trace; accepts and drops everything."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self, status: Optional[str] = None) -> None:
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """All spans of one request, plus the per-run state of the agent hooks."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        # Agent hooks run in helper tasks, so their open spans are tracked per run (context id)
+        self.run_spans: Dict[Any, Span] = {}
+
+    def new_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent_id, attributes)
+        self.spans.append(span)
+        return span
+
+class JsonlSpanExporter:
+    """Appends finished traces to a size-rotated JSONL file (one span per line) from a writer thread."""
+
+    def __init__(self, path: str, max_bytes: int = 0, backup_count: int = 0, queue_size: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _ensure_writer(self) -> None:
+        # Threads do not survive fork(): each worker process starts its own writer
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue: queue.Queue = queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait([span.to_dict() for span in spans])
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write the queued traces and stop the writer thread."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Drain what else is queued so a burst is written with one open()
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = "".join(
+                json.dumps(span, default=str) + "\n" for trace in batch if trace is not None for span in trace
+            )
+            if lines:
+                self._write(lines)
+            if batch[-1] is None:
+                return
+
+    def _write(self, lines: str) -> None:
+        try:
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(lines)
+        except OSError as e:
+            logger.warning(f"Failed to export traces: {e}")
+
+    def _rotate(self) -> None:
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _files(self) -> List[str]:
+        """The current file and its backups, oldest first."""
+        backups = [f"{self.path}.{index}" for index in range(self.backup_count, 0, -1)]
+        return [path for path in backups + [self.path] if os.path.exists(path)]
+
+    def read_traces(self, attribute: str, value: str, limit: int = 50) -> List[List[Dict[str, Any]]]:
+        """
+        Spans of the latest `limit` exported traces whose root span has
+        attribute == value. The spans of a trace are written together, root
+        first, so only root spans and the spans of matching traces are parsed.
+        """
+        matching: deque = deque(maxlen=limit)
+        current: Optional[List[Dict[str, Any]]] = None
+        prefix = None
+        for path in self._files():
+            try:
+                with open(path, encoding="utf-8") as file:
+                    for line in file:
+                        if prefix is not None and line.startswith(prefix):
+                            current.append(json.loads(line))
+                            continue
+                        prefix = None
+                        if '"parentSpanId": null' not in line:
+                            continue
+                        span = json.loads(line)
+                        if span["parentSpanId"] is None and span["attributes"].get(attribute) == value:
+                            current = [span]
+                            matching.append(current)
+                            prefix = line[:line.index('"spanId"')]
+            except OSError:
+                # Rotated away while reading
+                continue
+        return list(matching)
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    def __init__(self, sample_rate: float, exporter: Optional[JsonlSpanExporter]):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes) -> Iterator[Any]:
+        """Open the root span of a request; the trace is exported when it ends."""
+        if not self.exporter or random.random() >= self.sample_rate:
+            yield NOOP_SPAN
+            return
+        trace = Trace()
+        root = trace.new_span(name, None, attributes)
+        trace.root = root
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.set_attribute("error", repr(e))
+            root.end("error")
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            for span in trace.spans:
+                span.end("unfinished")
+            self.exporter.export(trace.spans)
+
+    @contextmanager
+    def start_span(self, name: str, **attributes) -> Iterator[Any]:
+        """Open a child of the current span (no-op outside a sampled trace)."""
+        parent = _current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        span = parent.trace.new_span(name, parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_attribute("error", repr(e))
+            span.end("error")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def annotate_trace(**attributes) -> None:
+    """Set attributes on the root span of the current trace (e.g. the conversation id)."""
+    span = _current_span.get()
+    if span is not None and span.trace.root is not None:
+        for key, value in attributes.items():
+            span.trace.root.set_attribute(key, value)
+
+def _create_tracer() -> Tracer:
+    exporter = None
+    if settings.TRACING_ENABLED:
+        exporter = JsonlSpanExporter(
+            settings.TRACE_EXPORT_PATH,
+            max_bytes=settings.TRACE_MAX_BYTES,
+            backup_count=settings.TRACE_BACKUP_COUNT,
+            queue_size=settings.TRACE_QUEUE_SIZE,
+        )
+        # Write what is still queued when the process exits
+        atexit.register(exporter.close)
+    return Tracer(settings.TRACE_SAMPLE_RATE, exporter)
+
+tracer = _create_tracer()
+
+class TracingHooks(AgentHooks):
+    """Agent hooks opening spans for agent turns, model calls, tool calls and handoffs."""
+
+    def _open(self, key: Any, name: str, **attributes) -> None:
+        parent = _current_span.get()
+        if parent is None:
+            return
+        parent_id = parent.span_id
+        if key[0] != "turn":
+            # Model and tool calls nest under the turn of the agent making them
+            turn = parent.trace.run_spans.get(("turn", key[1]))
+            parent_id = turn.span_id if turn else parent_id
+        parent.trace.run_spans[key] = parent.trace.new_span(name, parent_id, attributes)
+
+    def _close(self, key: Any, **attributes) -> None:
+        parent = _current_span.get()
+        span = parent.trace.run_spans.pop(key, None) if parent is not None else None
+        if span:
+            for attr, value in attributes.items():
+                span.set_attribute(attr, value)
+            span.end()
+
+    async def on_start(self, context, agent) -> None:
+        # A new agent starting in the same run means the previous one handed off
+        self._close(("turn", run_id(context)))
+        self._open(("turn", run_id(context)), "agent.turn", agent=agent.name, model=model_name(agent.model))
+
+    async def on_end(self, context, agent, output) -> None:
+        self._close(("turn", run_id(context)))
+
+    async def on_handoff(self, context, agent, source) -> None:
+        parent = _current_span.get()
+        turn = parent.trace.run_spans.get(("turn", run_id(context))) if parent is not None else None
+        if turn:
+            turn.set_attribute("handoff_from", source.name)
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        self._open(("llm", run_id(context)), "llm.call", agent=agent.name, model=model_name(agent.model))
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        usage = response.usage
+        details = getattr(usage, 'input_tokens_details', None) if usage else None
+        self._close(
+            ("llm", run_id(context)),
+            input_tokens=usage.input_tokens if usage else None,
+            output_tokens=usage.output_tokens if usage else None,
+            cached_tokens=getattr(details, 'cached_tokens', None),
+        )
+
+    def _tool_key(self, context, tool) -> Any:
+        return ("tool", run_id(context), getattr(context, 'tool_call_id', None) or tool.name)
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self._open(self._tool_key(context, tool), "tool.call", agent=agent.name, tool=tool.name)
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        self._close(self._tool_key(context, tool), result_chars=len(str(result)))
+
+tracing_hooks = TracingHooks()
@@ -0,0 +1,219 @@
+"""
+Token and cost accounting for agent runs.
+
+Every agent carries `usage_hooks`, which record the usage of each model
+response into the UsageTracker of the current request. The tracker lives in
+a context variable set by AgentExecutor, so fan-out branches, speculative
+runs and guardrail checks of the same request all report into it. Usage is
+grouped per agent and per handoff hop (a consecutive stretch of model calls
+made by one agent), and priced with the `pricing` section of agents.yaml.
+Batched tool calls (`<tool>_many`) are counted too, with the model round
+trips they saved.
+"""
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from agents import AgentHooks
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ModelPrice:
+    """USD per million tokens."""
+    input: float
+    output: float
+    cached_input: Optional[float] = None
+
+class PriceTable:
+    """Model prices; a model matches its exact name or the longest configured prefix (e.g. dated snapshots)."""
+
+    def __init__(self, prices: Dict[str, ModelPrice]):
+        self.prices = prices
+        self._missing = set()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PriceTable":
+        return cls({
+            model: ModelPrice(
+                input=price['input'],
+                output=price['output'],
+                cached_input=price.get('cached_input'),
+            )
+            for model, price in (config or {}).items()
+        })
+
+    def get(self, model: str) -> Optional[ModelPrice]:
+        if model in self.prices:
+            return self.prices[model]
+        matches = [name for name in self.prices if model.startswith(name)]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def cost(self, model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> Optional[float]:
+        price = self.get(model)
+        if not price:
+            if model not in self._missing:
+                self._missing.add(model)
+                logger.warning(f"No price configured for model {model}, its cost is not tracked")
+            return None
+        cached_price = price.cached_input if price.cached_input is not None else price.input
+        return (
+            (input_tokens - cached_tokens) * price.input
+            + cached_tokens * cached_price
+            + output_tokens * price.output
+        ) / 1_000_000
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    cost: Optional[float] = None
+    llm_time: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, other: "UsageTotals") -> None:
+        self.requests += other.requests
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.llm_time += other.llm_time
+        if other.cost is not None:
+            self.cost = (self.cost or 0.0) + other.cost
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": self.cost,
+            "llm_time": self.llm_time,
+            "output_tokens_per_second": self.output_tokens / self.llm_time if self.llm_time else None,
+        }
+
+@dataclass
+class UsageHop(UsageTotals):
+    agent: str = ""
+    model: str = ""
+    run: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"agent": self.agent, "model": self.model, **super().to_dict()}
+
+class UsageTracker:
+    """Usage of one request, per agent and per handoff hop."""
+
+    def __init__(self, prices: PriceTable):
+        self.prices = prices
+        self.hops: List[UsageHop] = []
+        # Keyed by run (see run_id): concurrent runs each have their own hop sequence
+        self._current_hops: Dict[int, UsageHop] = {}
+        self._llm_started: Dict[int, float] = {}
+        self.batched_calls = 0
+        self.batched_items = 0
+
+    def start_call(self, run_id: int) -> None:
+        self._llm_started[run_id] = time.perf_counter()
+
+    def record(self, run_id: int, agent_name: str, model: str, usage: Any) -> None:
+        started = self._llm_started.pop(run_id, None)
+        llm_time = time.perf_counter() - started if started is not None else 0.0
+
+        hop = self._current_hops.get(run_id)
+        if not hop or hop.agent != agent_name or hop.model != model:
+            hop = UsageHop(agent=agent_name, model=model, run=run_id)
+            self.hops.append(hop)
+            self._current_hops[run_id] = hop
+
+        details = getattr(usage, 'input_tokens_details', None)
+        cached_tokens = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+        hop.requests += 1
+        hop.input_tokens += usage.input_tokens or 0
+        hop.cached_tokens += cached_tokens
+        hop.output_tokens += usage.output_tokens or 0
+        hop.llm_time += llm_time
+        cost = self.prices.cost(model, usage.input_tokens or 0, cached_tokens, usage.output_tokens or 0)
+        if cost is not None:
+            hop.cost = (hop.cost or 0.0) + cost
+
+    def record_batch(self, items: int) -> None:
+        self.batched_calls += 1
+        self.batched_items += items
+
+    def run_hops(self, run_id: int) -> List[UsageHop]:
+        """Hops of one agent run, in order."""
+        return [hop for hop in self.hops if hop.run == run_id]
+
+    def totals(self) -> UsageTotals:
+        totals = UsageTotals()
+        for hop in self.hops:
+            totals.add(hop)
+        return totals
+
+    def by_agent(self) -> Dict[str, UsageTotals]:
+        agents: Dict[str, UsageTotals] = {}
+        for hop in self.hops:
+            agents.setdefault(hop.agent, UsageTotals()).add(hop)
+        return agents
+
+    def to_dict(self, processing_time: Optional[float] = None) -> Dict[str, Any]:
+        totals = self.totals()
+        return {
+            **totals.to_dict(),
+            "tokens_per_second": totals.total_tokens / processing_time if processing_time else None,
+            "agents": {name: agent.to_dict() for name, agent in self.by_agent().items()},
+            "hops": [hop.to_dict() for hop in self.hops],
+            "batched_tools": {
+                "calls": self.batched_calls,
+                "items": self.batched_items,
+                # One call per item would have taken a model round trip each
+                "round_trips_saved": self.batched_items - self.batched_calls,
+            },
+        }
+
+_current_tracker: contextvars.ContextVar[Optional[UsageTracker]] = contextvars.ContextVar("usage_tracker", default=None)
+
+def start_tracking(prices: PriceTable) -> UsageTracker:
+    """Start collecting usage for the current request (and the tasks it spawns)."""
+    tracker = UsageTracker(prices)
+    _current_tracker.set(tracker)
+    return tracker
+
+def current_tracker() -> Optional[UsageTracker]:
+    return _current_tracker.get()
+
+def model_name(model: Any) -> str:
+    """Name of the model an agent runs on, unwrapping Model instances."""
+    while model is not None and not isinstance(model, str):
+        model = getattr(model, 'model_name', None) or getattr(model, 'model', None)
+    return model or "unknown"
+
+def run_id(context: Any) -> int:
+    """
+    Identity of the agent run a hook call belongs to. Hooks receive different
+    wrapper objects (agent, tool contexts) within a run, but they all share
+    the run's Usage instance.
+    """
+    return id(getattr(context, 'usage', context))
+
+class UsageHooks(AgentHooks):
+    """Agent hooks reporting each model response to the current UsageTracker."""
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        tracker = _current_tracker.get()
+        if tracker is not None:
+            tracker.start_call(run_id(context))
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        tracker = _current_tracker.get()
+        if tracker is not None and response.usage is not None:
+            tracker.record(run_id(context), agent.name, model_name(agent.model), response.usage)
+
+usage_hooks = UsageHooks()
@@ -0,0 +1,82 @@
+"""
+Content-addressed answer storage.
+
+Each distinct answer text is stored once in answer_blobs, keyed by the
+SHA-256 of its UTF-8 bytes; turns reference it by digest, so repeated and
+cached answers cost one row. Bodies of ANSWER_COMPRESSION_MIN_SIZE bytes or
+more are compressed with zstd when the `zstandard` package is installed,
+zlib otherwise (whichever is configured and available); smaller ones are
+stored raw. Queries add the blob columns with with_answer_blobs() and
+decode them with resolve_answer(); ORM turns expose `answer_text`.
+"""
+import hashlib
+import zlib
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Tuple
+from .models import AnswerBlob, ConversationTurn
+from ..core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib only
+    zstandard = None
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+def answer_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def encode_answer(text: str, min_size: int, codec: str) -> Tuple[str, bytes]:
+    """(encoding, body) for an answer text."""
+    raw = text.encode("utf-8")
+    if len(raw) < min_size:
+        return "raw", raw
+    if codec == "zstd" and zstandard is not None:
+        body, encoding = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), "zstd"
+    else:
+        body, encoding = zlib.compress(raw, ZLIB_LEVEL), "zlib"
+    # Incompressible answers are kept as they are
+    return (encoding, body) if len(body) < len(raw) else ("raw", raw)
+
+def decode_answer(encoding: str, body: bytes) -> str:
+    if encoding == "zlib":
+        raw = zlib.decompress(body)
+    elif encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Answer is zstd-compressed but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(body)
+    else:
+        raw = body
+    return bytes(raw).decode("utf-8")
+
+def store_answer(db: Session, text: str) -> str:
+    """Store the answer body unless it already exists; returns its digest."""
+    digest = answer_digest(text)
+    if db.get(AnswerBlob, digest) is None:
+        encoding, body = encode_answer(text, settings.ANSWER_COMPRESSION_MIN_SIZE, settings.ANSWER_COMPRESSION)
+        values = {"digest": digest, "encoding": encoding, "body": body, "size": len(text.encode("utf-8"))}
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            # A concurrent request may store the same answer first
+            db.execute(insert(AnswerBlob).values(**values).on_conflict_do_nothing(index_elements=["digest"]))
+        else:
+            db.add(AnswerBlob(**values))
+    return digest
+
+def with_answer_blobs(query):
+    """Add the blob columns (for resolve_answer) to a select over ConversationTurn."""
+    return query.add_columns(
+        AnswerBlob.encoding.label("answer_encoding"),
+        AnswerBlob.body.label("answer_body"),
+    ).outerjoin(AnswerBlob, AnswerBlob.digest == ConversationTurn.answer_digest)
+
+def resolve_answer(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the blob columns of a row dict with the decoded `answer`."""
+    encoding = row.pop("answer_encoding", None)
+    body = row.pop("answer_body", None)
+    if body is not None:
+        row["answer"] = decode_answer(encoding, body)
+    return row
@@ -1,8 +1,14 @@
-from sqlalchemy import create_engine
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from .models import Base
+from .partitions import create_partitioned_tables, ensure_partitions
+from .search import ensure_search_index
 from ..core.config import settings
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -13,13 +19,50 @@ engine = create_engine(
     pool_recycle=300,
 )
 
+# Connections opened before a fork (schema creation in serve.py) belong to the parent
+os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+# Revision matching the schema of databases created before migrations existed
+BASELINE_REVISION = "0001_baseline"
+
+def _alembic_config(connection) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    return config
+
+def upgrade_schema(engine: Engine) -> bool:
+    """
+    Bring an existing database to the latest migration. Databases created
+    before migrations existed are stamped first: with the baseline revision if
+    conversations still has the baseline columns, with head otherwise. Returns
+    False, doing nothing, on an empty database.
+    """
+    with engine.begin() as conn:
+        tables = set(inspect(conn).get_table_names())
+        config = _alembic_config(conn)
+        if "alembic_version" not in tables:
+            if "conversations" not in tables:
+                return False
+            columns = {column["name"] for column in inspect(conn).get_columns("conversations")}
+            command.stamp(config, "head" if "turn_count" in columns else BASELINE_REVISION)
+        command.upgrade(config, "head")
+    return True
+
 def create_tables():
-    """Create all database tables"""
+    """Create all database tables, or migrate the existing ones"""
     try:
+        upgraded = upgrade_schema(engine)
+        create_partitioned_tables(engine)
+        ensure_partitions(engine, settings.PARTITION_MONTHS_AHEAD)
         Base.metadata.create_all(bind=engine)
+        ensure_search_index(engine)
+        if not upgraded:
+            with engine.begin() as conn:
+                command.stamp(_alembic_config(conn), "head")
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
@@ -0,0 +1,134 @@
+"""
+Feedback ingestion and incremental rating aggregates.
+
+Feedback is attributed to the agent that answered the latest turn of its
+conversation. Writing it folds the ratings, in the same transaction, into:
+
+- feedback_aggregates: count, sum and histogram of the ratings per agent and
+  per FEEDBACK_BUCKET_SECONDS time bucket;
+- agent_metrics: the agent's feedback totals and success_rate, the share of
+  ratings of FEEDBACK_POSITIVE_RATING or more.
+
+Both are updated with `column = column + n` upserts, so concurrent writers
+never lose increments, and they are never recomputed from user_feedback:
+they keep counting feedback that retention has archived.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Optional
+from .models import AgentMetrics, ConversationTurn, FeedbackAggregate, UserFeedback
+from ..core.config import settings
+
+BUCKET_COUNTERS = ["count", "rating_sum", "positive", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"]
+# agent_metrics column -> bucket counter
+AGENT_COUNTERS = {"feedback_count": "count", "feedback_rating_sum": "rating_sum", "feedback_positive": "positive"}
+
+def bucket_start(moment: datetime, bucket_seconds: int) -> datetime:
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % bucket_seconds, tz=timezone.utc)
+
+def latest_agents(db: Session, conversation_ids: Iterable[str]) -> Dict[str, str]:
+    """Agent of the latest turn of each conversation; conversations without turns are left out."""
+    latest = (
+        select(ConversationTurn.conversation_id, func.max(ConversationTurn.turn_index).label("turn_index"))
+        .where(ConversationTurn.conversation_id.in_(list(conversation_ids)))
+        .group_by(ConversationTurn.conversation_id)
+        .subquery()
+    )
+    query = select(ConversationTurn.conversation_id, ConversationTurn.agent_used).join(
+        latest,
+        (ConversationTurn.conversation_id == latest.c.conversation_id)
+        & (ConversationTurn.turn_index == latest.c.turn_index),
+    )
+    return dict(db.execute(query).all())
+
+def record_feedback(db: Session, items: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[str]:
+    """
+    Store feedback items (conversation_id, rating, feedback_text) and fold them
+    into the aggregates, without committing. Items of unknown conversations are
+    not stored; their conversation ids are returned.
+    """
+    agents = latest_agents(db, {item["conversation_id"] for item in items})
+    now = now or datetime.now(timezone.utc)
+    rows = [
+        {
+            "conversation_id": item["conversation_id"],
+            "agent_name": agents[item["conversation_id"]],
+            "rating": item["rating"],
+            "feedback_text": item.get("feedback_text"),
+            "created_at": now,
+        }
+        for item in items
+        if item["conversation_id"] in agents
+    ]
+    if rows:
+        db.execute(insert(UserFeedback), rows)
+        _fold(db, rows, bucket_start(now, settings.FEEDBACK_BUCKET_SECONDS))
+    return sorted({item["conversation_id"] for item in items} - set(agents))
+
+def _fold(db: Session, rows: List[Dict[str, Any]], bucket: datetime) -> None:
+    per_agent: Dict[str, Counter] = defaultdict(Counter)
+    for row in rows:
+        totals = per_agent[row["agent_name"]]
+        totals["count"] += 1
+        totals["rating_sum"] += row["rating"]
+        totals["positive"] += row["rating"] >= settings.FEEDBACK_POSITIVE_RATING
+        totals[f"rating_{row['rating']}"] += 1
+    # Same row order in every transaction, so concurrent batches cannot deadlock
+    for agent_name in sorted(per_agent):
+        totals = per_agent[agent_name]
+        _add_to_bucket(db, agent_name, bucket, {name: totals[name] for name in BUCKET_COUNTERS})
+        _add_to_agent(db, agent_name, {column: totals[counter] for column, counter in AGENT_COUNTERS.items()})
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+def _add_to_bucket(db: Session, agent_name: str, bucket: datetime, counters: Dict[str, int]) -> None:
+    upsert = _upsert(db)
+    if upsert is None:
+        aggregate = db.query(FeedbackAggregate).filter_by(agent_name=agent_name, bucket_start=bucket).first()
+        if aggregate is None:
+            db.add(FeedbackAggregate(agent_name=agent_name, bucket_start=bucket, **counters))
+        else:
+            for name, value in counters.items():
+                setattr(aggregate, name, getattr(FeedbackAggregate, name) + value)
+        return
+    statement = upsert(FeedbackAggregate).values(agent_name=agent_name, bucket_start=bucket, **counters)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["agent_name", "bucket_start"],
+        set_={name: getattr(FeedbackAggregate, name) + statement.excluded[name] for name in counters},
+    ))
+
+def _add_to_agent(db: Session, agent_name: str, counters: Dict[str, int]) -> None:
+    created = {
+        **counters,
+        "success_rate": 100.0 * counters["feedback_positive"] / counters["feedback_count"],
+    }
+    upsert = _upsert(db)
+    if upsert is None:
+        metrics = db.query(AgentMetrics).filter_by(agent_name=agent_name).first()
+        if metrics is None:
+            db.add(AgentMetrics(agent_name=agent_name, **created))
+            return
+        added = {name: func.coalesce(getattr(AgentMetrics, name), 0) + value for name, value in counters.items()}
+        for name, value in added.items():
+            setattr(metrics, name, value)
+        metrics.success_rate = 100.0 * added["feedback_positive"] / added["feedback_count"]
+        return
+    statement = upsert(AgentMetrics).values(agent_name=agent_name, **created)
+    added = {
+        name: func.coalesce(getattr(AgentMetrics, name), 0) + statement.excluded[name]
+        for name in counters
+    }
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["agent_name"],
+        set_={**added, "success_rate": 100.0 * added["feedback_positive"] / added["feedback_count"]},
+    ))
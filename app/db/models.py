@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, Index, LargeBinary, UniqueConstraint
+from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
+from typing import Dict, Optional
 import uuid
 
 Base = declarative_base()
@@ -9,13 +11,78 @@ class Conversation(Base):
     __tablename__ = "conversations"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    turn_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    user_ip = Column(String)
+    
+    # Updates are conditional on the turn_count that was read, so concurrent turns
+    # fail with StaleDataError (the turn unique key includes created_at once partitioned)
+    __mapper_args__ = {"version_id_col": turn_count, "version_id_generator": False}
+
+class ConversationTurn(Base):
+    __tablename__ = "conversation_turns"
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "turn_index"),
+        # Recent questions per agent configuration (answer cache warmup)
+        Index("ix_conversation_turns_fingerprint_created_at", "config_fingerprint", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(String, nullable=False, index=True)
+    turn_index = Column(Integer, nullable=False)
     question = Column(Text, nullable=False)
-    answer = Column(Text, nullable=False)
+    question_digest = Column(String)  # SHA-256 of the normalized question (answer cache key)
+    answer = Column(Text)  # inline text of turns stored before answer_blobs
+    answer_digest = Column(String)  # -> AnswerBlob.digest
     agent_used = Column(String, nullable=False)
     processing_time = Column(Float)
     tokens_used = Column(Integer)
+    input_tokens = Column(Integer)
+    cached_tokens = Column(Integer)
+    output_tokens = Column(Integer)
+    cost = Column(Float)  # USD
+    cached = Column(Boolean, default=False)
+    status = Column(String)  # completed | partial
+    config_fingerprint = Column(String)  # AgentFactory.config_fingerprint that produced the answer
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    answer_blob = relationship(
+        "AnswerBlob",
+        primaryjoin="foreign(ConversationTurn.answer_digest) == AnswerBlob.digest",
+        viewonly=True,
+    )
+    
+    @property
+    def answer_text(self) -> str:
+        if self.answer_blob is not None:
+            return self.answer_blob.text
+        return self.answer or ""
+
+class AnswerBlob(Base):
+    """Answer bodies stored once per distinct text, keyed by their SHA-256."""
+    __tablename__ = "answer_blobs"
+    
+    digest = Column(String, primary_key=True)
+    encoding = Column(String, nullable=False)  # raw | zlib | zstd
+    body = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # uncompressed UTF-8 bytes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    @property
+    def text(self) -> str:
+        from .answers import decode_answer
+        return decode_answer(self.encoding, self.body)
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String, primary_key=True)
+    request_fingerprint = Column(String, nullable=False)
+    conversation_id = Column(String, nullable=False)
+    turn_id = Column(Integer)
+    response = Column(Text, nullable=False)  # AgentResponse JSON
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    user_ip = Column(String)
     
 class AgentMetrics(Base):
     __tablename__ = "agent_metrics"
@@ -25,14 +92,58 @@ class AgentMetrics(Base):
     questions_handled = Column(Integer, default=0)
     avg_processing_time = Column(Float, default=0.0)
     total_tokens_used = Column(Integer, default=0)
+    total_input_tokens = Column(Integer, default=0)
+    total_cached_tokens = Column(Integer, default=0)
+    total_output_tokens = Column(Integer, default=0)
+    total_cost = Column(Float, default=0.0)  # USD
+    model_requests = Column(Integer, default=0)
+    # Feedback attributed to the agent (see app.db.feedback); success_rate is derived from it
+    feedback_count = Column(Integer, default=0)
+    feedback_rating_sum = Column(Integer, default=0)
+    feedback_positive = Column(Integer, default=0)
     success_rate = Column(Float, default=100.0)
     last_updated = Column(DateTime(timezone=True), server_default=func.now())
+    
+    @property
+    def avg_rating(self) -> Optional[float]:
+        return self.feedback_rating_sum / self.feedback_count if self.feedback_count else None
 
 class UserFeedback(Base):
     __tablename__ = "user_feedback"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    conversation_id = Column(String, nullable=False)
+    conversation_id = Column(String, nullable=False, index=True)
+    agent_name = Column(String)  # agent of the conversation's latest turn when the feedback was given
     rating = Column(Integer)  # 1-5
     feedback_text = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class FeedbackAggregate(Base):
+    """Ratings of one agent within one time bucket, folded in as feedback is written."""
+    __tablename__ = "feedback_aggregates"
+    __table_args__ = (UniqueConstraint("agent_name", "bucket_start"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    agent_name = Column(String, nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)  # ratings >= FEEDBACK_POSITIVE_RATING
+    # Histogram of the ratings
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    
+    @property
+    def avg_rating(self) -> Optional[float]:
+        return self.rating_sum / self.count if self.count else None
+    
+    @property
+    def success_rate(self) -> Optional[float]:
+        return 100.0 * self.positive / self.count if self.count else None
+    
+    @property
+    def histogram(self) -> Dict[str, int]:
+        return {str(rating): getattr(self, f"rating_{rating}") for rating in range(1, 6)}
@@ -0,0 +1,215 @@
+"""
+Monthly range partitioning and retention of the time-series tables.
+
+On PostgreSQL, conversation_turns and user_feedback are created as tables
+partitioned by RANGE (created_at): one partition per month (<table>_pYYYYMM)
+plus a DEFAULT partition for rows outside them. ensure_partitions() keeps
+the next months created ahead of time. PostgreSQL requires the partition key
+in every primary key and unique constraint, so created_at is appended to
+them. Tables that already exist unpartitioned are left as they are.
+
+archive_expired() writes every month older than the retention period to
+<archive_dir>/<source>_pYYYYMM.ndjson.gz and only then drops the partition
+(or deletes the rows, on databases without partitions). Archived turns
+include their answer text; answer blobs left unreferenced are then deleted.
+Conversation headers are archived and deleted by their last update.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from sqlalchemy import Index, MetaData, Table, UniqueConstraint, column, exists, func, inspect, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from typing import Dict, List, Optional, Tuple
+from .answers import resolve_answer
+from .models import AnswerBlob, Conversation, ConversationTurn, UserFeedback
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = [ConversationTurn.__table__, UserFeedback.__table__]
+PARTITION_KEY = "created_at"
+# (table, time column) archived by retention, children before their conversation header
+RETAINED_TABLES = [
+    (ConversationTurn.__table__, "created_at"),
+    (UserFeedback.__table__, "created_at"),
+    (Conversation.__table__, "updated_at"),
+]
+ARCHIVE_BATCH_SIZE = 5000
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(table_name: str, month: datetime) -> str:
+    return f"{table_name}_p{month:%Y%m}"
+
+def _is_partitioned(conn: Connection, table_name: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name"),
+        {"name": table_name},
+    ).first() is not None
+
+def _partitioned_copy(source: Table) -> Table:
+    """`source` declared PARTITION BY RANGE (created_at), with created_at in its keys."""
+    columns = []
+    for source_column in source.columns:
+        copy = source_column._copy()
+        if copy.primary_key:
+            copy.autoincrement = True
+        if copy.name == PARTITION_KEY:
+            copy.primary_key = True
+            copy.nullable = False
+        columns.append(copy)
+    unique = [
+        UniqueConstraint(*[c.name for c in constraint.columns], PARTITION_KEY)
+        for constraint in source.constraints
+        if isinstance(constraint, UniqueConstraint)
+    ]
+    copy = Table(source.name, MetaData(), *columns, *unique, postgresql_partition_by=f"RANGE ({PARTITION_KEY})")
+    # Column-level indexes came with the columns; add the table-level ones
+    for index in source.indexes:
+        if index.name not in {existing.name for existing in copy.indexes}:
+            Index(index.name, *[copy.c[c.name] for c in index.columns])
+    return copy
+
+def create_partitioned_tables(engine: Engine) -> None:
+    """Create the partitioned tables (PostgreSQL only) before create_all() sees them."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for source in PARTITIONED_TABLES:
+            if source.name not in existing:
+                _partitioned_copy(source).create(conn)
+                logger.info(f"Created {source.name} partitioned by month")
+            elif not _is_partitioned(conn, source.name):
+                logger.warning(f"{source.name} exists without partitions; migrate it to enable monthly partitioning")
+
+def ensure_partitions(engine: Engine, months_ahead: int, now: Optional[datetime] = None) -> None:
+    """Create the partitions of the current month and the next `months_ahead` months, plus DEFAULT."""
+    if engine.dialect.name != "postgresql":
+        return
+    current = month_start(now or datetime.now(timezone.utc))
+    for source in PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            if not _is_partitioned(conn, source.name):
+                continue
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {source.name}_default PARTITION OF {source.name} DEFAULT"))
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(source.name, month)} PARTITION OF {source.name} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                    ))
+            except Exception as e:
+                # Typically rows of that month already landed in the DEFAULT partition
+                logger.error(f"Could not create partition {partition_name(source.name, month)}: {e}")
+
+def _monthly_partitions(conn: Connection, parent: str) -> List[Tuple[str, datetime]]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :parent"
+        ),
+        {"parent": parent},
+    ).scalars()
+    partitions = []
+    for name in rows:
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((name, datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def _write_archive(conn: Connection, source, time_column: str, start: datetime, end: datetime, path: str) -> int:
+    """Stream the rows of [start, end) to a gzipped NDJSON file; returns the row count."""
+    query = select(source).where(source.c[time_column] >= start, source.c[time_column] < end)
+    if "answer_digest" in source.c:
+        # Archived turns carry their answer text, their blobs may be deleted afterwards
+        query = query.add_columns(
+            AnswerBlob.encoding.label("answer_encoding"),
+            AnswerBlob.body.label("answer_body"),
+        ).outerjoin(AnswerBlob, AnswerBlob.digest == source.c.answer_digest)
+    query = query.execution_options(stream_results=True, yield_per=ARCHIVE_BATCH_SIZE)
+    count = 0
+    partial_path = f"{path}.partial"
+    with open(partial_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+            for partition in conn.execute(query).mappings().partitions():
+                rows = (resolve_answer(dict(row)) for row in partition)
+                archive.write("".join(json.dumps(row, default=str) + "\n" for row in rows).encode())
+                count += len(partition)
+        # The archive must be on disk before the rows are dropped
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial_path, path)
+    return count
+
+def _archive_months(conn: Connection, source, source_name: str, time_column: str, cutoff: datetime,
+                    archive_dir: str) -> int:
+    """Archive, then delete, the rows of `source` older than `cutoff`, one month at a time."""
+    oldest = conn.execute(select(func.min(source.c[time_column])).where(source.c[time_column] < cutoff)).scalar()
+    archived = 0
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        end = add_months(month, 1)
+        path = os.path.join(archive_dir, f"{partition_name(source_name, month)}.ndjson.gz")
+        if os.path.exists(path):
+            logger.warning(f"Archive {path} already exists; keeping the rows of {source_name} for {month:%Y-%m}")
+        else:
+            archived += _write_archive(conn, source, time_column, month, end, path)
+            conn.execute(source.delete().where(source.c[time_column] >= month, source.c[time_column] < end))
+        month = end
+    return archived
+
+def archive_expired(engine: Engine, retention_months: int, archive_dir: str,
+                    now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Archive and remove every month that ended more than `retention_months`
+    months ago. Returns the number of rows archived per table.
+    """
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    os.makedirs(archive_dir, exist_ok=True)
+    archived: Dict[str, int] = {}
+    for source, time_column in RETAINED_TABLES:
+        count = 0
+        with engine.connect() as conn:
+            partitioned = engine.dialect.name == "postgresql" and _is_partitioned(conn, source.name)
+            partitions = _monthly_partitions(conn, source.name) if partitioned else []
+        for name, month in partitions:
+            if add_months(month, 1) > cutoff:
+                break
+            path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+            if os.path.exists(path):
+                logger.warning(f"Archive {path} already exists; keeping partition {name}")
+                continue
+            with engine.begin() as conn:
+                partition = table(name, *[column(c.name) for c in source.columns])
+                count += _write_archive(conn, partition, time_column, month, add_months(month, 1), path)
+                conn.execute(text(f"ALTER TABLE {source.name} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+            logger.info(f"Archived and dropped partition {name} to {path}")
+        # Unpartitioned tables, and rows that landed in the DEFAULT partition
+        source_name = f"{source.name}_default" if partitioned else source.name
+        rows = table(source_name, *[column(c.name) for c in source.columns]) if partitioned else source
+        with engine.begin() as conn:
+            count += _archive_months(conn, rows, source_name, time_column, cutoff, archive_dir)
+        archived[source.name] = count
+
+    if archived.get(ConversationTurn.__tablename__):
+        with engine.begin() as conn:
+            deleted = conn.execute(
+                AnswerBlob.__table__.delete().where(
+                    AnswerBlob.created_at < cutoff,
+                    ~exists().where(ConversationTurn.answer_digest == AnswerBlob.digest),
+                )
+            ).rowcount
+        logger.info(f"Deleted {deleted} answer blobs no longer referenced by any turn")
+    return archived
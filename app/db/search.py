@@ -0,0 +1,186 @@
+"""
+Full-text search over conversation turns.
+
+Answers are stored compressed (see app.db.answers), so the index cannot be
+computed by the database from the row: index_turn() feeds it the plain text
+when a turn is saved. PostgreSQL: a `search_vector` tsvector column on
+conversation_turns with a GIN index, queried with websearch_to_tsquery and
+ranked by ts_rank_cd. SQLite: a contentless FTS5 table (only the index, no
+copy of the text; matches are joined back to the turns by rowid) ranked by
+bm25. With SQLite 3.43+ a trigger removes deleted turns from it; on older
+versions their entries stay in the index but never match a turn. Both are
+created by ensure_search_index(), which is idempotent and also indexes turns
+stored before it first ran.
+
+Results are ordered by (rank desc, id desc) and paginated by keyset: the
+cursor carries the last (rank, id), so deep pages cost the same as the first.
+"""
+import base64
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from sqlalchemy import Float, and_, column, func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from .answers import resolve_answer, with_answer_blobs
+from .models import AnswerBlob, ConversationTurn
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LANGUAGE = "english"
+
+_POSTGRES_DDL = [
+    "ALTER TABLE conversation_turns ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_turns_search ON conversation_turns USING GIN (search_vector)",
+]
+_POSTGRES_UNINDEXED = literal_column("conversation_turns.search_vector").is_(None)
+
+# Rows of contentless FTS5 tables can only be deleted from SQLite 3.43 on
+_SQLITE_CONTENTLESS_DELETE = sqlite3.sqlite_version_info >= (3, 43, 0)
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE conversation_turns_fts USING fts5(question, answer, content='', "
+    f"{'contentless_delete=1, ' if _SQLITE_CONTENTLESS_DELETE else ''}tokenize='porter unicode61')",
+] + ([
+    """CREATE TRIGGER conversation_turns_fts_delete AFTER DELETE ON conversation_turns BEGIN
+        DELETE FROM conversation_turns_fts WHERE rowid = old.id;
+    END""",
+] if _SQLITE_CONTENTLESS_DELETE else [])
+_BACKFILL_BATCH_SIZE = 1000
+
+class SearchNotSupportedError(Exception):
+    """Raised when the database backend has no full-text index."""
+
+def _backfill(conn, where=None) -> None:
+    """Index the turns stored before the index existed (`where` selects the ones still missing)."""
+    # Most answers live in answer_blobs: they are decoded here, the database cannot read them
+    query = with_answer_blobs(select(ConversationTurn.id, ConversationTurn.question, ConversationTurn.answer))
+    if where is not None:
+        query = query.where(where)
+    query = query.execution_options(yield_per=_BACKFILL_BATCH_SIZE)
+    for partition in conn.execute(query).mappings().partitions():
+        index_turns(conn, [resolve_answer(dict(row)) for row in partition])
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the full-text index for the engine's dialect if it does not exist."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            for statement in _POSTGRES_DDL:
+                conn.execute(text(statement))
+            _backfill(conn, _POSTGRES_UNINDEXED)
+        elif dialect == "sqlite":
+            existing = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversation_turns_fts'")
+            ).scalar()
+            if not existing:
+                for statement in _SQLITE_DDL:
+                    conn.execute(text(statement))
+                _backfill(conn)
+        else:
+            logger.warning(f"Full-text search is not available on {dialect}")
+
+def index_turns(conn, turns: List[Dict[str, Any]]) -> None:
+    """Add saved turns ({id, question, answer} dicts) to the full-text index."""
+    if not turns:
+        return
+    dialect = conn.get_bind().dialect.name if isinstance(conn, Session) else conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(
+            text(f"""UPDATE conversation_turns
+                SET search_vector = to_tsvector('{SEARCH_LANGUAGE}', :question || ' ' || coalesce(:answer, ''))
+                WHERE id = :id"""),
+            turns,
+        )
+    elif dialect == "sqlite":
+        conn.execute(
+            text("INSERT INTO conversation_turns_fts(rowid, question, answer) VALUES (:id, :question, :answer)"),
+            turns,
+        )
+
+def index_turn(db: Session, turn_id: int, question: str, answer: str) -> None:
+    index_turns(db, [{"id": turn_id, "question": question, "answer": answer}])
+
+def encode_cursor(rank: float, turn_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, turn_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        rank, turn_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(turn_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def _fts5_query(query: str) -> str:
+    """Free text to an FTS5 query: every word must match, operators are taken literally."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+def _ranked_matches(dialect: str, query: str):
+    """(rank expression, match condition, extra FROM target) for the dialect."""
+    if dialect == "postgresql":
+        vector = literal_column("conversation_turns.search_vector")
+        ts_query = func.websearch_to_tsquery(SEARCH_LANGUAGE, query)
+        return func.ts_rank_cd(vector, ts_query).cast(Float), vector.op("@@")(ts_query), None
+    if dialect == "sqlite":
+        fts = literal_column("conversation_turns_fts")
+        # bm25() is lower for better matches
+        rank = (-func.bm25(fts)).cast(Float)
+        return rank, fts.op("MATCH")(_fts5_query(query)), table("conversation_turns_fts", column("rowid"))
+    raise SearchNotSupportedError(f"Full-text search is not available on {dialect}")
+
+def search_turns(
+    db: Session,
+    query: str,
+    agent: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Turns matching `query`, best first, and the cursor of the next page (None on the last page)."""
+    rank, match, fts_table = _ranked_matches(db.get_bind().dialect.name, query)
+    matches = select(
+        ConversationTurn.id,
+        ConversationTurn.conversation_id,
+        ConversationTurn.turn_index,
+        ConversationTurn.question,
+        ConversationTurn.answer,
+        ConversationTurn.answer_digest,
+        ConversationTurn.agent_used,
+        ConversationTurn.created_at,
+        rank.label("rank"),
+    ).where(match)
+    if fts_table is not None:
+        matches = matches.select_from(fts_table).join(ConversationTurn, fts_table.c.rowid == ConversationTurn.id)
+    if agent:
+        matches = matches.where(ConversationTurn.agent_used == agent)
+    if since:
+        matches = matches.where(ConversationTurn.created_at >= since)
+    if until:
+        matches = matches.where(ConversationTurn.created_at < until)
+
+    ranked = matches.subquery()
+    page = select(ranked).order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit + 1)
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor)
+        page = page.where(or_(ranked.c.rank < last_rank, and_(ranked.c.rank == last_rank, ranked.c.id < last_id)))
+
+    # Answer bodies are fetched for the page only, not for every match
+    paged = page.subquery()
+    page = (
+        select(paged, AnswerBlob.encoding.label("answer_encoding"), AnswerBlob.body.label("answer_body"))
+        .outerjoin(AnswerBlob, AnswerBlob.digest == paged.c.answer_digest)
+        .order_by(paged.c.rank.desc(), paged.c.id.desc())
+    )
+    rows = []
+    for row in db.execute(page).mappings():
+        row = resolve_answer(dict(row))
+        del row["answer_digest"]
+        rows.append(row)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["id"])
+    return rows, next_cursor
@@ -1,15 +1,26 @@
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 import time
 import logging
 from .core.config import settings
+from .core.log_config import load_logging_config, setup_logging
+from .core.tracing import tracer
+from .core.loop_monitor import start_loop_monitor, stop_loop_monitor
+from .core.retention import start_retention_job, stop_retention_job
 from .core.agent_factory import AgentFactory
 from .api.router import router
+from .api.debug import router as debug_router
+from .api.chat_ws import router as chat_ws_router
+from .api.compression import CompressionMiddleware
+from .api.jobs import start_job_workers, stop_job_workers
+from .api.cache_warmup import start_cache_warmer, stop_cache_warmer
 
-# Setup logging
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+# Setup logging (queued, written by a background thread); LOG_LEVEL, from the
+# environment or .env, overrides system.logging.level
+setup_logging(
+    load_logging_config("config/agents.yaml"),
+    level=settings.LOG_LEVEL if "LOG_LEVEL" in settings.model_fields_set else None,
 )
 logger = logging.getLogger(__name__)
 
@@ -33,40 +44,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses according to Accept-Encoding
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
-    response = await call_next(request)
+    with tracer.start_trace("http.request", method=request.method, path=request.url.path) as span:
+        response = await call_next(request)
+        span.set_attribute("status_code", response.status_code)
     process_time = time.time() - start_time
     logger.debug(f"Request {request.method} {request.url.path} processed in {process_time:.5f}s")
     return response
 
-# Initialize agents on startup
-@app.on_event("startup")
-async def startup_event():
+def build_agent_factory() -> AgentFactory:
+    """
+    Load the configuration, import the tools and create every agent. Runs at
+    startup, or once in serve.py before the workers are forked.
+    """
     global agent_factory
-    logger.info("Starting application with configuration-based agents...")
-    
-    # Initialize database
-    try:
-        from .db.database import create_tables
-        create_tables()
-        logger.info("Database tables created/verified")
-    except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
-        # Don't block app startup for database issues
-    
-    # Initialize agent factory
     try:
-        agent_factory = AgentFactory("config/agents.yaml")
+        factory = AgentFactory("config/agents.yaml")
         
         # Create all agents from configuration
-        agents = agent_factory.create_agents()
+        agents = factory.create_agents()
         logger.info(f"Created {len(agents)} agents: {list(agents.keys())}")
         
         # Verify default agent exists
-        default_agent = agent_factory.get_default_agent()
+        default_agent = factory.get_default_agent()
         if default_agent:
             logger.info(f"Default agent: {default_agent.name}")
         else:
@@ -75,12 +86,65 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to initialize agents: {e}")
         raise
+    agent_factory = factory
+    return factory
+
+# Initialize agents on startup
+@app.on_event("startup")
+async def startup_event():
+    logger.info("Starting application with configuration-based agents...")
+    
+    # Initialize database
+    if settings.CREATE_TABLES_ON_STARTUP:
+        try:
+            from .db.database import create_tables
+            create_tables()
+            logger.info("Database tables created/verified")
+        except Exception as e:
+            logger.error(f"Database initialization failed: {e}")
+            # Don't block app startup for database issues
+    
+    # Initialize agent factory (unless it was built before forking)
+    if agent_factory is None:
+        build_agent_factory()
+    
+    # Start background job workers
+    await start_job_workers()
+    
+    if settings.CACHE_WARMUP_ENABLED:
+        start_cache_warmer(lambda: agent_factory.config_fingerprint)
+    
+    if settings.LOOP_MONITOR_ENABLED:
+        start_loop_monitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_BLOCK_THRESHOLD)
+    
+    if settings.RETENTION_ENABLED:
+        from .db.database import engine
+        start_retention_job(
+            engine,
+            settings.RETENTION_MONTHS,
+            settings.RETENTION_ARCHIVE_DIR,
+            settings.PARTITION_MONTHS_AHEAD,
+            settings.RETENTION_INTERVAL,
+        )
     
     logger.info("Application started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_loop_monitor()
+    await stop_retention_job()
+    await stop_cache_warmer()
+    await stop_job_workers()
+    if agent_factory:
+        await agent_factory.aclose()
+    if tracer.exporter:
+        await run_in_threadpool(tracer.exporter.close)
+
 # Function to get agent factory (for use in routers)
 def get_agent_factory() -> AgentFactory:
     return agent_factory
 
 # Include router
 app.include_router(router, prefix=settings.API_V1_STR)
+app.include_router(debug_router, prefix=settings.API_V1_STR)
+app.include_router(chat_ws_router, prefix=settings.API_V1_STR)
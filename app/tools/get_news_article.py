@@ -1,7 +1,10 @@
 import datetime
+import logging
 from agents import function_tool
 from duckduckgo_search import DDGS
 
+logger = logging.getLogger(__name__)
+
 
 @function_tool()
 def get_news_articles(topic: str):
@@ -14,7 +17,7 @@ def get_news_articles(topic: str):
     Returns:
         str: Formatted news results with titles, URLs, and descriptions
     """
-    print(f"Running DuckDuckGo news search for {topic}...")
+    logger.info(f"Running DuckDuckGo news search for {topic}...")
 
     # Get the current date in YYYY-MM format
     current_date = datetime.datetime.now().strftime("%Y-%m")
@@ -24,7 +27,7 @@ def get_news_articles(topic: str):
     results = ddg_api.text(f"{topic} {current_date}", max_results=5)
     if results:
         news_results = "\n\n".join([f"Title: {result['title']}\nURL: {result['href']}\nDescription: {result['body']}" for result in results])
-        print(news_results)
+        logger.debug(f"Found {len(results)} news results for {topic}")
         return news_results
     else:
         return f"Could not find news results for {topic}."
\ No newline at end of file
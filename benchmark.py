@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the API against the offline stub model.
+
+The app runs in-process (no server, no API key) with MODEL_PROVIDER=stub and,
+unless DATABASE_URL/REDIS_URL are set, a local SQLite database and no Redis.
+Each benchmark prints its results as JSON and exits with status 1 when a
+budget is exceeded, so it can run in CI.
+
+    python benchmark.py loop --requests 200 --concurrency 20 --max-lag-ms 250
+    python benchmark.py serialize --page-sizes 10,100,1000
+    python benchmark.py search --rows 2000000 --max-p99-ms 500
+    python benchmark.py answers --turns 20000 --repeat-rate 0.3
+    python benchmark.py ws --conversations 20 --turns 10
+    python benchmark.py startup --workers 4
+    python benchmark.py tools --items 3 --model-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("MODEL_PROVIDER", "stub")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:1/0")
+os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+os.environ.setdefault("OPENAI_AGENTS_DISABLE_TRACING", "1")
+
+QUESTIONS = [
+    "What is 17 * 23?",
+    "Who was Julius Caesar?",
+    "What time is it in Tokyo?",
+    "What is the weather like in Rome?",
+    "Explain the Pythagorean theorem",
+    "When did the French Revolution start?",
+]
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_load(client, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send `requests` distinct /ask calls with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def ask(i: int):
+        nonlocal errors
+        question = f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})"
+        async with semaphore:
+            start_time = time.perf_counter()
+            response = await client.post("/api/v1/ask", json={"question": question})
+            latencies.append(time.perf_counter() - start_time)
+            if response.status_code != 200:
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(ask(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start_time
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+async def bench_loop(args) -> bool:
+    """Event-loop lag under load: fails when the p99 lag or the number of blocks exceeds the budget."""
+    import httpx
+    from app.main import app
+    from app.core.loop_monitor import get_loop_monitor
+
+    async with app.router.lifespan_context(app):
+        monitor = get_loop_monitor()
+        if not monitor:
+            print("Event-loop monitor is disabled (LOOP_MONITOR_ENABLED=false)", file=sys.stderr)
+            return False
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # Warm up (agent creation, DB connections) before measuring
+            await run_load(client, min(10, args.requests), args.concurrency)
+            monitor.reset()
+            load = await run_load(client, args.requests, args.concurrency)
+
+        report = {
+            **load,
+            "loop": monitor.summary(),
+            "lag_histogram": monitor.histogram(),
+            "top_offenders": monitor.top_offenders(5, with_stack=False),
+        }
+    print(json.dumps(report, indent=2))
+
+    ok = load["errors"] == 0
+    if report["loop"]["lag_p99_ms"] > args.max_lag_ms:
+        print(f"FAIL: p99 event-loop lag {report['loop']['lag_p99_ms']:.1f}ms > {args.max_lag_ms}ms", file=sys.stderr)
+        ok = False
+    if args.max_blocks is not None and report["loop"]["blocks"] > args.max_blocks:
+        print(f"FAIL: {report['loop']['blocks']} blocking calls > {args.max_blocks}", file=sys.stderr)
+        ok = False
+    if load["errors"]:
+        print(f"FAIL: {load['errors']} requests failed", file=sys.stderr)
+    return ok
+
+def bench_serialize(args) -> bool:
+    """Serialization time and wire size of /conversations pages, old path vs fast path."""
+    import gzip
+    from collections import namedtuple
+    from datetime import datetime
+    from fastapi.encoders import jsonable_encoder
+    from app.api.models import ConversationResponse
+    from app.api.serialization import CONVERSATION_COLUMNS, render_conversations
+    from app.api.compression import brotli
+
+    Row = namedtuple("Row", list(CONVERSATION_COLUMNS))
+    ProjectedRow = namedtuple("ProjectedRow", ["id", "question", "agent_used", "created_at"])
+    answer = "The answer, explained step by step. " * (args.answer_chars // 36 + 1)
+
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start_time)
+        return best * 1000
+
+    results = []
+    for page_size in args.page_sizes:
+        rows = [
+            Row(f"conv-{i}", 0, f"Question number {i}?", answer[:args.answer_chars], "Math Tutor", 1.5, 420, datetime.now())
+            for i in range(page_size)
+        ]
+        projected = [ProjectedRow(r.id, r.question, r.agent_used, r.created_at) for r in rows]
+
+        def baseline():
+            # Previous path: model per row, jsonable_encoder, stdlib json
+            models = [ConversationResponse(**row._asdict()) for row in rows]
+            return json.dumps(jsonable_encoder(models)).encode()
+
+        body = render_conversations(rows, None).body
+        projected_body = render_conversations(projected, ["id", "question", "agent_used", "created_at"]).body
+        result = {
+            "page_size": page_size,
+            "baseline_ms": timed(baseline),
+            "fast_path_ms": timed(lambda: render_conversations(rows, None)),
+            "projected_ms": timed(lambda: render_conversations(projected, ["id", "question", "agent_used", "created_at"])),
+            "bytes": len(body),
+            "projected_bytes": len(projected_body),
+            "gzip_bytes": len(gzip.compress(body, 6)),
+            "gzip_ms": timed(lambda: gzip.compress(body, 6)),
+        }
+        if brotli is not None:
+            result["br_bytes"] = len(brotli.compress(body, quality=4))
+            result["br_ms"] = timed(lambda: brotli.compress(body, quality=4))
+        results.append(result)
+
+    print(json.dumps(results, indent=2))
+    return True
+
+SEARCH_TOPICS = [
+    "algebra", "geometry", "calculus", "fractions", "probability", "empire", "revolution", "dynasty",
+    "pharaoh", "senate", "weather", "forecast", "timezone", "calendar", "headline", "election",
+]
+SEARCH_FILLER = "the answer explains each step with a short example and a summary".split()
+
+def seed_search_rows(engine, rows: int, batch_size: int = 50000) -> None:
+    """Insert synthetic turns until conversation_turns holds `rows` rows (topic words follow a Zipf-like skew)."""
+    import random
+    from datetime import datetime, timedelta
+    from sqlalchemy import func, insert, select
+    from app.db.answers import answer_digest
+    from app.db.models import AnswerBlob, ConversationTurn
+    from app.db.search import index_turns
+
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(ConversationTurn)).scalar()
+        next_id = (conn.execute(select(func.max(ConversationTurn.id))).scalar() or 0) + 1
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(len(SEARCH_TOPICS))]
+    agents = ["Math Tutor", "History Expert", "Time Assistant", "News Reporter"]
+    start = datetime(2024, 1, 1)
+    for offset in range(existing, rows, batch_size):
+        turns, blobs = [], {}
+        for i in range(offset, min(rows, offset + batch_size)):
+            topics = rng.choices(SEARCH_TOPICS, weights, k=3)
+            answer = " ".join(rng.sample(SEARCH_FILLER, 8) + topics)
+            digest = answer_digest(answer)
+            blobs[digest] = {"digest": digest, "encoding": "raw", "body": answer.encode(), "size": len(answer)}
+            turns.append({
+                "id": next_id + i - existing,
+                "conversation_id": f"bench-{i}",
+                "turn_index": 0,
+                "question": f"Can you tell me about {topics[0]} and {topics[1]}?",
+                "answer": answer,
+                "agent_used": agents[i % len(agents)],
+                "created_at": start + timedelta(seconds=i * 10),
+            })
+        with engine.begin() as conn:
+            known = set(conn.execute(select(AnswerBlob.digest).where(AnswerBlob.digest.in_(list(blobs)))).scalars())
+            new_blobs = [blob for digest, blob in blobs.items() if digest not in known]
+            if new_blobs:
+                conn.execute(insert(AnswerBlob), new_blobs)
+            conn.execute(insert(ConversationTurn), [
+                {**turn, "answer": None, "answer_digest": answer_digest(turn["answer"])} for turn in turns
+            ])
+            index_turns(conn, turns)
+        print(f"seeded {min(rows, offset + batch_size)}/{rows} rows", file=sys.stderr)
+
+def bench_search(args) -> bool:
+    """Full-text search latency (first and deep keyset pages) on a synthetic dataset."""
+    from datetime import datetime
+    from app.db.database import SessionLocal, create_tables, engine
+    from app.db.search import search_turns
+
+    create_tables()
+    seed_search_rows(engine, args.rows)
+    cases = [
+        {"query": "pharaoh"},                       # rare term
+        {"query": "algebra"},                       # most frequent term
+        {"query": "calculus empire"},               # conjunction
+        {"query": "geometry", "agent": "Math Tutor"},
+        {"query": "revolution", "since": datetime(2024, 3, 1), "until": datetime(2024, 4, 1)},
+    ]
+    results = []
+    ok = True
+    with SessionLocal() as db:
+        for case in cases:
+            filters = {key: value for key, value in case.items() if key != "query"}
+            first, deep = [], []
+            for _ in range(args.repeat):
+                cursor = None
+                for page in range(args.deep_page + 1):
+                    start_time = time.perf_counter()
+                    rows, cursor = search_turns(db, case["query"], limit=args.limit, cursor=cursor, **filters)
+                    elapsed = time.perf_counter() - start_time
+                    if page == 0:
+                        first.append(elapsed)
+                    if not cursor:
+                        break
+                deep.append(elapsed)
+            result = {
+                "query": case["query"],
+                **{key: str(value) for key, value in filters.items()},
+                "first_page_p50_ms": percentile(first, 0.5) * 1000,
+                "first_page_p99_ms": percentile(first, 0.99) * 1000,
+                f"page_{args.deep_page}_p50_ms": percentile(deep, 0.5) * 1000,
+                f"page_{args.deep_page}_p99_ms": percentile(deep, 0.99) * 1000,
+            }
+            results.append(result)
+            worst = max(result["first_page_p99_ms"], result[f"page_{args.deep_page}_p99_ms"])
+            if worst > args.max_p99_ms:
+                print(f"FAIL: '{case['query']}' p99 {worst:.1f}ms > {args.max_p99_ms}ms", file=sys.stderr)
+                ok = False
+
+    print(json.dumps({"rows": args.rows, "dialect": engine.dialect.name, "results": results}, indent=2))
+    return ok
+
+def synthetic_answers(count: int, repeat_rate: float, seed: int = 7) -> List[str]:
+    """LLM-like answers: Zipf-distributed words in sentences and paragraphs, `repeat_rate` of them repeated."""
+    import random
+    rng = random.Random(seed)
+    syllables = ["an", "ti", "mo", "re", "sa", "lu", "ker", "vin", "do", "pra", "el", "ost", "qui", "ber"]
+    vocabulary = list({"".join(rng.choices(syllables, k=rng.randint(1, 4))) for _ in range(3000)})
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    answers: List[str] = []
+    for _ in range(count):
+        if answers and rng.random() < repeat_rate:
+            answers.append(rng.choice(answers))
+            continue
+        paragraphs = []
+        for _ in range(rng.randint(1, 6)):
+            sentences = []
+            for _ in range(rng.randint(2, 6)):
+                words = rng.choices(vocabulary, weights, k=rng.randint(6, 24))
+                sentences.append(" ".join(words).capitalize() + ".")
+            paragraphs.append(" ".join(sentences))
+        answers.append("\n\n".join(paragraphs))
+    return answers
+
+def bench_answers(args) -> bool:
+    """Storage size and read/write latency of inline vs content-addressed, compressed answers."""
+    import os
+    import tempfile
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import sessionmaker
+    from app.core.config import settings
+    from app.db.answers import store_answer, with_answer_blobs, resolve_answer, zstandard
+    from app.db.models import Base, ConversationTurn
+
+    answers = synthetic_answers(args.turns, args.repeat_rate)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for layout in ("inline", "content_addressed"):
+            path = os.path.join(directory, f"{layout}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            writes = []
+            with Session() as db:
+                for i, answer in enumerate(answers):
+                    start_time = time.perf_counter()
+                    turn = ConversationTurn(conversation_id=f"c{i}", turn_index=0, question=f"Question {i}?", agent_used="bench")
+                    if layout == "inline":
+                        turn.answer = answer
+                    else:
+                        turn.answer_digest = store_answer(db, answer)
+                    db.add(turn)
+                    db.commit()
+                    writes.append(time.perf_counter() - start_time)
+
+            reads = []
+            with Session() as db:
+                for page in range(args.pages):
+                    start_time = time.perf_counter()
+                    query = select(ConversationTurn.id, ConversationTurn.answer).order_by(ConversationTurn.id.desc())
+                    query = query.offset(page * args.page_size % len(answers)).limit(args.page_size)
+                    if layout == "content_addressed":
+                        query = with_answer_blobs(query)
+                    rows = [resolve_answer(dict(row)) for row in db.execute(query).mappings()]
+                    reads.append(time.perf_counter() - start_time)
+                    assert all(row["answer"] for row in rows)
+
+            with engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+            engine.dispose()
+            results[layout] = {
+                "db_bytes": os.path.getsize(path),
+                "write_p50_ms": percentile(writes, 0.5) * 1000,
+                "write_p99_ms": percentile(writes, 0.99) * 1000,
+                f"read_page_{args.page_size}_p50_ms": percentile(reads, 0.5) * 1000,
+                f"read_page_{args.page_size}_p99_ms": percentile(reads, 0.99) * 1000,
+            }
+
+    codec = settings.ANSWER_COMPRESSION if settings.ANSWER_COMPRESSION != "zstd" or zstandard else "zlib"
+    report = {
+        "turns": args.turns,
+        "distinct_answers": len(set(answers)),
+        "answer_bytes": sum(len(answer.encode()) for answer in answers),
+        "codec": codec,
+        **results,
+        "storage_reduction_pct": 100 * (1 - results["content_addressed"]["db_bytes"] / results["inline"]["db_bytes"]),
+    }
+    print(json.dumps(report, indent=2))
+    return True
+
+async def bench_ws(args) -> bool:
+    """Turns per second of multi-turn conversations over /chat/ws vs one /ask request per turn."""
+    os.environ["STUB_MODEL_LATENCY"] = str(args.model_latency)
+    import uuid
+    import httpx
+    import uvicorn
+    import websockets
+    from app.main import app
+
+    # A real server on a free local port: connection setup is part of what is measured
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    base_url = f"http://{host}:{port}/api/v1"
+
+    async def over_http(latencies: List[float], keep_alive: bool) -> int:
+        conversation_id = str(uuid.uuid4())
+        errors = 0
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as shared:
+            for turn in range(args.turns):
+                body = {"question": f"{QUESTIONS[turn % len(QUESTIONS)]} ({conversation_id}/{turn})",
+                        "conversation_id": conversation_id}
+                start_time = time.perf_counter()
+                if keep_alive:
+                    response = await shared.post("/ask", json=body)
+                else:
+                    # What the chat front-end does today: a new connection per turn
+                    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                        response = await client.post("/ask", json=body)
+                latencies.append(time.perf_counter() - start_time)
+                errors += response.status_code != 200
+        return errors
+
+    async def over_websocket(latencies: List[float]) -> int:
+        conversation_id = str(uuid.uuid4())
+        errors = 0
+        async with websockets.connect(f"ws://{host}:{port}/api/v1/chat/ws?conversation_id={conversation_id}") as socket:
+            json.loads(await socket.recv())  # session frame
+            for turn in range(args.turns):
+                start_time = time.perf_counter()
+                await socket.send(json.dumps({
+                    "type": "ask", "id": turn,
+                    "question": f"{QUESTIONS[turn % len(QUESTIONS)]} ({conversation_id}/{turn})",
+                }))
+                while True:
+                    frame = json.loads(await socket.recv())
+                    if frame["type"] in ("answer", "error"):
+                        break
+                latencies.append(time.perf_counter() - start_time)
+                errors += frame["type"] == "error"
+        return errors
+
+    modes = {
+        "http_new_connection": lambda latencies: over_http(latencies, keep_alive=False),
+        "http_keep_alive": lambda latencies: over_http(latencies, keep_alive=True),
+        "websocket": over_websocket,
+    }
+    report: Dict[str, Any] = {
+        "conversations": args.conversations,
+        "turns_per_conversation": args.turns,
+        "model_latency": args.model_latency,
+    }
+    ok = True
+    try:
+        for name, conversation in modes.items():
+            # Warm up (agent creation, DB connections) before measuring
+            await conversation([])
+            latencies: List[float] = []
+            start_time = time.perf_counter()
+            errors = sum(await asyncio.gather(*(conversation(latencies) for _ in range(args.conversations))))
+            elapsed = time.perf_counter() - start_time
+            report[name] = {
+                "errors": errors,
+                "turns_per_sec": len(latencies) / elapsed,
+                "turn_p50_ms": percentile(latencies, 0.5) * 1000,
+                "turn_p99_ms": percentile(latencies, 0.99) * 1000,
+            }
+            ok = ok and errors == 0
+    finally:
+        server.should_exit = True
+        await serving
+    report["websocket_speedup"] = report["websocket"]["turns_per_sec"] / report["http_new_connection"]["turns_per_sec"]
+    print(json.dumps(report, indent=2))
+    return ok
+
+def bench_startup(args) -> bool:
+    """App import time, and time from launch to the first successful /ask: uvicorn --workers vs serve.py."""
+    import signal
+    import socket
+    import subprocess
+    import tempfile
+    import httpx
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    importing = subprocess.run(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    report: Dict[str, Any] = {"workers": args.workers, "import_time_s": float(importing.stdout.strip().splitlines()[-1])}
+
+    def free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("uvicorn_workers", "serve_prefork"):
+            port = free_port()
+            command = {
+                "uvicorn_workers": [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                                    "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+                "serve_prefork": [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+                                  "--workers", str(args.workers)],
+            }[name]
+            # A fresh database each time: schema creation is part of the startup cost
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{directory}/{name}.db", "LOG_LEVEL": "WARNING"}
+            if args.workers > 1:
+                # Required by serve.py with several workers (the benchmark submits no jobs)
+                env["JOB_QUEUE_BACKEND"] = "redis"
+            start_time = time.perf_counter()
+            process = subprocess.Popen(command, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            first_answer = None
+            try:
+                with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+                    while time.perf_counter() - start_time < args.timeout and process.poll() is None:
+                        try:
+                            if client.post("/api/v1/ask", json={"question": "What is 2+2?"}).status_code == 200:
+                                first_answer = time.perf_counter() - start_time
+                                break
+                        except httpx.TransportError:
+                            pass
+                        time.sleep(0.05)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=30)
+            report[name] = {"first_answer_s": first_answer}
+            if first_answer is None:
+                print(f"FAIL: {name} did not answer within {args.timeout}s", file=sys.stderr)
+                ok = False
+    print(json.dumps(report, indent=2))
+    return ok
+
+TOOL_SCENARIOS = {
+    "get_weather": [{"location": city} for city in ["London", "Paris", "Tokyo", "Rome", "Madrid", "Berlin"]],
+    "calculate": [{"expression": expression} for expression in ["17 * 23", "2 ** 10", "(10 - 2) / 2", "1 / 0", "3 + 4", "99 - 1"]],
+}
+
+async def bench_tools(args) -> bool:
+    """Model round trips per conversation for list questions: one tool call per item vs `<tool>_many`."""
+    import uuid
+    from agents import Agent, Model, ModelResponse, RunConfig, Runner, Usage
+    from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputText
+    from app.core.tool_loader import BATCH_SUFFIX, ToolLoader
+
+    class ItemizedModel(Model):
+        """
+        Asks for the same items as a real model would: one tool call per
+        response ("per_item", the common case), all calls in one response
+        ("parallel_calls", parallel tool calls) or one `<tool>_many` call.
+        """
+
+        def __init__(self, mode: str, tool_name: str, items: List[Dict[str, Any]]):
+            self.mode, self.tool_name, self.items = mode, tool_name, items
+
+        async def get_response(self, system_instructions, input, model_settings, tools, output_schema,
+                               handoffs, tracing, **kwargs) -> ModelResponse:
+            await asyncio.sleep(args.model_latency)
+            done = sum(1 for item in input if isinstance(item, dict) and item.get("type") == "function_call_output")
+            if self.mode == "batched":
+                calls = [] if done else [(self.tool_name + BATCH_SUFFIX, {"items": self.items})]
+            elif self.mode == "parallel_calls":
+                calls = [] if done else [(self.tool_name, item) for item in self.items]
+            else:
+                calls = [(self.tool_name, self.items[done])] if done < len(self.items) else []
+            if calls:
+                output = [
+                    ResponseFunctionToolCall(id=f"fc_{uuid.uuid4().hex[:12]}", call_id=f"call_{uuid.uuid4().hex[:12]}",
+                                             name=name, arguments=json.dumps(arguments), type="function_call")
+                    for name, arguments in calls
+                ]
+            else:
+                output = [ResponseOutputMessage(
+                    id=f"msg_{uuid.uuid4().hex[:12]}", role="assistant", status="completed", type="message",
+                    content=[ResponseOutputText(text=f"{done} results", type="output_text", annotations=[])],
+                )]
+            return ModelResponse(output=output, usage=Usage(requests=1), response_id=None)
+
+        def stream_response(self, *args, **kwargs):
+            raise NotImplementedError
+
+    loader = ToolLoader()
+    report: Dict[str, Any] = {"items": args.items, "conversations": args.conversations, "model_latency": args.model_latency}
+    ok = True
+    for tool_name, all_items in TOOL_SCENARIOS.items():
+        items = [all_items[i % len(all_items)] for i in range(args.items)]
+        tools = loader.get_tools_by_names([tool_name])
+        scenario: Dict[str, Any] = {}
+        for mode in ("per_item", "parallel_calls", "batched"):
+            agent = Agent(
+                name="Benchmark Agent",
+                instructions="Answer with the tool results.",
+                tools=tools + (loader.get_batched_tools([tool_name]) if mode == "batched" else []),
+                model=ItemizedModel(mode, tool_name, items),
+            )
+
+            async def conversation() -> Dict[str, float]:
+                start_time = time.perf_counter()
+                result = await Runner.run(agent, "items", max_turns=args.items + 2,
+                                          run_config=RunConfig(tracing_disabled=True))
+                return {
+                    "round_trips": len(result.raw_responses),
+                    "tool_calls": sum(1 for item in result.new_items if item.type == "tool_call_item"),
+                    "seconds": time.perf_counter() - start_time,
+                }
+
+            results = await asyncio.gather(*(conversation() for _ in range(args.conversations)))
+            scenario[mode] = {
+                name + "_per_conversation": sum(r[name] for r in results) / len(results)
+                for name in ("round_trips", "tool_calls", "seconds")
+            }
+        scenario["round_trips_saved_per_conversation"] = (
+            scenario["per_item"]["round_trips_per_conversation"] - scenario["batched"]["round_trips_per_conversation"]
+        )
+        if args.items > 1 and scenario["round_trips_saved_per_conversation"] <= 0:
+            print(f"FAIL: {tool_name}{BATCH_SUFFIX} saved no round trips", file=sys.stderr)
+            ok = False
+        report[tool_name] = scenario
+    report["batch_stats"] = loader.batch_stats.to_dict()
+    print(json.dumps(report, indent=2))
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    loop_parser = subparsers.add_parser("loop", help="event-loop lag and blocking calls under /ask load")
+    loop_parser.add_argument("--requests", type=int, default=200)
+    loop_parser.add_argument("--concurrency", type=int, default=20)
+    loop_parser.add_argument("--max-lag-ms", type=float, default=250.0, help="budget for the p99 loop lag")
+    loop_parser.add_argument("--max-blocks", type=int, default=None, help="budget for blocking calls detected")
+    loop_parser.set_defaults(func=bench_loop)
+
+    serialize_parser = subparsers.add_parser("serialize", help="/conversations serialization time and size per page size")
+    serialize_parser.add_argument("--page-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[10, 100, 1000])
+    serialize_parser.add_argument("--answer-chars", type=int, default=2000)
+    serialize_parser.add_argument("--repeat", type=int, default=20)
+    serialize_parser.set_defaults(func=bench_serialize)
+
+    search_parser = subparsers.add_parser("search", help="/conversations/search latency on a synthetic dataset")
+    search_parser.add_argument("--rows", type=int, default=2000000, help="dataset size (rows are added, never removed)")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--deep-page", type=int, default=50, help="page reached through keyset cursors")
+    search_parser.add_argument("--repeat", type=int, default=5)
+    search_parser.add_argument("--max-p99-ms", type=float, default=500.0)
+    search_parser.set_defaults(func=bench_search)
+
+    answers_parser = subparsers.add_parser("answers", help="inline vs content-addressed answer storage")
+    answers_parser.add_argument("--turns", type=int, default=20000)
+    answers_parser.add_argument("--repeat-rate", type=float, default=0.3, help="fraction of answers that repeat an earlier one")
+    answers_parser.add_argument("--page-size", type=int, default=100)
+    answers_parser.add_argument("--pages", type=int, default=200)
+    answers_parser.set_defaults(func=bench_answers)
+
+    ws_parser = subparsers.add_parser("ws", help="turns/sec over /chat/ws vs /ask")
+    ws_parser.add_argument("--conversations", type=int, default=20, help="concurrent conversations")
+    ws_parser.add_argument("--turns", type=int, default=10, help="turns per conversation")
+    ws_parser.add_argument("--model-latency", type=float, default=0.0,
+                           help="stub model latency; 0 leaves only the transport and persistence cost")
+    ws_parser.set_defaults(func=bench_ws)
+
+    startup_parser = subparsers.add_parser("startup", help="import time and time to the first /ask, uvicorn --workers vs serve.py")
+    startup_parser.add_argument("--workers", type=int, default=4)
+    startup_parser.add_argument("--timeout", type=float, default=120.0)
+    startup_parser.set_defaults(func=bench_startup)
+
+    tools_parser = subparsers.add_parser("tools", help="model round trips per conversation with and without batched tools")
+    tools_parser.add_argument("--items", type=int, default=3, help="items per question (cities, expressions)")
+    tools_parser.add_argument("--conversations", type=int, default=20)
+    tools_parser.add_argument("--model-latency", type=float, default=0.05)
+    tools_parser.set_defaults(func=bench_tools)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    ok = asyncio.run(result) if asyncio.iscoroutine(result) else result
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
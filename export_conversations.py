@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Export conversation turns (joined with user feedback) to a file or stdout.
+
+Rows are streamed from the database through a server-side cursor and written
+chunk by chunk, so memory use does not grow with the number of rows. Parquet
+and Arrow output require pyarrow.
+
+    python export_conversations.py --since 2024-01-01 --agent "Math Tutor" -o turns.ndjson
+    python export_conversations.py --format parquet --output turns.parquet
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.api.export import EXPORT_FORMATS, check_format, stream_export
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO date/time, inclusive")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO date/time, exclusive")
+    parser.add_argument("--agent", help="only turns answered by this agent (its name, e.g. \"Math Tutor\")")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows fetched and written per chunk")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        check_format(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    chunks = stream_export(args.format, args.chunk_size, since=args.since, until=args.until, agent=args.agent)
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
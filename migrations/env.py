@@ -0,0 +1,44 @@
+"""
+Alembic environment: runs the migrations against settings.DATABASE_URL, or on
+the connection passed in by app.db.database.create_tables().
+"""
+from alembic import context
+from app.core.config import settings
+from app.db.models import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    # The SQLite FTS5 tables are managed by app.db.search.ensure_search_index()
+    return not (type_ == "table" and name.startswith("conversation_turns_fts"))
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=settings.DATABASE_URL, target_metadata=target_metadata, include_object=include_object, literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def _run(connection) -> None:
+    # SQLite cannot alter columns in place: batch operations copy the table
+    context.configure(
+        connection=connection, target_metadata=target_metadata, include_object=include_object, render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    from app.db.database import engine
+    with engine.connect() as connection:
+        _run(connection)
+        connection.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,49 @@
+"""Baseline schema: one row per question in conversations
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2025-01-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "conversations",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("question", sa.Text, nullable=False),
+        sa.Column("answer", sa.Text, nullable=False),
+        sa.Column("agent_used", sa.String, nullable=False),
+        sa.Column("processing_time", sa.Float),
+        sa.Column("tokens_used", sa.Integer),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("user_ip", sa.String),
+    )
+    op.create_table(
+        "agent_metrics",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("agent_name", sa.String, nullable=False, unique=True),
+        sa.Column("questions_handled", sa.Integer),
+        sa.Column("avg_processing_time", sa.Float),
+        sa.Column("total_tokens_used", sa.Integer),
+        sa.Column("success_rate", sa.Float),
+        sa.Column("last_updated", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "user_feedback",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("conversation_id", sa.String, nullable=False),
+        sa.Column("rating", sa.Integer),
+        sa.Column("feedback_text", sa.Text),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+def downgrade() -> None:
+    op.drop_table("user_feedback")
+    op.drop_table("agent_metrics")
+    op.drop_table("conversations")
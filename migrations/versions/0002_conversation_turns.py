@@ -0,0 +1,288 @@
+"""Conversation turns, answer blobs, idempotency keys, usage and feedback aggregates
+
+Moves every baseline conversation (one question and answer per row) into
+conversation_turns as its turn 0, leaving conversations as the header
+(turn_count, updated_at, user_ip). The answers stay inline in
+conversation_turns.answer, which is read as is next to answer_blobs. Also adds
+the token/cost and feedback columns of agent_metrics, attributes existing
+feedback to the agent that answered, and folds it into feedback_aggregates
+and the agent totals.
+
+Revision ID: 0002_conversation_turns
+Revises: 0001_baseline
+Create Date: 2025-01-01
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_conversation_turns"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+# Values of app.core.config at the time of this migration
+FEEDBACK_BUCKET_SECONDS = 3600
+FEEDBACK_POSITIVE_RATING = 4
+
+conversations = sa.table(
+    "conversations",
+    sa.column("id", sa.String),
+    sa.column("question", sa.Text),
+    sa.column("answer", sa.Text),
+    sa.column("agent_used", sa.String),
+    sa.column("processing_time", sa.Float),
+    sa.column("tokens_used", sa.Integer),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+    sa.column("updated_at", sa.DateTime(timezone=True)),
+    sa.column("turn_count", sa.Integer),
+)
+conversation_turns = sa.table(
+    "conversation_turns",
+    sa.column("conversation_id", sa.String),
+    sa.column("turn_index", sa.Integer),
+    sa.column("question", sa.Text),
+    sa.column("answer", sa.Text),
+    sa.column("agent_used", sa.String),
+    sa.column("processing_time", sa.Float),
+    sa.column("tokens_used", sa.Integer),
+    sa.column("cached", sa.Boolean),
+    sa.column("status", sa.String),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+)
+user_feedback = sa.table(
+    "user_feedback",
+    sa.column("conversation_id", sa.String),
+    sa.column("agent_name", sa.String),
+    sa.column("rating", sa.Integer),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+)
+agent_metrics = sa.table(
+    "agent_metrics",
+    sa.column("agent_name", sa.String),
+    sa.column("questions_handled", sa.Integer),
+    sa.column("avg_processing_time", sa.Float),
+    sa.column("total_tokens_used", sa.Integer),
+    sa.column("feedback_count", sa.Integer),
+    sa.column("feedback_rating_sum", sa.Integer),
+    sa.column("feedback_positive", sa.Integer),
+    sa.column("success_rate", sa.Float),
+)
+feedback_aggregates = sa.table(
+    "feedback_aggregates",
+    sa.column("agent_name", sa.String),
+    sa.column("bucket_start", sa.DateTime(timezone=True)),
+    *[sa.column(name, sa.Integer) for name in
+      ["count", "rating_sum", "positive", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"]],
+)
+
+AGENT_METRICS_COLUMNS = [
+    ("total_input_tokens", sa.Integer, "0"),
+    ("total_cached_tokens", sa.Integer, "0"),
+    ("total_output_tokens", sa.Integer, "0"),
+    ("total_cost", sa.Float, "0"),
+    ("model_requests", sa.Integer, "0"),
+    ("feedback_count", sa.Integer, "0"),
+    ("feedback_rating_sum", sa.Integer, "0"),
+    ("feedback_positive", sa.Integer, "0"),
+]
+BASELINE_CONVERSATION_COLUMNS = ["question", "answer", "agent_used", "processing_time", "tokens_used"]
+
+def _create_turns_table() -> None:
+    # Created unpartitioned, like every table that predates app.db.partitions:
+    # the rows moved in below would otherwise need their monthly partitions first
+    op.create_table(
+        "conversation_turns",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("conversation_id", sa.String, nullable=False),
+        sa.Column("turn_index", sa.Integer, nullable=False),
+        sa.Column("question", sa.Text, nullable=False),
+        sa.Column("question_digest", sa.String),
+        sa.Column("answer", sa.Text),
+        sa.Column("answer_digest", sa.String),
+        sa.Column("agent_used", sa.String, nullable=False),
+        sa.Column("processing_time", sa.Float),
+        sa.Column("tokens_used", sa.Integer),
+        sa.Column("input_tokens", sa.Integer),
+        sa.Column("cached_tokens", sa.Integer),
+        sa.Column("output_tokens", sa.Integer),
+        sa.Column("cost", sa.Float),
+        sa.Column("cached", sa.Boolean),
+        sa.Column("status", sa.String),
+        sa.Column("config_fingerprint", sa.String),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("conversation_id", "turn_index"),
+    )
+    op.create_index("ix_conversation_turns_conversation_id", "conversation_turns", ["conversation_id"])
+    op.create_index("ix_conversation_turns_fingerprint_created_at", "conversation_turns",
+                    ["config_fingerprint", "created_at"])
+
+def _bucket_start(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % FEEDBACK_BUCKET_SECONDS, tz=timezone.utc)
+
+def _fold_existing_feedback(conn) -> None:
+    buckets = defaultdict(Counter)
+    agents = defaultdict(Counter)
+    rows = conn.execute(
+        sa.select(user_feedback.c.agent_name, user_feedback.c.rating, user_feedback.c.created_at)
+        .where(user_feedback.c.agent_name.isnot(None), user_feedback.c.rating.between(1, 5))
+    )
+    for agent_name, rating, created_at in rows:
+        positive = int(rating >= FEEDBACK_POSITIVE_RATING)
+        totals = buckets[(agent_name, _bucket_start(created_at or datetime.now(timezone.utc)))]
+        totals.update({"count": 1, "rating_sum": rating, "positive": positive, f"rating_{rating}": 1})
+        agents[agent_name].update({"feedback_count": 1, "feedback_rating_sum": rating, "feedback_positive": positive})
+
+    if buckets:
+        conn.execute(sa.insert(feedback_aggregates), [
+            {
+                "agent_name": agent_name,
+                "bucket_start": bucket,
+                **{name: totals[name] for name in
+                   ["count", "rating_sum", "positive", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"]},
+            }
+            for (agent_name, bucket), totals in buckets.items()
+        ])
+    existing = set(conn.execute(sa.select(agent_metrics.c.agent_name)).scalars())
+    for agent_name, totals in agents.items():
+        values = {
+            **totals,
+            "success_rate": 100.0 * totals["feedback_positive"] / totals["feedback_count"],
+        }
+        if agent_name in existing:
+            conn.execute(sa.update(agent_metrics).where(agent_metrics.c.agent_name == agent_name).values(**values))
+        else:
+            conn.execute(sa.insert(agent_metrics).values(
+                agent_name=agent_name, questions_handled=0, avg_processing_time=0.0, total_tokens_used=0, **values,
+            ))
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    _create_turns_table()
+    op.create_table(
+        "answer_blobs",
+        sa.Column("digest", sa.String, primary_key=True),
+        sa.Column("encoding", sa.String, nullable=False),
+        sa.Column("body", sa.LargeBinary, nullable=False),
+        sa.Column("size", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("key", sa.String, primary_key=True),
+        sa.Column("request_fingerprint", sa.String, nullable=False),
+        sa.Column("conversation_id", sa.String, nullable=False),
+        sa.Column("turn_id", sa.Integer),
+        sa.Column("response", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "feedback_aggregates",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("agent_name", sa.String, nullable=False),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        *[sa.Column(name, sa.Integer, nullable=False, server_default="0") for name in
+          ["count", "rating_sum", "positive", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"]],
+        sa.UniqueConstraint("agent_name", "bucket_start"),
+    )
+
+    # Each baseline conversation becomes turn 0 of itself
+    conn.execute(sa.insert(conversation_turns).from_select(
+        ["conversation_id", "turn_index", "question", "answer", "agent_used", "processing_time", "tokens_used",
+         "cached", "status", "created_at"],
+        sa.select(
+            conversations.c.id, sa.literal(0), conversations.c.question, conversations.c.answer,
+            conversations.c.agent_used, conversations.c.processing_time, conversations.c.tokens_used,
+            sa.false(), sa.literal("completed"), sa.func.coalesce(conversations.c.created_at, sa.func.now()),
+        ),
+    ))
+
+    with op.batch_alter_table("user_feedback") as batch:
+        batch.add_column(sa.Column("agent_name", sa.String))
+        batch.create_index("ix_user_feedback_conversation_id", ["conversation_id"])
+    conn.execute(sa.update(user_feedback).values(
+        agent_name=sa.select(conversations.c.agent_used)
+        .where(conversations.c.id == user_feedback.c.conversation_id)
+        .scalar_subquery()
+    ))
+
+    with op.batch_alter_table("agent_metrics") as batch:
+        for name, type_, default in AGENT_METRICS_COLUMNS:
+            batch.add_column(sa.Column(name, type_, server_default=default))
+    _fold_existing_feedback(conn)
+
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("turn_count", sa.Integer, nullable=False, server_default="0"))
+        batch.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()))
+    conn.execute(sa.update(conversations).values(turn_count=1, updated_at=conversations.c.created_at))
+    with op.batch_alter_table("conversations") as batch:
+        for name in BASELINE_CONVERSATION_COLUMNS:
+            batch.drop_column(name)
+
+def downgrade() -> None:
+    """Back to one row per conversation, holding its first turn; later turns are dropped."""
+    conn = op.get_bind()
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("question", sa.Text, nullable=False, server_default=""))
+        batch.add_column(sa.Column("answer", sa.Text, nullable=False, server_default=""))
+        batch.add_column(sa.Column("agent_used", sa.String, nullable=False, server_default=""))
+        batch.add_column(sa.Column("processing_time", sa.Float))
+        batch.add_column(sa.Column("tokens_used", sa.Integer))
+
+    turns = sa.table(
+        "conversation_turns",
+        sa.column("conversation_id", sa.String),
+        sa.column("turn_index", sa.Integer),
+        sa.column("question", sa.Text),
+        sa.column("answer", sa.Text),
+        sa.column("answer_digest", sa.String),
+        sa.column("agent_used", sa.String),
+        sa.column("processing_time", sa.Float),
+        sa.column("tokens_used", sa.Integer),
+    )
+    blobs = sa.table("answer_blobs", sa.column("digest", sa.String), sa.column("encoding", sa.String),
+                     sa.column("body", sa.LargeBinary))
+    first_turns = conn.execute(
+        sa.select(turns.c.conversation_id, turns.c.question, turns.c.answer, blobs.c.encoding, blobs.c.body,
+                  turns.c.agent_used, turns.c.processing_time, turns.c.tokens_used)
+        .select_from(turns.outerjoin(blobs, blobs.c.digest == turns.c.answer_digest))
+        .where(turns.c.turn_index == 0)
+    ).all()
+    if first_turns:
+        from app.db.answers import decode_answer
+        conn.execute(
+            sa.update(conversations).where(conversations.c.id == sa.bindparam("turn_conversation_id")),
+            [
+                {
+                    "turn_conversation_id": row.conversation_id,
+                    "question": row.question,
+                    "answer": decode_answer(row.encoding, row.body) if row.body is not None else (row.answer or ""),
+                    "agent_used": row.agent_used,
+                    "processing_time": row.processing_time,
+                    "tokens_used": row.tokens_used,
+                }
+                for row in first_turns
+            ],
+        )
+
+    with op.batch_alter_table("conversations") as batch:
+        batch.drop_column("turn_count")
+        batch.drop_column("updated_at")
+    with op.batch_alter_table("agent_metrics") as batch:
+        for name, _, _ in AGENT_METRICS_COLUMNS:
+            batch.drop_column(name)
+    with op.batch_alter_table("user_feedback") as batch:
+        batch.drop_index("ix_user_feedback_conversation_id")
+        batch.drop_column("agent_name")
+    op.drop_table("feedback_aggregates")
+    op.drop_table("idempotency_keys")
+    op.drop_table("answer_blobs")
+    if conn.dialect.name == "sqlite":
+        # Rebuilt from the turns by ensure_search_index() after the next upgrade
+        op.execute("DROP TABLE IF EXISTS conversation_turns_fts")
+    op.drop_table("conversation_turns")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Production server: N uvicorn workers forked from one preloaded process.
+
+The parent creates the database schema, imports the app and its tools and
+builds the agent graph once; the workers are forked from it and share that
+work (and memory, copy-on-write). Redis and database connections are opened
+lazily by each worker after the fork. The parent owns the listening socket,
+replaces workers that exit and stops them all on SIGTERM/SIGINT.
+
+Each worker has its own memory, so with more than one worker the job queue
+must be shared: serve.py refuses to start with JOB_QUEUE_BACKEND=memory.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--skip-schema", action="store_true", help="do not create the schema (run init_db.py instead)")
+    return parser.parse_args()
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket) -> None:
+    """Serve requests on the inherited socket until SIGTERM/SIGINT (runs in the forked child)."""
+    import asyncio
+    import uvicorn
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    # log_config=None: uvicorn's loggers go through the app's logging pipeline
+    server = uvicorn.Server(uvicorn.Config(app, log_config=None, proxy_headers=True))
+    asyncio.run(server.serve(sockets=[sock]))
+
+def check_job_backend(workers: int, backend: str) -> None:
+    """A job submitted to one worker's in-memory queue would be invisible (404) on the others."""
+    if workers > 1 and backend == "memory":
+        raise SystemExit(
+            f"JOB_QUEUE_BACKEND=memory cannot be shared by {workers} workers: "
+            "set JOB_QUEUE_BACKEND=redis or run with --workers 1"
+        )
+
+def main() -> None:
+    args = parse_args()
+    from app.core.config import settings
+    check_job_backend(args.workers, settings.JOB_QUEUE_BACKEND)
+    # The parent creates the schema once; workers must not repeat it at startup
+    os.environ["CREATE_TABLES_ON_STARTUP"] = "false"
+
+    start_time = time.perf_counter()
+    import logging
+    from app.main import app, build_agent_factory
+    from app.core.log_config import stop_logging
+    from app.db.database import create_tables, engine
+    import_time = time.perf_counter() - start_time
+    logger = logging.getLogger("serve")
+
+    if not args.skip_schema:
+        try:
+            create_tables()
+        except Exception as e:
+            logger.error(f"Database initialization failed: {e}")
+        # Workers open their own connections
+        engine.dispose()
+
+    preload_start = time.perf_counter()
+    build_agent_factory()
+    preload_time = time.perf_counter() - preload_start
+    logger.info(
+        f"Preloaded app in {import_time:.2f}s (import) + {preload_time:.2f}s (agents), "
+        f"starting {args.workers} workers on {args.host}:{args.port}",
+        extra={"import_time": import_time, "preload_time": preload_time, "workers": args.workers},
+    )
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    workers = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(app, sock)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                stop_logging()
+                os._exit(code)
+        workers[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        spawn()
+
+    signalled = False
+    while workers:
+        if stopping and not signalled:
+            logger.info("Stopping workers")
+            for pid in workers:
+                os.kill(pid, signal.SIGTERM)
+            signalled = True
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, replacing it")
+        # Do not spin when workers die right after starting
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        spawn()
+    sock.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
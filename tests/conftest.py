@@ -0,0 +1,37 @@
+"""
+Tests run the app in-process against the offline stub model, a throwaway
+SQLite database and no Redis (the cache and idempotency fall back to the
+database), so they need neither API keys nor services.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+_TMP = tempfile.mkdtemp(prefix="agents-tests-")
+
+os.environ.update({
+    "MODEL_PROVIDER": "stub",
+    "STUB_MODEL_LATENCY": "0",
+    "DATABASE_URL": f"sqlite:///{_TMP}/test.db",
+    "REDIS_URL": "redis://localhost:1/0",
+    "TRACING_ENABLED": "false",
+    "TRACE_EXPORT_PATH": f"{_TMP}/spans.jsonl",
+    "CACHE_WARMUP_ENABLED": "false",
+    "LOOP_MONITOR_ENABLED": "false",
+    "RETENTION_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+    "OPENAI_AGENTS_DISABLE_TRACING": "1",
+})
+# config/agents.yaml is loaded relative to the working directory
+os.chdir(_ROOT)
+
+import pytest
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
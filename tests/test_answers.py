@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.db.answers import answer_digest, decode_answer, encode_answer, resolve_answer, store_answer, with_answer_blobs
+from app.db.models import AnswerBlob, Base, ConversationTurn
+
+LONG = "Step one: add the numbers. Step two: check the result. " * 20
+
+@pytest.mark.parametrize("text, min_size, codec, encoding", [
+    ("Short answer", 512, "zlib", "raw"),
+    (LONG, 512, "zlib", "zlib"),
+    ("Ünïcödé ✓ " * 100, 64, "zlib", "zlib"),
+])
+def test_encoded_answers_decode_to_the_same_text(text, min_size, codec, encoding):
+    stored_encoding, body = encode_answer(text, min_size, codec)
+
+    assert stored_encoding == encoding
+    assert decode_answer(stored_encoding, body) == text
+
+def test_zstd_falls_back_to_zlib_without_the_package(monkeypatch):
+    from app.db import answers
+    monkeypatch.setattr(answers, "zstandard", None)
+
+    encoding, body = encode_answer(LONG, 512, "zstd")
+
+    assert encoding == "zlib"
+    assert decode_answer(encoding, body) == LONG
+    with pytest.raises(RuntimeError, match="zstandard"):
+        decode_answer("zstd", body)
+
+def test_incompressible_answer_is_stored_raw():
+    # zlib's header and checksum outweigh what it saves on a short text
+    assert encode_answer("Yes, 42.", 1, "zlib") == ("raw", b"Yes, 42.")
+
+def test_repeated_answers_share_one_blob(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'answers.db'}")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        digests = [store_answer(db, text) for text in (LONG, LONG, "Another answer")]
+        for index, digest in enumerate(digests):
+            db.add(ConversationTurn(conversation_id="c1", turn_index=index, question="Q?",
+                                    answer_digest=digest, agent_used="Math Tutor"))
+        db.commit()
+
+        assert digests[0] == digests[1] == answer_digest(LONG)
+        assert db.scalar(select(func.count()).select_from(AnswerBlob)) == 2
+        rows = db.execute(with_answer_blobs(select(ConversationTurn.turn_index)).order_by(ConversationTurn.turn_index))
+        assert [resolve_answer(dict(row._mapping))["answer"] for row in rows] == [LONG, LONG, "Another answer"]
+        turn = db.scalars(select(ConversationTurn).where(ConversationTurn.turn_index == 2)).one()
+        assert turn.answer_text == "Another answer"
+
+def test_inline_answers_of_older_turns_still_resolve():
+    row = resolve_answer({"answer": "Stored inline", "answer_encoding": None, "answer_body": None})
+
+    assert row == {"answer": "Stored inline"}
@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api import cache_warmup
+from app.api.cache_warmup import CacheWarmer
+from app.api.service import cache_key
+from app.core.config import settings
+from app.db.answers import store_answer
+from app.db.models import Base, ConversationTurn
+
+FINGERPRINT = "config-a"
+
+@pytest.fixture
+def warm_env(tmp_path, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    engine = create_engine(f"sqlite:///{tmp_path / 'warmup.db'}")
+    Base.metadata.create_all(engine)
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache_warmup, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(cache_warmup, "get_redis_client", lambda: redis_client)
+    return engine, redis_client
+
+def _ask(db, digest, answer, minutes_ago, status="completed", fingerprint=FINGERPRINT):
+    index = db.query(ConversationTurn).count()
+    db.add(ConversationTurn(
+        conversation_id=f"c{index}", turn_index=0, question=f"question {digest}", question_digest=digest,
+        answer_digest=store_answer(db, answer), agent_used="Math Tutor", status=status,
+        config_fingerprint=fingerprint, created_at=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago),
+    ))
+    db.flush()
+
+def _warmer():
+    return CacheWarmer(lambda: FINGERPRINT, budget=10, rate=1000, batch_size=2, min_count=2, interval=0)
+
+def test_frequent_answers_are_loaded_with_the_remaining_ttl(warm_env):
+    engine, redis_client = warm_env
+    with Session(engine) as db:
+        for minutes_ago, answer in ((50, "old answer"), (40, "old answer"), (10, "latest answer")):
+            _ask(db, "frequent", answer, minutes_ago)
+        _ask(db, "rare", "rare answer", 5)
+        _ask(db, "partial", "cut short", 5, status="partial")
+        _ask(db, "partial", "cut short", 4, status="partial")
+        _ask(db, "other-config", "other", 5, fingerprint="config-b")
+        _ask(db, "other-config", "other", 4, fingerprint="config-b")
+        _ask(db, "expired", "stale", 70)
+        _ask(db, "expired", "stale", 65)
+        db.commit()
+
+    report = _warmer().warm()
+
+    assert (report["candidates"], report["warmed"], report["already_cached"]) == (1, 1, 0)
+    key = cache_key("frequent", FINGERPRINT)
+    cached = json.loads(redis_client.get(key))
+    assert cached["answer"] == "latest answer"
+    assert cached["metadata"] == {"warmed": True, "asked": 3}
+    # Expires when the latest answer would have: 10 of the CACHE_EXPIRATION seconds are gone
+    assert settings.CACHE_EXPIRATION - 10 * 60 - 5 <= redis_client.ttl(key) <= settings.CACHE_EXPIRATION - 10 * 60
+    assert redis_client.keys("answer:*") == [key]
+    assert redis_client.get("cache-warmup:lock") is None
+
+def test_entries_already_cached_are_left_alone(warm_env):
+    engine, redis_client = warm_env
+    with Session(engine) as db:
+        _ask(db, "frequent", "stored answer", 10)
+        _ask(db, "frequent", "stored answer", 5)
+        db.commit()
+    key = cache_key("frequent", FINGERPRINT)
+    redis_client.set(key, "fresher answer", ex=100)
+
+    report = _warmer().warm()
+
+    assert (report["warmed"], report["already_cached"]) == (0, 1)
+    assert redis_client.get(key) == "fresher answer"
+    assert redis_client.ttl(key) <= 100
+
+def test_warmup_is_skipped_while_another_worker_holds_the_lock(warm_env):
+    _, redis_client = warm_env
+    redis_client.set("cache-warmup:lock", "1")
+
+    assert _warmer().warm() == {"skipped": "another worker is warming the cache"}
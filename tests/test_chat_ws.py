@@ -0,0 +1,61 @@
+import asyncio
+
+from app.core.guardrails import GuardrailChecker, GuardrailVerdict
+from app.main import get_agent_factory
+
+def _receive_answer(websocket, frame_id):
+    frames = []
+    while True:
+        frame = websocket.receive_json()
+        if frame.get("id") != frame_id:
+            continue
+        frames.append(frame)
+        if frame["type"] in ("answer", "error"):
+            return frames
+
+def test_answer_is_streamed_as_model_deltas(client):
+    with client.websocket_connect("/api/v1/chat/ws") as websocket:
+        conversation_id = websocket.receive_json()["conversation_id"]
+        websocket.send_json({"type": "ask", "id": "q1", "question": "What is 2+2 in math?"})
+        frames = _receive_answer(websocket, "q1")
+
+    assert frames[-1]["type"] == "answer"
+    deltas = [frame["text"] for frame in frames if frame["type"] == "delta"]
+    # The stub model emits one word per delta, far below WS_STREAM_CHUNK_SIZE
+    assert len(deltas) > 1
+    assert "reset" not in [frame["type"] for frame in frames]
+    turns = client.get(f"/api/v1/conversations/{conversation_id}").json()["turns"]
+    assert "".join(deltas) == turns[-1]["answer"]
+
+class _SlowGuardrail(GuardrailChecker):
+    """Guardrail that decides after `delay` seconds, long after the stub has streamed its answer."""
+
+    def __init__(self, tripped, delay=0.3):
+        super().__init__("slow", {"instructions": "Reject nothing."}, "stub")
+        self.tripped = tripped
+        self.delay = delay
+
+    async def check(self, question, context=None):
+        await asyncio.sleep(self.delay)
+        return GuardrailVerdict(tripwire_triggered=self.tripped, reasoning="scripted")
+
+def _ask_guarded(client, monkeypatch, guardrail, question):
+    factory = get_agent_factory()
+    monkeypatch.setattr(factory, "get_agent_guardrails", lambda agent_id: [guardrail])
+    with client.websocket_connect("/api/v1/chat/ws") as websocket:
+        conversation_id = websocket.receive_json()["conversation_id"]
+        websocket.send_json({"type": "ask", "id": "q1", "question": question})
+        return conversation_id, _receive_answer(websocket, "q1")
+
+def test_tripped_guardrail_sends_no_deltas(client, monkeypatch):
+    _, frames = _ask_guarded(client, monkeypatch, _SlowGuardrail(tripped=True), "What is 3+3 in math?")
+
+    assert [frame["type"] for frame in frames] == ["error"]
+    assert frames[0]["status_code"] == 400
+
+def test_deltas_are_held_until_the_guardrails_pass(client, monkeypatch):
+    conversation_id, frames = _ask_guarded(client, monkeypatch, _SlowGuardrail(tripped=False), "What is 4+4 in math?")
+
+    assert [frame["type"] for frame in frames] == ["delta", "answer"]
+    turns = client.get(f"/api/v1/conversations/{conversation_id}").json()["turns"]
+    assert frames[0]["text"] == turns[-1]["answer"]
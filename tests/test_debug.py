@@ -0,0 +1,21 @@
+import pytest
+
+from app.core.config import settings
+
+@pytest.mark.parametrize("url", ["/api/v1/debug/loop", "/api/v1/debug/profile?seconds=0.1"])
+def test_debug_endpoints_require_the_admin_token(client, monkeypatch, url):
+    # Disabled while ADMIN_TOKEN is empty
+    assert client.get(url).status_code == 404
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+
+    assert client.get(url).status_code == 403
+    assert client.get(url, headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+def test_loop_report_with_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+
+    response = client.get("/api/v1/debug/loop", headers={"X-Admin-Token": "secret"})
+
+    # Past the gate: the monitor is disabled in the tests
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Event-loop monitor is disabled"
@@ -0,0 +1,70 @@
+"""
+Fan-out under MODEL_PROVIDER=stub. The planner is given a scripted plan; the
+stub specialists answer "[<model>] Stub answer to: <question>" and the stub
+merger echoes its input, so the merged answer shows what it was given.
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.fan_out import FanOutRunner
+from app.core.stub_model import StubModel
+from app.main import get_agent_factory
+
+class PlanStub(StubModel):
+    """Stub planner returning a fixed plan."""
+
+    def __init__(self, sub_questions):
+        super().__init__("gpt-4", latency=0)
+        self.plan = json.dumps({"sub_questions": sub_questions})
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, *args, **kwargs):
+        response = await super().get_response(system_instructions, input, model_settings, tools, None, *args, **kwargs)
+        response.output[0].content[0].text = self.plan
+        return response
+
+class FailingStub(StubModel):
+    async def get_response(self, *args, **kwargs):
+        raise RuntimeError("provider error")
+
+MATH = {"agent_id": "math_tutor", "question": "What is 12 squared?"}
+HISTORY = {"agent_id": "history_tutor", "question": "When did Rome fall?"}
+
+def _fan_out(sub_questions, failing=(), max_branches=3):
+    factory = get_agent_factory()
+    specialists = {
+        agent_id: factory.agents[agent_id].clone(model=FailingStub("gpt-4", latency=0)) if agent_id in failing
+        else factory.agents[agent_id]
+        for agent_id in ("math_tutor", "history_tutor")
+    }
+    runner = FanOutRunner(specialists, {}, {"max_branches": max_branches})
+    runner.planner = runner.planner.clone(model=PlanStub(sub_questions))
+    runner.merger = runner.merger.clone(model=StubModel("gpt-4", latency=0))
+    return asyncio.run(runner.run("What is 12 squared, and when did Rome fall?"))
+
+def test_branch_answers_are_merged(client):
+    result = _fan_out([MATH, HISTORY])
+
+    assert [(b.agent_name, b.succeeded) for b in result.branches] == [("Math Tutor", True), ("History Tutor", True)]
+    assert "[Math Tutor] What is 12 squared?\n[gpt-4] Stub answer to: What is 12 squared?" in result.answer
+    assert "[History Tutor] When did Rome fall?\n" in result.answer
+    # planner, both branches, merger
+    assert len(result.results) == 4
+
+def test_failed_branch_is_left_out_of_the_merge(client):
+    result = _fan_out([MATH, HISTORY], failing={"history_tutor"})
+
+    history = result.branches[1]
+    assert not history.succeeded and history.error == "provider error"
+    assert "[Math Tutor]" in result.answer and "[History Tutor]" not in result.answer
+    assert len(result.results) == 3
+
+def test_all_branches_failing_raises(client):
+    with pytest.raises(RuntimeError, match="All fan-out branches failed"):
+        _fan_out([MATH, HISTORY], failing={"math_tutor", "history_tutor"})
+
+def test_single_domain_or_unknown_plans_fall_back(client):
+    assert _fan_out([MATH]) is None
+    assert _fan_out([MATH, {"agent_id": "unknown", "question": "?"}]) is None
+    assert _fan_out([MATH, HISTORY], max_branches=1) is None
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import feedback
+from app.db.feedback import bucket_start, record_feedback
+from app.db.models import AgentMetrics, Base, Conversation, ConversationTurn, FeedbackAggregate, UserFeedback
+
+NOW = datetime(2024, 6, 15, 10, 30, tzinfo=timezone.utc)
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'feedback.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for conversation_id, agents in {"math": ["Triage Agent", "Math Tutor"], "chat": ["Triage Agent"]}.items():
+            session.add(Conversation(id=conversation_id, turn_count=len(agents), created_at=NOW, updated_at=NOW))
+            for turn_index, agent in enumerate(agents):
+                session.add(ConversationTurn(conversation_id=conversation_id, turn_index=turn_index,
+                                             question="?", agent_used=agent, created_at=NOW))
+        session.commit()
+        yield session
+
+@pytest.fixture(params=["upsert", "read-modify-write"])
+def dialect_path(request, monkeypatch):
+    if request.param == "read-modify-write":
+        monkeypatch.setattr(feedback, "_upsert", lambda db: None)
+    return request.param
+
+def _bucket(db, agent_name):
+    return db.query(FeedbackAggregate).filter_by(agent_name=agent_name).one()
+
+def test_feedback_goes_to_the_agent_of_the_latest_turn(db):
+    unknown = record_feedback(db, [
+        {"conversation_id": "math", "rating": 5},
+        {"conversation_id": "missing", "rating": 1},
+    ], now=NOW)
+    db.commit()
+
+    assert unknown == ["missing"]
+    [row] = db.query(UserFeedback).all()
+    assert (row.conversation_id, row.agent_name) == ("math", "Math Tutor")
+
+def test_batches_add_up_in_the_aggregates(db, dialect_path):
+    record_feedback(db, [{"conversation_id": "math", "rating": 5}, {"conversation_id": "math", "rating": 2}], now=NOW)
+    db.commit()
+    record_feedback(db, [{"conversation_id": "math", "rating": 4}, {"conversation_id": "chat", "rating": 1}], now=NOW)
+    db.commit()
+    db.expire_all()
+
+    math = _bucket(db, "Math Tutor")
+    assert (math.count, math.rating_sum, math.positive) == (3, 11, 2)
+    assert (math.rating_1, math.rating_2, math.rating_3, math.rating_4, math.rating_5) == (0, 1, 0, 1, 1)
+    assert math.bucket_start.replace(tzinfo=timezone.utc) == bucket_start(NOW, 3600)
+
+    metrics = db.query(AgentMetrics).filter_by(agent_name="Math Tutor").one()
+    assert (metrics.feedback_count, metrics.feedback_rating_sum, metrics.feedback_positive) == (3, 11, 2)
+    assert metrics.success_rate == pytest.approx(200 / 3)
+    assert metrics.avg_rating == pytest.approx(11 / 3)
+    triage = db.query(AgentMetrics).filter_by(agent_name="Triage Agent").one()
+    assert (triage.feedback_count, triage.success_rate) == (1, 0.0)
+
+def test_feedback_of_the_next_hour_opens_a_new_bucket(db):
+    record_feedback(db, [{"conversation_id": "chat", "rating": 5}], now=NOW)
+    record_feedback(db, [{"conversation_id": "chat", "rating": 3}], now=NOW + timedelta(hours=1))
+    db.commit()
+
+    buckets = db.query(FeedbackAggregate).order_by(FeedbackAggregate.bucket_start).all()
+    assert [(bucket.count, bucket.rating_sum) for bucket in buckets] == [(1, 5), (1, 3)]
+    assert db.query(AgentMetrics).filter_by(agent_name="Triage Agent").one().feedback_count == 2
+
+def test_existing_agent_metrics_keep_their_other_counters(db, dialect_path):
+    db.add(AgentMetrics(agent_name="Math Tutor", questions_handled=7, feedback_count=1,
+                        feedback_rating_sum=2, feedback_positive=0, success_rate=0.0))
+    db.commit()
+
+    record_feedback(db, [{"conversation_id": "math", "rating": 5}], now=NOW)
+    db.commit()
+    db.expire_all()
+
+    metrics = db.query(AgentMetrics).filter_by(agent_name="Math Tutor").one()
+    assert (metrics.questions_handled, metrics.feedback_count, metrics.feedback_rating_sum) == (7, 2, 7)
+    assert metrics.success_rate == 50.0
+
+def test_bulk_feedback_endpoint_reports_unknown_conversations(client):
+    asked = client.post("/api/v1/ask", json={"question": "What is 2+2?"}).json()
+
+    response = client.post("/api/v1/feedback/bulk", json={"items": [
+        {"conversation_id": asked["conversation_id"], "rating": 5},
+        {"conversation_id": "no-such-conversation", "rating": 3},
+    ]})
+
+    assert response.json() == {"accepted": 1, "unknown_conversations": ["no-such-conversation"]}
+    buckets = client.get("/api/v1/metrics/feedback", params={"agent": asked["agent_used"]}).json()
+    assert sum(bucket["histogram"]["5"] for bucket in buckets) >= 1
@@ -0,0 +1,92 @@
+"""
+Guardrail checks under MODEL_PROVIDER=stub. The stub fills the verdict schema
+with sample values, so whatever reaches the LLM check gets a verdict without
+tripping; the tests count how many checks got that far.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.guardrails import (
+    GuardrailChecker,
+    GuardrailTripwireTriggered,
+    GuardrailVerdict,
+    VerdictCache,
+    run_with_guardrails,
+)
+from app.core.stub_model import StubModel
+
+CONFIG = {
+    "instructions": "Only allow homework questions.",
+    "allow_patterns": [r"\bsolve\b"],
+    "block_patterns": [r"\bcheat\b"],
+}
+
+def _checker(config=CONFIG):
+    return GuardrailChecker("homework", config, StubModel("gpt-4o-mini", latency=0))
+
+def test_patterns_decide_without_the_llm():
+    checker = _checker()
+
+    allowed = asyncio.run(checker.check("Solve x + 1 = 2"))
+    blocked = asyncio.run(checker.check("Help me cheat on the exam"))
+
+    assert not allowed.tripwire_triggered
+    assert blocked.tripwire_triggered and "cheat" in blocked.reasoning
+    stats = checker.stats.to_dict()
+    assert (stats["prefilter_allowed"], stats["prefilter_blocked"], stats["llm_checks"]) == (1, 1, 0)
+    assert stats["llm_skip_rate"] == 1.0
+
+def test_llm_verdict_is_cached_by_normalized_question():
+    checker = _checker()
+
+    asyncio.run(checker.check("Tell me about volcanoes"))
+    asyncio.run(checker.check("  tell me about VOLCANOES "))
+
+    assert (checker.stats.llm_checks, checker.stats.cache_hits) == (1, 1)
+
+def test_verdict_cache_expires_and_evicts_the_least_recently_used():
+    verdict = GuardrailVerdict(tripwire_triggered=False, reasoning="ok")
+    cache = VerdictCache(max_size=2, ttl=0.05)
+    cache.set("a", verdict)
+    cache.set("b", verdict)
+    cache.get("a")
+    cache.set("c", verdict)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (verdict, None, verdict)
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+def test_tripped_guardrail_cancels_the_main_run():
+    cancelled = []
+
+    async def main():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        await run_with_guardrails(main(), [_checker()], "How do I cheat at chess?")
+
+    start = time.monotonic()
+    with pytest.raises(GuardrailTripwireTriggered, match="homework"):
+        asyncio.run(scenario())
+    assert time.monotonic() - start < 1
+    assert cancelled == [True]
+
+def test_main_result_is_returned_once_every_guardrail_passes():
+    passed = []
+
+    async def main():
+        return "answer"
+
+    async def on_pass():
+        passed.append(True)
+
+    result = asyncio.run(run_with_guardrails(main(), [_checker()], "Solve 2x = 4", on_pass=on_pass))
+
+    assert result == "answer"
+    assert passed == [True]
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.model_client import HedgedModel
+from app.core.stub_model import StubModel
+
+HEDGING = {"min_samples": 3, "percentile": 0.95, "min_delay": 0.05, "max_delay": 1.0}
+
+class SlowStub(StubModel):
+    """Stub whose n-th call takes latencies[n] seconds (the last one repeats); calls in `failures` raise."""
+
+    def __init__(self, latencies, failures=()):
+        super().__init__("stub", latency=0)
+        self.latencies = list(latencies)
+        self.failures = set(failures)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def get_response(self, *args, **kwargs):
+        index = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latencies[min(index, len(self.latencies) - 1)])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if index in self.failures:
+            raise RuntimeError("provider error")
+        return await super().get_response(*args, **kwargs)
+
+def _ask(model):
+    return model.get_response(None, "hello", None, [], None, [], None)
+
+def _run(model, requests):
+    async def scenario():
+        for _ in range(requests - 1):
+            await _ask(model)
+        start = time.monotonic()
+        response = await _ask(model)
+        return response, time.monotonic() - start
+    return asyncio.run(scenario())
+
+def test_no_hedging_until_enough_samples():
+    stub = SlowStub([0.05])
+    model = HedgedModel(stub, HEDGING)
+
+    _run(model, 3)
+
+    assert stub.calls == 3
+    assert model.hedges == 0
+
+def test_slow_request_is_hedged_and_the_hedge_wins():
+    # Three 5 ms warm-up calls set the hedge delay to the 50 ms floor; the next call hangs
+    stub = SlowStub([0.005, 0.005, 0.005, 2.0, 0.005])
+    model = HedgedModel(stub, HEDGING)
+
+    response, elapsed = _run(model, 4)
+
+    assert response.output
+    assert elapsed < 0.5
+    assert stub.calls == 5
+    assert stub.cancelled == 1
+    assert (model.hedges, model.hedge_wins) == (1, 1)
+    assert model.stats()["hedge_rate"] == 1 / 4
+
+def test_fast_request_is_not_hedged():
+    stub = SlowStub([0.005])
+    model = HedgedModel(stub, HEDGING)
+
+    _run(model, 5)
+
+    assert stub.calls == 5
+    assert model.hedges == 0
+
+def test_failed_primary_falls_back_to_the_hedge():
+    # The primary fails after the hedge was sent but before the hedge answers
+    stub = SlowStub([0.005, 0.005, 0.005, 0.15, 0.3], failures={3})
+    model = HedgedModel(stub, HEDGING)
+
+    response, _ = _run(model, 4)
+
+    assert response.output
+    assert (model.hedges, model.hedge_wins) == (1, 1)
+
+def test_both_requests_failing_raises_the_primary_error():
+    stub = SlowStub([0.005, 0.005, 0.005, 0.15, 0.3], failures={3, 4})
+    model = HedgedModel(stub, HEDGING)
+
+    with pytest.raises(RuntimeError, match="provider error"):
+        _run(model, 4)
+    assert model.hedges == 1 and model.hedge_wins == 0
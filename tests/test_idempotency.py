@@ -0,0 +1,35 @@
+import uuid
+from app.db.database import SessionLocal
+from app.db.models import ConversationTurn
+
+def _turns(conversation_id: str) -> int:
+    with SessionLocal() as db:
+        return db.query(ConversationTurn).filter_by(conversation_id=conversation_id).count()
+
+def test_retry_without_conversation_id_replays_the_response(client):
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    body = {"question": "What is the weather like in Rome?"}
+
+    first = client.post("/api/v1/ask", json=body, headers=headers)
+    retry = client.post("/api/v1/ask", json=body, headers=headers)
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert _turns(first.json()["conversation_id"]) == 1
+
+def test_key_reused_for_another_question_is_rejected(client):
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+
+    assert client.post("/api/v1/ask", json={"question": "Who was Julius Caesar?"}, headers=headers).status_code == 200
+    response = client.post("/api/v1/ask", json={"question": "Who was Napoleon?"}, headers=headers)
+
+    assert response.status_code == 422
+
+def test_requests_without_key_start_new_conversations(client):
+    body = {"question": "When did the French Revolution start?"}
+
+    first = client.post("/api/v1/ask", json=body).json()
+    second = client.post("/api/v1/ask", json=body).json()
+
+    assert first["conversation_id"] != second["conversation_id"]
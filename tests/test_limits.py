@@ -0,0 +1,55 @@
+"""Model settings from agents.yaml, the end-to-end deadline and the turn budget."""
+import asyncio
+
+import pytest
+
+from app.core.stub_model import StubModel
+from app.main import get_agent_factory
+
+class HangingStub(StubModel):
+    async def get_response(self, *args, **kwargs):
+        await asyncio.sleep(10)
+        return await super().get_response(*args, **kwargs)
+
+def test_agents_get_temperature_and_max_tokens_from_the_config(client):
+    factory = get_agent_factory()
+    globals_config = factory.config["globals"]
+
+    for agent_id, agent in factory.agents.items():
+        config = factory.config["agents"][agent_id]
+        assert agent.model_settings.temperature == config.get("temperature", globals_config["default_temperature"])
+        assert agent.model_settings.max_tokens == config.get("max_tokens", globals_config["max_tokens"])
+
+def test_question_past_the_deadline_is_cancelled(client, monkeypatch):
+    factory = get_agent_factory()
+    hanging = factory.get_default_agent().clone(model=HangingStub("gpt-4o-mini", latency=0))
+    monkeypatch.setattr(factory, "get_default_agent", lambda: hanging)
+    monkeypatch.setattr(factory, "timeout", 0.2)
+
+    response = client.post("/api/v1/ask", json={"question": "What is 10+10 in math?"})
+
+    assert response.status_code == 504
+    assert "0.2s" in response.json()["detail"]
+
+def test_exhausted_turn_budget_without_an_answer_fails(client, monkeypatch):
+    # Triage spends the only turn on the handoff, the Math Tutor gets none
+    monkeypatch.setattr(get_agent_factory(), "max_turns", 1)
+
+    response = client.post("/api/v1/ask", json={"question": "What is 11+11 in math?"})
+
+    assert response.status_code == 502
+    assert "turn budget" in response.json()["detail"]
+
+def test_handoff_cycles_and_chains_over_budget_are_rejected(client, monkeypatch):
+    factory = get_agent_factory()
+    agents = {agent_id: {"handoffs": []} for agent_id in factory.agents}
+
+    cyclic = {**agents, "math_tutor": {"handoffs": ["history_tutor"]}, "history_tutor": {"handoffs": ["math_tutor"]}}
+    with pytest.raises(ValueError, match="Handoff cycle detected"):
+        factory._validate_turn_budget(cyclic)
+
+    chain = {**agents, "math_tutor": {"handoffs": ["history_tutor"], "tools": ["calculate"]},
+             "history_tutor": {"handoffs": ["utility_agent"]}, "utility_agent": {"tools": ["get_weather"]}}
+    monkeypatch.setattr(factory, "max_turns", 3)
+    with pytest.raises(ValueError, match="math_tutor needs at least 4 turns"):
+        factory._validate_turn_budget(chain)
@@ -0,0 +1,59 @@
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, text
+
+from app.db.database import _alembic_config, create_tables, upgrade_schema
+from app.db.models import Base
+
+def _include_object(obj, name, type_, reflected, compare_to) -> bool:
+    # Same filter as migrations/env.py: the FTS5 tables are not in the models
+    return not (type_ == "table" and name.startswith("conversation_turns_fts"))
+
+def _baseline_engine(tmp_path):
+    """A database as the baseline create_all() left it: no alembic_version table."""
+    engine = create_engine(f"sqlite:///{tmp_path}/baseline.db")
+    with engine.begin() as conn:
+        command.upgrade(_alembic_config(conn), "0001_baseline")
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.execute(text("""INSERT INTO conversations (id, question, answer, agent_used, processing_time, tokens_used)
+            VALUES ('c1', 'What is 2+2?', '4', 'Math Tutor', 1.5, 12)"""))
+        conn.execute(text("INSERT INTO user_feedback (conversation_id, rating) VALUES ('c1', 5), ('c1', 2)"))
+    return engine
+
+def test_baseline_database_is_upgraded(tmp_path):
+    engine = _baseline_engine(tmp_path)
+
+    assert upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn, opts={"include_object": _include_object}),
+                                Base.metadata) == []
+        assert conn.execute(text("SELECT turn_count FROM conversations WHERE id = 'c1'")).scalar() == 1
+        turn = conn.execute(text("SELECT turn_index, question, answer, agent_used FROM conversation_turns")).one()
+        assert tuple(turn) == (0, "What is 2+2?", "4", "Math Tutor")
+        assert conn.execute(text("SELECT DISTINCT agent_name FROM user_feedback")).scalars().all() == ["Math Tutor"]
+        metrics = conn.execute(text(
+            "SELECT feedback_count, feedback_rating_sum, feedback_positive, success_rate FROM agent_metrics"
+        )).one()
+        assert tuple(metrics) == (2, 7, 1, 50.0)
+        assert conn.execute(text("SELECT SUM(count) FROM feedback_aggregates")).scalar() == 2
+
+def test_downgrade_restores_baseline_conversations(tmp_path):
+    engine = _baseline_engine(tmp_path)
+    upgrade_schema(engine)
+
+    with engine.begin() as conn:
+        command.downgrade(_alembic_config(conn), "0001_baseline")
+        row = conn.execute(text("SELECT question, answer, agent_used FROM conversations")).one()
+    assert tuple(row) == ("What is 2+2?", "4", "Math Tutor")
+
+def test_empty_database_is_stamped_at_head(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/fresh.db")
+    monkeypatch.setattr("app.db.database.engine", engine)
+
+    assert not upgrade_schema(engine)
+    create_tables()
+
+    with engine.connect() as conn:
+        assert MigrationContext.configure(conn).get_current_revision() == "0002_conversation_turns"
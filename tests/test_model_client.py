@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+from app.core.model_client import ModelClientPool
+
+class _ModelServer(ThreadingHTTPServer):
+    """Local OpenAI-compatible stub recording connections and concurrent requests; /slow paths take `delay`."""
+    daemon_threads = True
+
+    def __init__(self):
+        self.connections = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), _ModelHandler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+class _ModelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.append(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if "/slow" in self.path:
+                time.sleep(server.delay)
+            body = json.dumps({"object": "list", "data": []}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def model_server():
+    server = _ModelServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _pool(http_config, request_timeout=5.0):
+    return ModelClientPool({"max_retries": 0, **http_config}, request_timeout=request_timeout, api_key="test")
+
+def _list(client, path="/models"):
+    return client.get(path, cast_to=object)
+
+def test_client_is_shared_per_provider_and_base_url(model_server):
+    pool = _pool({})
+
+    assert pool.get_client("openai", model_server.url) is pool.get_client("openai", model_server.url)
+    assert pool.get_client("openai", model_server.url) is not pool.get_client("openai", None)
+    asyncio.run(pool.close())
+
+def test_sequential_requests_reuse_one_connection(model_server):
+    async def scenario():
+        pool = _pool({})
+        client = pool.get_client("openai", model_server.url)
+        try:
+            for _ in range(5):
+                await _list(client)
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+    assert len(model_server.connections) == 5
+    assert len(set(model_server.connections)) == 1
+
+def test_concurrent_requests_are_capped_by_max_connections(model_server):
+    model_server.delay = 0.1
+
+    async def scenario():
+        pool = _pool({"max_connections": 2, "max_keepalive_connections": 2})
+        client = pool.get_client("openai", model_server.url)
+        try:
+            await asyncio.gather(*(_list(client, "/slow") for _ in range(6)))
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+    assert model_server.max_in_flight == 2
+    assert len(set(model_server.connections)) == 2
+
+def test_slow_response_hits_the_request_timeout(model_server):
+    model_server.delay = 2.0
+
+    async def scenario():
+        pool = _pool({}, request_timeout=0.2)
+        client = pool.get_client("openai", model_server.url)
+        start = time.monotonic()
+        try:
+            with pytest.raises(openai.APITimeoutError):
+                await _list(client, "/slow")
+        finally:
+            await pool.close()
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) < 1.0
+
+def test_timeouts_and_limits_come_from_the_http_config():
+    pool = _pool({"connect_timeout": 0.5, "max_connections": 7, "max_keepalive_connections": 3, "keepalive_expiry": 12},
+                 request_timeout=30)
+    client = pool.get_client()
+    http_client = client._client
+
+    assert (http_client.timeout.connect, http_client.timeout.read) == (0.5, 30)
+    pool_limits = http_client._transport._pool
+    assert (pool_limits._max_connections, pool_limits._max_keepalive_connections, pool_limits._keepalive_expiry) == (7, 3, 12)
+    asyncio.run(pool.close())
@@ -0,0 +1,87 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from app.db.answers import store_answer
+from app.db.models import AnswerBlob, Base, Conversation, ConversationTurn, UserFeedback
+from app.db.partitions import _partitioned_copy, add_months, archive_expired, partition_name
+
+NOW = datetime(2024, 6, 15, tzinfo=timezone.utc)
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+def _add_conversation(db, conversation_id, created_at, answer):
+    db.add(Conversation(id=conversation_id, turn_count=1, created_at=created_at, updated_at=created_at))
+    db.add(ConversationTurn(conversation_id=conversation_id, turn_index=0, question=f"Question of {conversation_id}?",
+                            answer_digest=store_answer(db, answer), agent_used="Math Tutor", created_at=created_at))
+    db.add(UserFeedback(conversation_id=conversation_id, agent_name="Math Tutor", rating=5, created_at=created_at))
+    db.flush()
+    # Blobs age with their first turn
+    db.get(AnswerBlob, store_answer(db, answer)).created_at = created_at
+
+def _read_archive(path):
+    with gzip.open(path, "rt") as archive:
+        return [json.loads(line) for line in archive]
+
+def test_months_past_retention_are_archived_then_deleted(tmp_path):
+    engine = _engine(tmp_path)
+    with Session(engine) as db:
+        _add_conversation(db, "old", datetime(2024, 1, 10, tzinfo=timezone.utc), "An old answer. " * 50)
+        _add_conversation(db, "recent", datetime(2024, 5, 20, tzinfo=timezone.utc), "A recent answer.")
+        db.commit()
+    archive_dir = tmp_path / "archive"
+
+    archived = archive_expired(engine, retention_months=3, archive_dir=str(archive_dir), now=NOW)
+
+    assert archived == {"conversation_turns": 1, "user_feedback": 1, "conversations": 1}
+    # One archive per table and month before the cutoff, March 1st (3 months before June)
+    assert sorted(path.name for path in archive_dir.glob("conversation_turns_*")) == [
+        "conversation_turns_p202401.ndjson.gz", "conversation_turns_p202402.ndjson.gz",
+    ]
+    assert _read_archive(archive_dir / "conversation_turns_p202402.ndjson.gz") == []
+    [turn] = _read_archive(archive_dir / "conversation_turns_p202401.ndjson.gz")
+    # The archive carries the answer text, not just the digest of a blob that is now gone
+    assert turn["conversation_id"] == "old" and turn["answer"] == "An old answer. " * 50
+    with Session(engine) as db:
+        assert db.scalars(select(ConversationTurn.conversation_id)).all() == ["recent"]
+        assert db.scalars(select(Conversation.id)).all() == ["recent"]
+        assert db.scalar(select(func.count()).select_from(UserFeedback)) == 1
+        assert db.scalar(select(func.count()).select_from(AnswerBlob)) == 1
+
+def test_existing_archive_is_never_overwritten(tmp_path):
+    engine = _engine(tmp_path)
+    with Session(engine) as db:
+        _add_conversation(db, "old", datetime(2024, 1, 10, tzinfo=timezone.utc), "An old answer.")
+        db.commit()
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()
+    (archive_dir / "conversation_turns_p202401.ndjson.gz").write_bytes(b"earlier run")
+
+    archived = archive_expired(engine, retention_months=3, archive_dir=str(archive_dir), now=NOW)
+
+    assert archived["conversation_turns"] == 0
+    assert (archive_dir / "conversation_turns_p202401.ndjson.gz").read_bytes() == b"earlier run"
+    with Session(engine) as db:
+        assert db.scalar(select(func.count()).select_from(ConversationTurn)) == 1
+
+def test_partitioned_table_keys_include_the_partition_key():
+    ddl = str(CreateTable(_partitioned_copy(ConversationTurn.__table__)).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY RANGE (created_at)" in ddl
+    assert "PRIMARY KEY (id, created_at)" in ddl
+    assert "UNIQUE (conversation_id, turn_index, created_at)" in ddl
+
+def test_month_arithmetic_crosses_years():
+    december = datetime(2023, 12, 1, tzinfo=timezone.utc)
+
+    assert add_months(december, 1) == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert add_months(december, -12) == datetime(2022, 12, 1, tzinfo=timezone.utc)
+    assert partition_name("user_feedback", add_months(december, 2)) == "user_feedback_p202402"
@@ -0,0 +1,54 @@
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.db.search import ensure_search_index
+
+def _search(client, query, **params):
+    response = client.get("/api/v1/conversations/search", params={"q": query, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_index_is_backfilled_from_answer_blobs(client):
+    client.post("/api/v1/ask", json={"question": "What is the quadrilateral backfill in math?"})
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE conversation_turns_fts"))
+        # Answers are only stored in answer_blobs
+        assert conn.execute(text("SELECT count(*) FROM conversation_turns WHERE answer IS NOT NULL")).scalar() == 0
+
+    ensure_search_index(engine)
+
+    # "stub" is only in the answer
+    [hit] = _search(client, "quadrilateral stub")["results"]
+    assert hit["answer"].startswith("[gpt-4] Stub answer to: What is the quadrilateral backfill")
+
+def test_cursor_pages_through_every_match_once(client):
+    for index in range(5):
+        client.post("/api/v1/ask", json={"question": f"What is zephyrine number {index} in math?"})
+
+    hits, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = _search(client, "zephyrine", **params)
+        hits += page["results"]
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert len({hit["turn_id"] for hit in hits}) == 5
+    keys = [(hit["rank"], hit["turn_id"]) for hit in hits]
+    assert keys == sorted(keys, reverse=True)
+
+def test_search_filters_by_agent(client):
+    client.post("/api/v1/ask", json={"question": "What is the weather in Marrakesh forecast?"})
+    client.post("/api/v1/ask", json={"question": "What is Marrakesh in math?"})
+
+    hits = _search(client, "Marrakesh", agent="Utility Agent")["results"]
+
+    assert [hit["agent_used"] for hit in hits] == ["Utility Agent"]
+
+def test_malformed_cursor_is_rejected(client):
+    response = client.get("/api/v1/conversations/search", params={"q": "zephyrine", "cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
@@ -0,0 +1,40 @@
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from app.api import serialization
+from app.api.serialization import CONVERSATION_COLUMNS, render_conversations
+
+Row = namedtuple("Row", list(CONVERSATION_COLUMNS))
+ROWS = [
+    Row("c1", 0, "What is 2+2?", "4", "Math Tutor", 1.5, 42, datetime(2024, 5, 1, 12, 30, 15, 250000)),
+    Row("c2", 3, "Who was Caesar?", "A Roman è general", "History Tutor", None, None, datetime(2024, 5, 2)),
+]
+
+def test_orjson_and_fallback_paths_write_the_same_json(monkeypatch):
+    pytest.importorskip("orjson")
+    fast = render_conversations(ROWS, None)
+    monkeypatch.setattr(serialization, "orjson", None)
+    fallback = render_conversations(ROWS, None)
+
+    assert isinstance(fast, serialization.ORJSONResponse)
+    assert fast.body == fallback.body
+    assert fast.media_type == fallback.media_type == "application/json"
+
+def test_projected_rows_keep_only_the_selected_fields():
+    Projected = namedtuple("Projected", ["id", "created_at"])
+
+    response = render_conversations([Projected("c1", datetime(2024, 5, 1))], ["id", "created_at"])
+
+    assert response.body == b'[{"id":"c1","created_at":"2024-05-01T00:00:00"}]'
+
+def test_conversation_list_is_served_as_json(client):
+    client.post("/api/v1/ask", json={"question": "What is 9+9 in math?"})
+
+    response = client.get("/api/v1/conversations", params={"limit": 1})
+
+    assert response.headers["content-type"] == "application/json"
+    [turn] = response.json()
+    assert set(turn) == set(CONVERSATION_COLUMNS)
+    assert "What is 9+9 in math?" in turn["answer"]
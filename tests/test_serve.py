@@ -0,0 +1,11 @@
+import pytest
+
+from serve import check_job_backend
+
+def test_several_workers_need_a_shared_job_queue():
+    with pytest.raises(SystemExit, match="JOB_QUEUE_BACKEND=redis"):
+        check_job_backend(4, "memory")
+
+@pytest.mark.parametrize("workers, backend", [(1, "memory"), (4, "redis")])
+def test_supported_job_backends(workers, backend):
+    check_job_backend(workers, backend)
@@ -0,0 +1,40 @@
+"""
+Speculative execution of the Math Tutor under MODEL_PROVIDER=stub: triage
+hands math questions to the Math Tutor, so the prediction below is a hit.
+"""
+import asyncio
+
+from app.core.speculation import SpecialistPredictor, SpeculativeRunner
+from app.core.stub_model import StubModel
+from app.main import get_agent_factory
+
+class FailingStub(StubModel):
+    async def get_response(self, *args, **kwargs):
+        raise RuntimeError("provider error")
+
+def _speculate(specialist):
+    factory = get_agent_factory()
+    runner = SpeculativeRunner(
+        {"math_tutor": specialist},
+        {"math_tutor": {"enabled": True, "min_confidence": 0.5}},
+        SpecialistPredictor({"math_tutor": ["math"]}),
+    )
+    outcome = asyncio.run(runner.run(factory.get_default_agent(), "What is 8+8 in math?"))
+    return outcome, runner.stats.for_agent("math_tutor")
+
+def test_correct_prediction_uses_the_speculative_answer(client):
+    outcome, stats = _speculate(get_agent_factory().agents["math_tutor"])
+
+    assert outcome.hit and outcome.predicted == "math_tutor"
+    assert outcome.result.last_agent.name == "Math Tutor"
+    assert (stats.hits, stats.misses) == (1, 0)
+
+def test_failed_speculative_run_falls_back_to_triage(client):
+    failing = get_agent_factory().agents["math_tutor"].clone(model=FailingStub("gpt-4", latency=0))
+
+    outcome, stats = _speculate(failing)
+
+    assert not outcome.hit
+    assert outcome.result.last_agent.name == "Math Tutor"
+    assert outcome.result.final_output.startswith("[gpt-4] Stub answer to: What is 8+8 in math?")
+    assert (stats.hits, stats.misses) == (0, 1)
@@ -0,0 +1,57 @@
+"""
+Tier escalation under MODEL_PROVIDER=stub: the stub answers with
+"[<model>] Stub answer to: <question>", so the tier that produced an answer
+can be read from it (fast = gpt-4o-mini, strong = gpt-4 in agents.yaml).
+"""
+
+def _ask(client, question):
+    response = client.post("/api/v1/ask", json={"question": question})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _tier_runs(client):
+    tiers = client.get("/api/v1/metrics/tiers").json()["tiers"]
+    return {tier: (stats["runs"], stats["escalations"]) for tier, stats in tiers.items()}
+
+def test_accepted_answer_stays_on_the_fast_tier(client):
+    body = _ask(client, "What is the weather forecast?")
+
+    assert body["agent_used"] == "Utility Agent"
+    assert body["answer"].startswith("[gpt-4o-mini]")
+    assert "escalations" not in body["metadata"]
+
+def test_rejected_answer_is_retried_on_the_strong_tier(client):
+    before = _tier_runs(client)
+
+    # The stub echoes the question, so the answer matches the utility agent's reject_patterns
+    body = _ask(client, "I don't know the weather forecast")
+
+    assert body["agent_used"] == "Utility Agent"
+    assert body["answer"].startswith("[gpt-4]")
+    assert body["metadata"]["escalations"] == [
+        {"agent": "utility_agent", "from": "fast", "to": "strong", "reason": "matched 'I don't know'"},
+    ]
+    after = _tier_runs(client)
+    assert after["fast"][1] == before.get("fast", (0, 0))[1] + 1
+    assert after["strong"][0] == before.get("strong", (0, 0))[0] + 1
+
+def test_router_without_handoff_escalates(client):
+    # No specialist matches, so the triage agent answers itself and fails require_handoff
+    body = _ask(client, "Hello")
+
+    assert body["agent_used"] == "Triage Agent"
+    assert body["answer"].startswith("[gpt-4]")
+    assert body["metadata"]["escalations"] == [
+        {"agent": "triage", "from": "fast", "to": "strong", "reason": "no handoff"},
+    ]
+
+def test_each_handoff_hop_counts_under_its_own_tier(client):
+    before = _tier_runs(client)
+
+    # Triage runs on the fast tier and hands off to the Math Tutor on the strong tier
+    body = _ask(client, "What is 7+7 in math?")
+
+    assert body["agent_used"] == "Math Tutor"
+    after = _tier_runs(client)
+    assert after["fast"][0] == before.get("fast", (0, 0))[0] + 1
+    assert after["strong"][0] == before.get("strong", (0, 0))[0] + 1
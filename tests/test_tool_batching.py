@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from agents import function_tool
+from agents.tool_context import ToolContext
+
+from app.core.tool_loader import ToolLoader
+from app.core.usage import PriceTable, start_tracking
+
+@function_tool(failure_error_function=None)
+async def square(number: int) -> str:
+    """Square a number."""
+    if number < 0:
+        raise ValueError(f"negative input {number}")
+    await asyncio.sleep(0.01)
+    return str(number * number)
+
+@function_tool(needs_approval=True)
+def wipe(target: str) -> str:
+    """Needs a human to approve."""
+    return target
+
+def _loader():
+    loader = ToolLoader()
+    loader.tools.update({"square": square, "wipe": wipe})
+    return loader
+
+def _call(tool, items):
+    async def scenario():
+        tracker = start_tracking(PriceTable({}))
+        arguments = json.dumps({"items": items})
+        context = ToolContext(None, tool_name=tool.name, tool_call_id="call-1", tool_arguments=arguments)
+        output = await tool.on_invoke_tool(context, arguments)
+        return json.loads(output), tracker
+
+    return asyncio.run(scenario())
+
+def test_batched_results_come_back_in_order_with_item_errors():
+    loader = _loader()
+    [square_many] = loader.get_batched_tools(["square"], concurrency=2)
+
+    output, tracker = _call(square_many, [{"number": 3}, {"number": -1}, {"number": 4}])
+
+    assert square_many.name == "square_many"
+    assert output["results"] == [
+        {"index": 0, "input": {"number": 3}, "output": "9"},
+        {"index": 1, "input": {"number": -1}, "error": "negative input -1"},
+        {"index": 2, "input": {"number": 4}, "output": "16"},
+    ]
+    assert (tracker.batched_calls, tracker.batched_items) == (1, 3)
+    assert loader.batch_stats.to_dict()["square"] == {
+        "calls": 1, "items": 3, "errors": 1, "avg_items": 3.0, "round_trips_saved": 2,
+    }
+
+def test_batches_over_max_items_are_refused():
+    loader = _loader()
+    [square_many] = loader.get_batched_tools(["square"], max_items=2)
+
+    output, tracker = _call(square_many, [{"number": n} for n in range(3)])
+
+    assert output == {"error": "At most 2 items per call, got 3"}
+    assert tracker.batched_calls == 0
+    assert loader.batch_stats.to_dict() == {}
+
+def test_batched_schema_wraps_the_tool_arguments():
+    [square_many] = _loader().get_batched_tools(["square"], max_items=5)
+
+    items = square_many.params_json_schema["properties"]["items"]
+    assert items["items"] == square.params_json_schema
+    assert "at most 5" in items["description"]
+
+def test_only_eligible_tools_are_batched():
+    loader = _loader()
+
+    assert loader.is_batchable("square")
+    assert not loader.is_batchable("wipe")
+    assert not loader.is_batchable("missing")
+    assert [tool.name for tool in loader.get_batched_tools(["square", "wipe", "missing"])] == ["square_many"]
+    # The generated tool is reused for the same limits
+    assert loader.get_batched_tools(["square"]) == loader.get_batched_tools(["square"])
@@ -0,0 +1,41 @@
+"""
+Per-hop usage records of a run that hands off, under MODEL_PROVIDER=stub
+(triage on gpt-4o-mini hands math questions to the Math Tutor on gpt-4).
+"""
+import asyncio
+
+from agents import Runner
+
+from app.core.usage import start_tracking
+from app.main import get_agent_factory
+
+def _hops(usage):
+    return [(hop["agent"], hop["model"], hop["requests"]) for hop in usage["hops"]]
+
+def test_handoff_run_is_recorded_per_hop(client):
+    response = client.post("/api/v1/ask", json={"question": "What is 5+5 in math?"})
+    assert response.status_code == 200, response.text
+    usage = response.json()["metadata"]["usage"]
+
+    assert _hops(usage) == [("Triage Agent", "gpt-4o-mini", 1), ("Math Tutor", "gpt-4", 1)]
+    assert usage["requests"] == 2
+    assert usage["total_tokens"] == sum(hop["total_tokens"] for hop in usage["hops"])
+    assert set(usage["agents"]) == {"Triage Agent", "Math Tutor"}
+
+def test_concurrent_runs_keep_separate_hops(client):
+    factory = get_agent_factory()
+
+    async def scenario():
+        tracker = start_tracking(factory.prices)
+        await asyncio.gather(*(
+            Runner.run(factory.get_default_agent(), question)
+            for question in ("What is 6+6 in math?", "Who was the first Roman emperor in history?")
+        ))
+        return tracker
+
+    tracker = asyncio.run(scenario())
+
+    # Interleaved calls of two runs must not merge into, or split, each other's hops
+    assert sorted((hop.agent, hop.requests) for hop in tracker.hops) == [
+        ("History Tutor", 1), ("Math Tutor", 1), ("Triage Agent", 1), ("Triage Agent", 1),
+    ]